@@ -9,8 +9,14 @@ import logging
 from datetime import datetime, timedelta
 import os
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 warnings.filterwarnings('ignore')
 
+try:
+    import pyarrow  # noqa: F401
+except ImportError:  # optional: ใช้ parser ปกติของ pandas แทน
+    pyarrow = None
+
 # ตั้งค่า logging
 logging.basicConfig(
     level=logging.INFO,
@@ -22,16 +28,69 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# dtype ของ columns ที่ใช้ร่วมกันในทุกไฟล์: ids/codes เป็น categorical, เดือน/ปีเป็น int64
+KEY_DTYPES = {
+    'project_id': 'category',
+    'project_no': 'category',
+    'g_code': 'category',
+    's_code': 'category',
+    'month': 'int64',
+    'year': 'int64',
+}
+
+# schema ต่อไฟล์ต้นทาง: dtype (columns ที่ไม่ได้ระบุใช้ type inference) และ parse_dates
+# columns ที่ไม่มีในไฟล์จะถูกข้าม
+RAW_SCHEMA = {
+    'actual_cost': {
+        'dtype': {
+            'description': 'category', 'quarter': 'int64', 'is_year_end': 'int64',
+            'risk_overrun': 'int64', 'risk_progress_lag': 'int64',
+            **{column: 'float64' for column in [
+                'boq', 'bg_overhead', 'bg_material', 'bg_labour', 'bg_subc', 'total_budget',
+                'ac_overhead', 'ac_material', 'ac_labour', 'ac_subc', 'total_actual', 'bg_balance',
+                'pg_submit', 'pg_certificate', 'pg_submit_bal', 'progress_percentage', 'cpi', 'spi',
+                'budget_utilization_pct', 'progress_cost_ratio']},
+        },
+    },
+    'summary_cost': {
+        'dtype': {
+            'description': 'category', 'risk_high_variance': 'int64', 'risk_forecast_overrun': 'int64',
+            **{column: 'float64' for column in [
+                'boq', 'budget', 'cost_saving', 'purchase_cost', 'pr_pending', 'budget_balance_pu',
+                'actual_cost_ac', 'unbook', 'actual_cost_all', 'budget_balance_ac', 'purchase_balance',
+                'forecast', 'to_be_order', 'variance_budget', 'finance_cost', 'finance_balance',
+                'cost_variance_pct', 'purchase_efficiency']},
+        },
+    },
+    'progress_payment': {
+        'dtype': {'project_name': 'category', 'period': 'category', 'progress_submit': 'float64',
+                  'certificate': 'float64', 'submit_balance': 'float64'},
+        'parse_dates': ['date'],
+    },
+    'projects_master': {
+        'dtype': {'project_name': 'category'},
+        'parse_dates': ['start_date', 'end_date'],
+    },
+    'cost_codes_master': {
+        'dtype': {'description': 'category'},
+    },
+}
+
 class BudgetETL:
     """
     ETL Pipeline สำหรับ AI Budget Alert Dashboard
     """
     
-    def __init__(self, data_dir='data/raw/', output_dir='data/processed/'):
+    def __init__(self, data_dir='data/raw/', output_dir='data/processed/', csv_engine=None, max_workers=None):
         self.data_dir = data_dir
         self.output_dir = output_dir
         self.create_output_dir()
         
+        # csv_engine: None = pandas 'c' parser, 'pyarrow' = multithreaded parser (ถ้ามี)
+        # max_workers: จำนวน threads ที่อ่านไฟล์พร้อมกัน (default = จำนวนไฟล์)
+        self.csv_engine = csv_engine
+        self.max_workers = max_workers
+        
         # ตั้งค่าไฟล์ input
         self.files = {
             'actual_cost': '/Users/aoyrzz/Desktop/Alert_Dash/data/raw/actual_cost_data.csv',
@@ -50,33 +109,64 @@ class BudgetETL:
         os.makedirs(self.output_dir, exist_ok=True)
         os.makedirs(f"{self.output_dir}/quality_reports/", exist_ok=True)
         
+    def _read_options(self, key, filepath):
+        """dtype/parse_dates/engine สำหรับ pd.read_csv ตาม RAW_SCHEMA"""
+        schema = RAW_SCHEMA.get(key, {})
+        available = pd.read_csv(filepath, encoding='utf-8-sig', nrows=0).columns
+        dtype = {**KEY_DTYPES, **schema.get('dtype', {})}
+        options = {
+            'encoding': 'utf-8-sig',
+            'dtype': {column: column_type for column, column_type in dtype.items() if column in available},
+            'parse_dates': [column for column in schema.get('parse_dates', []) if column in available],
+        }
+        if self.csv_engine == 'pyarrow':
+            if pyarrow is None:
+                logger.warning("⚠️ ไม่พบ pyarrow - ใช้ parser ปกติแทน")
+            else:
+                options['engine'] = 'pyarrow'
+        elif self.csv_engine is not None:
+            options['engine'] = self.csv_engine
+        return options
+    
+    def _read_file(self, key, filename):
+        """อ่านไฟล์ CSV หนึ่งไฟล์ตาม schema (รันใน thread pool)"""
+        filepath = os.path.join(self.data_dir, filename)
+        try:
+            df = pd.read_csv(filepath, **self._read_options(key, filepath))
+            logger.info(f"✅ โหลด {filename}: {len(df):,} rows, {len(df.columns)} columns")
+            logger.debug(f"   Columns: {list(df.columns)}")
+            return df
+        except FileNotFoundError:
+            logger.error(f"❌ ไม่พบไฟล์: {filepath}")
+            raise
+        except Exception as e:
+            logger.error(f"❌ Error loading {filename}: {str(e)}")
+            raise
+    
     def load_data(self):
         """
         โหลดข้อมูลจากไฟล์ CSV ทั้งหมด
+        
+        ไฟล์แต่ละไฟล์เป็นอิสระกัน จึงอ่านพร้อมกันใน thread pool (parser ของ pandas/pyarrow
+        ปล่อย GIL ระหว่าง parse) dtypes มาจาก RAW_SCHEMA แทนการเดา type จากข้อมูล
         """
         logger.info("🔄 เริ่มโหลดข้อมูล...")
         
-        for key, filename in self.files.items():
-            filepath = os.path.join(self.data_dir, filename)
-            
-            try:
-                # อ่านไฟล์ CSV
-                df = pd.read_csv(filepath, encoding='utf-8-sig')
-                self.dataframes[key] = df
-                logger.info(f"✅ โหลด {filename}: {len(df):,} rows, {len(df.columns)} columns")
-                
-                # แสดง sample data
-                logger.info(f"   Sample columns: {list(df.columns[:5])}")
-                
-            except FileNotFoundError:
-                logger.error(f"❌ ไม่พบไฟล์: {filepath}")
-                raise
-            except Exception as e:
-                logger.error(f"❌ Error loading {filename}: {str(e)}")
-                raise
+        workers = self.max_workers or len(self.files) or 1
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {key: pool.submit(self._read_file, key, filename)
+                       for key, filename in self.files.items()}
+            for key, future in futures.items():
+                self.dataframes[key] = future.result()
                 
         logger.info(f"✅ โหลดข้อมูลทั้งหมดเสร็จสิ้น: {len(self.dataframes)} tables")
         
+    @staticmethod
+    def _value_dtypes(df):
+        """dtype ของค่าในแต่ละ column - categorical (จาก RAW_SCHEMA) รายงานเป็น dtype ของ categories"""
+        return {column: (dtype.categories.dtype if isinstance(dtype, pd.CategoricalDtype) else dtype)
+                for column, dtype in df.dtypes.items()}
+    
     def validate_data(self):
         """
         ตรวจสอบคุณภาพข้อมูล
@@ -91,7 +181,7 @@ class BudgetETL:
                 'total_columns': len(df.columns),
                 'missing_values': df.isnull().sum().sum(),
                 'duplicate_rows': df.duplicated().sum(),
-                'data_types': df.dtypes.to_dict()
+                'data_types': self._value_dtypes(df)
             }
             
             # ตรวจสอบ key columns
@@ -0,0 +1,181 @@
+"""
+Alert Anomaly - สถิติแบบ streaming (running mean/variance ของ Welford) ต่อ key สำหรับ anomaly rules
+ของ SimpleAlertEngine (actual_anomaly, cpi_anomaly, utilization_anomaly)
+
+สถิติรวมข้อมูลทีละเดือน (batch ของเดือนรวมด้วยสูตรของ Chan et al.) จึงไม่ต้อง scan ประวัติซ้ำ
+และถอดค่าเดิมออกได้ (สูตรเดียวกันย้อนกลับ) เมื่อแถวของเดือนที่รวมไปแล้วถูกแก้หรือลบ
+หน่วยความจำขึ้นกับจำนวน keys (cost codes + projects) กับจำนวนแถวที่เคยเกิน threshold เท่านั้น
+(ไม่ขึ้นกับจำนวนแถวทั้งหมด) บันทึก/โหลดเป็น .npz ได้
+"""
+
+import os
+
+import numpy as np
+
+
+def _search(sorted_keys, keys):
+    """ตำแหน่งของ keys ใน sorted_keys (-1 ถ้าไม่มี)"""
+    position = np.searchsorted(sorted_keys, keys)
+    position[position >= len(sorted_keys)] = 0
+    found = len(sorted_keys) > 0 and sorted_keys[position] == keys
+    return np.where(found, position, -1)
+
+
+class AnomalyStats:
+    """count/mean/M2 ต่อ (key, metric) - keys เป็น hash (uint64) ของ scope เช่น (g_code, s_code)
+
+    through_period = เดือนล่าสุด (year * 12 + month) ที่รวมเข้า stats แล้ว
+    flagged_keys/flagged_scores = z-score ของแถวในเดือนที่รวมแล้วที่เกิน threshold ของ rule
+    (NaN = ไม่เกิน) เรียงตาม row key - แถวอื่นของเดือนเหล่านั้นไม่ถูกเก็บ
+    """
+
+    def __init__(self, metrics):
+        self.metrics = list(metrics)
+        self.keys = np.zeros(0, dtype=np.uint64)  # เรียงจากน้อยไปมาก
+        self.count = np.zeros((0, len(self.metrics)))
+        self.mean = np.zeros((0, len(self.metrics)))
+        self.m2 = np.zeros((0, len(self.metrics)))
+        self.through_period = -1
+        self.flagged_keys = np.zeros(0, dtype=np.uint64)
+        self.flagged_scores = np.zeros((0, len(self.metrics)))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _lookup(self, keys):
+        """ตำแหน่งของ keys ใน self.keys (-1 ถ้าไม่มี)"""
+        return _search(self.keys, keys)
+
+    def flagged(self, keys):
+        """z-scores (rows, metrics) ที่เก็บไว้ของ row keys (NaN = ไม่เคยเกิน threshold)"""
+        position = _search(self.flagged_keys, keys)
+        found = position >= 0
+        scores = np.full((len(keys), len(self.metrics)), np.nan)
+        scores[found] = self.flagged_scores[position[found]]
+        return scores
+
+    def flag(self, keys, scores, floors):
+        """เก็บ scores ของแถวที่เกิน floors (threshold ต่อ metric) แทนค่าเดิมของ row key เดียวกัน
+
+        แถวที่ไม่เกินเลยถูกลบออก (ถ้ามี) - ค่าที่ไม่เกิน floor ของ metric นั้นเก็บเป็น NaN
+        """
+        with np.errstate(invalid='ignore'):
+            scores = np.where(scores > floors, scores, np.nan)
+        keep = ~np.isnan(scores).all(axis=1)
+        stale = _search(self.flagged_keys, keys)
+        remaining = np.ones(len(self.flagged_keys), dtype=bool)
+        remaining[stale[stale >= 0]] = False
+        if remaining.all() and not keep.any():
+            return
+        merged = np.concatenate([self.flagged_keys[remaining], keys[keep]])
+        order = np.argsort(merged, kind='stable')
+        self.flagged_keys = merged[order]
+        self.flagged_scores = np.concatenate([self.flagged_scores[remaining], scores[keep]])[order]
+
+    def score(self, keys, values, min_count=3):
+        """z-score ของ values (rows, metrics) เทียบกับสถิติของ key ของแต่ละแถว
+
+        NaN เมื่อ key มีข้อมูลน้อยกว่า min_count ค่า หรือ standard deviation เป็นศูนย์
+        """
+        position = self._lookup(keys)
+        found = position >= 0
+        z = np.full(values.shape, np.nan)
+        if not found.any():
+            return z
+        count = self.count[position[found]]
+        mean = self.mean[position[found]]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std = np.sqrt(self.m2[position[found]] / (count - 1))
+            scores = (values[found] - mean) / std
+        scores[(count < min_count) | ~(std > 0)] = np.nan
+        z[found] = scores
+        return z
+
+    def update(self, keys, values):
+        """รวม values (rows, metrics) เข้ากับสถิติของแต่ละ key (ข้าม NaN ต่อ metric)"""
+        unique, inverse = np.unique(keys, return_inverse=True)
+        missing = unique[self._lookup(unique) < 0]
+        if len(missing):
+            # เพิ่ม keys ใหม่โดยคงลำดับที่เรียงไว้
+            merged = np.union1d(self.keys, missing)
+            kept = np.searchsorted(merged, self.keys)
+            for name in ('count', 'mean', 'm2'):
+                grown = np.zeros((len(merged), len(self.metrics)))
+                grown[kept] = getattr(self, name)
+                setattr(self, name, grown)
+            self.keys = merged
+        position = np.searchsorted(self.keys, unique)
+
+        for m in range(len(self.metrics)):
+            value = values[:, m]
+            ok = ~np.isnan(value)
+            group = inverse[ok]
+            batch_count = np.bincount(group, minlength=len(unique)).astype(float)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                batch_mean = np.bincount(group, value[ok], minlength=len(unique)) / batch_count
+            batch_m2 = np.bincount(group, (value[ok] - batch_mean[group]) ** 2, minlength=len(unique))
+
+            # รวม (count, mean, M2) ของ batch กับของเดิม
+            has = batch_count > 0
+            at = position[has]
+            old_count, old_mean = self.count[at, m], self.mean[at, m]
+            new_count = old_count + batch_count[has]
+            delta = batch_mean[has] - old_mean
+            self.mean[at, m] = old_mean + delta * batch_count[has] / new_count
+            self.m2[at, m] += batch_m2[has] + delta ** 2 * old_count * batch_count[has] / new_count
+            self.count[at, m] = new_count
+
+    def remove(self, keys, values):
+        """ถอด values (rows, metrics) ที่เคยรวมเข้า stats ออก (ข้าม NaN ต่อ metric) - ผกผันของ update"""
+        position = self._lookup(keys)
+        if (position < 0).any():
+            raise KeyError("remove() ได้เฉพาะ keys ที่เคย update")
+        unique, inverse = np.unique(position, return_inverse=True)
+
+        for m in range(len(self.metrics)):
+            value = values[:, m]
+            ok = ~np.isnan(value)
+            group = inverse[ok]
+            batch_count = np.bincount(group, minlength=len(unique)).astype(float)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                batch_mean = np.bincount(group, value[ok], minlength=len(unique)) / batch_count
+            batch_m2 = np.bincount(group, (value[ok] - batch_mean[group]) ** 2, minlength=len(unique))
+
+            # (count, mean, M2) ที่เหลือเมื่อถอด batch ออกจากของเดิม
+            has = batch_count > 0
+            at = unique[has]
+            old_count, old_mean = self.count[at, m], self.mean[at, m]
+            rest_count = old_count - batch_count[has]
+            empty = rest_count <= 0
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rest_mean = (old_count * old_mean - batch_count[has] * batch_mean[has]) / rest_count
+                delta = batch_mean[has] - rest_mean
+                rest_m2 = (self.m2[at, m] - batch_m2[has]
+                           - delta ** 2 * rest_count * batch_count[has] / old_count)
+            self.count[at, m] = np.where(empty, 0.0, rest_count)
+            self.mean[at, m] = np.where(empty, 0.0, rest_mean)
+            self.m2[at, m] = np.where(empty, 0.0, np.maximum(rest_m2, 0.0))
+
+    def save(self, path):
+        """บันทึกเป็น .npz แบบ atomic"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp.npz"
+        np.savez(temp_path, metrics=np.array(self.metrics), keys=self.keys, count=self.count,
+                 mean=self.mean, m2=self.m2, through_period=self.through_period,
+                 flagged_keys=self.flagged_keys, flagged_scores=self.flagged_scores)
+        os.replace(temp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            stats = cls(data['metrics'].tolist())
+            stats.keys = data['keys']
+            stats.count, stats.mean, stats.m2 = data['count'], data['mean'], data['m2']
+            stats.through_period = int(data['through_period'])
+            # ไฟล์รุ่นก่อนไม่มี flagged_* (และมี row_* ที่ไม่ใช้แล้ว)
+            if 'flagged_keys' in data.files:
+                stats.flagged_keys, stats.flagged_scores = data['flagged_keys'], data['flagged_scores']
+        return stats
@@ -0,0 +1,143 @@
+"""
+Alert Benchmark - วัดเวลาและหน่วยความจำของ SimpleAlertEngine บนข้อมูลจำลองหลายขนาด
+ผลลัพธ์ (throughput, peak memory ต่อ phase) ถูกต่อท้ายใน JSON file เพื่อเทียบข้ามเวอร์ชัน
+
+    python src/alert_benchmark.py --sizes 10k,100k,1M,10M --label my-branch
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from alert_system import SimpleAlertEngine
+from synthetic_data import SyntheticMasterData, shape_for_rows
+
+PHASES = ['load_data', 'evaluate_all_alerts', 'get_alert_summary', 'print_alerts', 'export_alerts_json']
+
+
+def parse_size(text):
+    """'10k' -> 10000, '1M' -> 1000000"""
+    text = text.strip().lower()
+    factor = {'k': 1_000, 'm': 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip('km')) * factor)
+
+
+def max_rss_bytes():
+    """high-water mark ของ RSS ของ process (ru_maxrss เป็น KB บน Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def measure(func, trace_memory=False):
+    """(ผลลัพธ์, วินาที, peak bytes ที่ allocate ระหว่างเรียก หรือ None)
+
+    tracemalloc ทำให้ code ที่เป็น Python loop ช้าลงหลายเท่า จึงเปิดเฉพาะเมื่อขอ
+    """
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return result, seconds, peak
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark_size(rows, workdir, seed=42, phases=PHASES, cost_codes=25, months=12, trace_memory=False):
+    """วัดทุก phase บนข้อมูลราว rows แถว"""
+    projects = shape_for_rows(rows, cost_codes, months)
+    data_file = os.path.join(workdir, f"master_{rows}.csv")
+    actual_rows = SyntheticMasterData(seed=seed).write_csv(data_file, projects, cost_codes, months)
+
+    engine = SimpleAlertEngine(data_file)
+    calls = {
+        'load_data': engine.load_data,
+        'evaluate_all_alerts': engine.evaluate_all_alerts,
+        'get_alert_summary': engine.get_alert_summary,
+        'print_alerts': lambda: engine.print_alerts(limit=10),
+        'export_alerts_json': lambda: engine.export_alerts_json(os.path.join(workdir, 'alerts.json')),
+    }
+
+    result = {'rows': actual_rows, 'projects': projects, 'phases': {}}
+    for phase in PHASES:
+        if phase not in phases:
+            continue
+        rss_before = max_rss_bytes()
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, seconds, peak = measure(calls[phase], trace_memory)
+        rss_after = max_rss_bytes()
+        result['phases'][phase] = {
+            'seconds': seconds,
+            'rows_per_second': actual_rows / seconds if seconds > 0 else None,
+            'peak_bytes': peak,
+            # ru_maxrss ไม่ลดลง: ส่วนที่ phase นี้ดัน high-water mark ขึ้น (0 = ไม่เกิน peak เดิมของ process)
+            'rss_growth_bytes': rss_after - rss_before,
+            'cumulative_max_rss_bytes': rss_after,
+        }
+        memory = (f"peak {peak / 2**20:9.1f} MB" if peak is not None
+                  else f"rss +{(rss_after - rss_before) / 2**20:8.1f} MB")
+        print(f"   {phase:<22} {seconds:9.3f}s  {actual_rows / max(seconds, 1e-9):>14,.0f} rows/s  {memory}")
+    result['alerts'] = len(engine.alerts)
+    os.remove(data_file)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ของ SimpleAlertEngine")
+    parser.add_argument('--sizes', default='10k,100k,1M,10M', help="จำนวนแถว คั่นด้วย comma")
+    parser.add_argument('--phases', default=','.join(PHASES))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_results.json', help="ต่อท้ายผลลัพธ์ใน JSON file นี้")
+    parser.add_argument('--label', default=None, help="ชื่อของรอบนี้ (default: git revision)")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="วัด peak allocation ต่อ phase ด้วย tracemalloc (เวลาที่วัดได้จะช้าลง)")
+    args = parser.parse_args(argv)
+
+    run = {
+        'label': args.label or git_revision(),
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'trace_memory': args.trace_memory,
+        'results': [],
+    }
+    phases = args.phases.split(',')
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes.split(','):
+            rows = parse_size(size)
+            print(f"📏 {size} rows")
+            run['results'].append(benchmark_size(rows, workdir, args.seed, phases,
+                                                trace_memory=args.trace_memory))
+    run['max_rss_bytes'] = max_rss_bytes()
+
+    history = []
+    if os.path.exists(args.output):
+        with open(args.output, encoding='utf-8') as f:
+            history = json.load(f)
+    history.append(run)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+    print(f"💾 บันทึกผลลัพธ์ที่ {args.output}")
+
+
+if __name__ == "__main__":
+    main()
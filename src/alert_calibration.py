@@ -0,0 +1,237 @@
+"""
+Alert Calibration - ปรับ thresholds และ severity cutoffs ของ SimpleAlertEngine ให้เข้ากับ
+risk labels ที่มากับข้อมูล (risk_overrun, risk_progress_lag, ...) แล้วบันทึกเป็น threshold profile
+
+    python src/alert_calibration.py --min-precision 0.8 --output data/processed/threshold_profile.json
+
+ต่อ rule: เรียงค่าของ rule ครั้งเดียว แล้วใช้ cumulative sum ของ labels หา precision/recall
+ของทุก threshold ที่เป็นไปได้พร้อมกัน (O(n log n) ไม่ขึ้นกับจำนวน candidates)
+โหลด profile ด้วย engine.load_threshold_profile(path) หรือ alert_system.py --profile
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+from alert_system import SimpleAlertEngine, ALERT_TYPES, BELOW_THRESHOLD_RULES
+
+PROFILE_FILE = 'data/processed/threshold_profile.json'
+
+# alert_type -> label column ที่ใช้เป็นคำตอบ (risk_high_variance / risk_forecast_overrun
+# แทบไม่สัมพันธ์กับค่าของ rules ปัจจุบัน จึงไม่ได้ใช้เป็น default)
+DEFAULT_LABELS = {
+    'cost_overrun': 'risk_overrun',
+    'progress_lag': 'risk_progress_lag',
+    'schedule_delay': 'risk_progress_lag',
+    'low_efficiency': 'risk_progress_lag',
+}
+
+
+class RuleCurve:
+    """precision/recall ของทุก threshold ของ rule หนึ่ง (alert เมื่อ score > threshold)
+
+    candidate k แจ้งเตือนค่าที่ >= upper[k] (หรือ > lower[k]); k = -1 คือไม่แจ้งเลย
+    """
+
+    def __init__(self, score, labels):
+        order = np.argsort(-score, kind='stable')
+        score, labels = score[order], labels[order]
+        # ตัดได้เฉพาะหลังค่าสุดท้ายของกลุ่มค่าที่เท่ากัน
+        last = np.flatnonzero(np.append(score[1:] != score[:-1], True)) if len(score) else np.array([], int)
+        true_positives = np.cumsum(labels)[last]
+        self.alerts = last + 1
+        self.true_positives = true_positives
+        self.positives = int(labels.sum())
+        self.upper = score[last]
+        self.lower = np.append(score[last[:-1] + 1], -np.inf)
+        self.sorted_score = score
+
+    def __len__(self):
+        return len(self.alerts)
+
+    @property
+    def precision(self):
+        return self.true_positives / self.alerts
+
+    @property
+    def recall(self):
+        return self.true_positives / self.positives if self.positives else np.zeros(len(self))
+
+    def at(self, threshold):
+        """(alerts, precision, recall) เมื่อใช้ threshold นี้ (ในหน่วยของ score)"""
+        alerts = int(np.searchsorted(-self.sorted_score, -threshold, side='left'))
+        k = np.searchsorted(self.alerts, alerts) if alerts else -1
+        if k < 0:
+            return 0, None, 0.0
+        true_positives = int(self.true_positives[k])
+        recall = true_positives / self.positives if self.positives else 0.0
+        return alerts, true_positives / alerts, recall
+
+    def cut(self, k, decimals=2):
+        """threshold ของ candidate k: ค่าที่ปัดทศนิยมน้อยที่สุด (อย่างน้อย decimals ตำแหน่ง)
+        ที่ยังอยู่ระหว่าง lower[k] กับ upper[k]"""
+        if k < 0:
+            return float(self.upper[0]) if len(self) else 0.0
+        upper, lower = float(self.upper[k]), float(self.lower[k])
+        if np.isinf(lower):
+            return round(upper - 1, decimals)
+        for digits in range(decimals, 16):
+            rounded = round((upper + lower) / 2, digits)
+            if lower <= rounded < upper:
+                return rounded
+        return lower
+
+    def best(self, min_precision=None, min_recall=None, limit=None):
+        """candidate ที่ดีที่สุด: recall สูงสุดที่ precision >= min_precision, หรือ precision สูงสุด
+        ที่ recall >= min_recall, หรือ F1 สูงสุดถ้าไม่กำหนด; limit = index สูงสุดที่ยอมให้เลือก"""
+        n = len(self) if limit is None else limit + 1
+        if n <= 0:
+            return -1
+        precision, recall = self.precision[:n], self.recall[:n]
+        if min_precision is not None:
+            passing = np.flatnonzero(precision >= min_precision)
+            return int(passing[-1]) if len(passing) else -1
+        if min_recall is not None:
+            passing = recall >= min_recall
+            if not passing.any():
+                return n - 1
+            return int(np.argmax(np.where(passing, precision, -1.0)))
+        with np.errstate(invalid='ignore'):
+            f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+        return int(np.argmax(f1))
+
+
+def calibrate(engine, labels=None, min_precision=None, min_recall=None,
+              high_precision=0.85, critical_precision=0.95, decimals=2):
+    """หา thresholds/severity cutoffs ต่อ rule คืน profile (dict ที่เขียนเป็น JSON ได้)
+
+    threshold ตาม min_precision/min_recall (default F1 สูงสุด), High และ Critical เป็นจุดที่
+    precision ของกลุ่มที่เกินเกณฑ์ถึง high_precision และ critical_precision ตามลำดับ
+    ถ้า precision ที่ threshold ถึงเป้าของระดับนั้นอยู่แล้ว (label แยกระดับไม่ได้) ใช้ cutoff เดิม
+    """
+    labels = {**DEFAULT_LABELS, **(labels or {})}
+    df = engine.df
+    profile = {
+        'created_at': datetime.now().isoformat(),
+        'data_file': str(engine.data_file),
+        'rows': len(df),
+        'targets': {'min_precision': min_precision, 'min_recall': min_recall,
+                    'high_precision': high_precision, 'critical_precision': critical_precision},
+        'thresholds': {},
+        'severity_cutoffs': {},
+        'metrics': {},
+    }
+
+    for alert_type in ALERT_TYPES:
+        label = labels.get(alert_type)
+        if alert_type not in engine.enabled_rules or label not in df.columns:
+            continue
+        rule_value = engine._rule_value(alert_type, df)
+        if rule_value is None:
+            continue
+        valid, value = rule_value
+        truth = df[label].to_numpy(dtype=float)
+        keep = valid & ~np.isnan(value) & ~np.isnan(truth)
+        sign = -1 if alert_type in BELOW_THRESHOLD_RULES else 1
+        curve = RuleCurve(value[keep] * sign, truth[keep].astype(np.int64))
+        if not len(curve) or not curve.positives:
+            print(f"⚠️ {alert_type}: ไม่มีข้อมูลหรือไม่มี label ที่เป็นบวกใน {label} - ข้าม")
+            continue
+
+        k = curve.best(min_precision, min_recall)
+        threshold = curve.cut(k, decimals)
+        precision_at_threshold = curve.precision[k] if k >= 0 else 1.0
+
+        def severity_cut(target, current):
+            if precision_at_threshold >= target:
+                return max(current * sign, threshold)
+            return curve.cut(curve.best(min_precision=target, limit=k), decimals)
+
+        current_critical, current_high = engine.severity_cutoffs[alert_type]
+        critical = severity_cut(critical_precision, current_critical)
+        high = min(max(severity_cut(high_precision, current_high), threshold), critical)
+        profile['thresholds'][alert_type] = threshold * sign
+        profile['severity_cutoffs'][alert_type] = [critical * sign, high * sign]
+
+        current = curve.at(engine.thresholds[alert_type] * sign)
+        tuned = curve.at(threshold)
+        profile['metrics'][alert_type] = {
+            'label': label,
+            'rows': int(keep.sum()),
+            'positives': curve.positives,
+            'current': {'threshold': engine.thresholds[alert_type], 'alerts': current[0],
+                        'precision': current[1], 'recall': current[2]},
+            'calibrated': {'threshold': threshold * sign, 'alerts': tuned[0],
+                           'precision': tuned[1], 'recall': tuned[2]},
+            'critical_precision': curve.at(critical)[1],
+            'high_precision': curve.at(high)[1],
+        }
+    return profile
+
+
+def print_profile(profile):
+    print(f"🎯 Calibration ({profile['rows']:,} rows)")
+    for alert_type, metrics in profile['metrics'].items():
+        current, calibrated = metrics['current'], metrics['calibrated']
+        critical, high = profile['severity_cutoffs'][alert_type]
+
+        def fmt(value):
+            return '-' if value is None else f"{value:.3f}"
+
+        print(f"   • {alert_type} ({metrics['label']}, {metrics['positives']:,} positives)")
+        print(f"       เดิม:  threshold {current['threshold']:>9}  alerts {current['alerts']:>8,}  "
+              f"precision {fmt(current['precision'])}  recall {fmt(current['recall'])}")
+        print(f"       ใหม่:  threshold {calibrated['threshold']:>9}  alerts {calibrated['alerts']:>8,}  "
+              f"precision {fmt(calibrated['precision'])}  recall {fmt(calibrated['recall'])}")
+        print(f"       severity: Critical {critical} (precision {fmt(metrics['critical_precision'])}), "
+              f"High {high} (precision {fmt(metrics['high_precision'])})")
+
+
+def write_profile(profile, path=PROFILE_FILE):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def parse_label(text):
+    rule, _, column = text.partition('=')
+    if rule not in ALERT_TYPES or not column:
+        raise argparse.ArgumentTypeError(f"ต้องอยู่ในรูป RULE=COLUMN (RULE หนึ่งใน {', '.join(ALERT_TYPES)})")
+    return rule, column
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ปรับ alert thresholds ให้เข้ากับ risk labels")
+    parser.add_argument('--data-file', default='data/processed/master_data.csv')
+    parser.add_argument('--output', default=PROFILE_FILE)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--min-precision', type=float, help="recall สูงสุดที่ precision อย่างน้อยเท่านี้")
+    target.add_argument('--min-recall', type=float, help="precision สูงสุดที่ recall อย่างน้อยเท่านี้")
+    parser.add_argument('--high-precision', type=float, default=0.85)
+    parser.add_argument('--critical-precision', type=float, default=0.95)
+    parser.add_argument('--label', type=parse_label, action='append', default=[], metavar='RULE=COLUMN',
+                        help="label column ของ rule (แทนค่า default)")
+    args = parser.parse_args(argv)
+
+    labels = {**DEFAULT_LABELS, **dict(args.label)}
+    engine = SimpleAlertEngine(args.data_file)
+    engine.extra_columns = sorted(set(labels.values()))
+    if not engine.load_data():
+        return None
+
+    profile = calibrate(engine, labels, args.min_precision, args.min_recall,
+                        args.high_precision, args.critical_precision)
+    print_profile(profile)
+    write_profile(profile, args.output)
+    print(f"💾 บันทึก threshold profile ที่ {args.output}")
+    return profile
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+"""
+Alert Dispatcher - ส่ง alerts ไปยัง webhooks / email gateways แบบ batch
+asyncio ล้วน (standard library): bounded queue, batching window ต่อปลายทาง,
+connection pool แบบ keep-alive, retry พร้อม jitter และ delivery metrics
+"""
+
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+
+@dataclass
+class Destination:
+    """ปลายทางหนึ่งแห่ง (รับ POST JSON {"alerts": [...]})"""
+    url: str
+    max_batch: int = 500         # จำนวน alerts สูงสุดต่อ request
+    window: float = 1.0          # รอรวม batch นานสุดกี่วินาที
+    pool_size: int = 4           # จำนวน connections / requests พร้อมกันสูงสุด
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+class DeliveryError(Exception):
+    """ส่ง batch ไม่สำเร็จ (retry ได้)"""
+
+
+class ConnectionPool:
+    """pool ของ HTTP/1.1 keep-alive connections ไปยัง host เดียว"""
+
+    def __init__(self, url, size, timeout):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.ssl = parts.scheme == 'https'
+        self.path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        self.timeout = timeout
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+
+    async def post(self, body, headers):
+        """POST body แล้วคืน status code"""
+        async with self._slots:
+            reader, writer = self._idle.pop() if self._idle else await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port, ssl=self.ssl), self.timeout)
+            try:
+                status, keep_alive = await asyncio.wait_for(
+                    self._request(reader, writer, body, headers), self.timeout)
+            except BaseException:
+                writer.close()
+                raise
+            if keep_alive:
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+            return status
+
+    async def _request(self, reader, writer, body, headers):
+        lines = [f"POST {self.path} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                 "Content-Type: application/json; charset=utf-8",
+                 f"Content-Length: {len(body)}", "Connection: keep-alive"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+
+        # ข้าม interim responses (1xx เช่น 100 Continue) จนได้ response จริง
+        status, response_headers = await self._read_head(reader)
+        while 100 <= status < 200:
+            status, response_headers = await self._read_head(reader)
+
+        connection = response_headers.get('connection', '').lower()
+        keep_alive = connection != 'close'
+        length = response_headers.get('content-length')
+        if status in (204, 304):
+            pass  # ไม่มี body เสมอ แม้ไม่มี Content-Length
+        elif 'chunked' in response_headers.get('transfer-encoding', '').lower():
+            await self._read_chunked(reader)
+        elif length is not None:
+            await reader.readexactly(int(length))
+        elif connection == 'close':
+            await reader.read()  # body จบเมื่อ receiver ปิด connection
+        else:
+            keep_alive = False  # ไม่รู้ว่า body จบตรงไหน: ไม่ใช้ connection นี้ต่อ (ไม่รอ EOF)
+        return status, keep_alive
+
+    @staticmethod
+    async def _read_head(reader):
+        """(status, headers) ของ response หนึ่งรายการ"""
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed by receiver")
+        try:
+            status = int(status_line.split()[1])
+        except (IndexError, ValueError):
+            raise DeliveryError(f"status line ไม่ถูกต้อง: {status_line[:80]!r}") from None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return status, headers
+
+    @staticmethod
+    async def _read_chunked(reader):
+        """อ่าน body แบบ Transfer-Encoding: chunked จนถึง chunk สุดท้ายและ trailers"""
+        while True:
+            size_line = await reader.readline()
+            try:
+                size = int(size_line.split(b';')[0].strip(), 16)
+            except ValueError:
+                raise DeliveryError(f"chunk size ไม่ถูกต้อง: {size_line[:80]!r}") from None
+            if size == 0:
+                break
+            await reader.readexactly(size + 2)  # data + CRLF
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+class NotificationDispatcher:
+    """ส่ง alert records ไปยังหลายปลายทางแบบ batch
+
+    submit() ใส่ record ลง bounded queue ของทุกปลายทาง (รอเมื่อ queue เต็ม = backpressure)
+    แต่ละปลายทางรวม records เป็น batch ตาม max_batch/window แล้วส่งผ่าน connection pool
+    ล้มเหลวจะ retry แบบ exponential backoff + full jitter สูงสุด max_retries ครั้ง
+    records ที่ส่งสำเร็จเก็บเป็นลำดับที่ submit (เริ่มจาก 0) ใน self.delivered ต่อปลายทาง
+    """
+
+    def __init__(self, destinations, queue_size=10000, max_retries=4, base_delay=0.5,
+                 max_delay=30.0, timeout=10.0):
+        self.destinations = [d if isinstance(d, Destination) else Destination(d) for d in destinations]
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.metrics = {d.url: {'submitted': 0, 'sent': 0, 'failed': 0, 'batches': 0,
+                                'retries': 0, 'latency_total': 0.0, 'latency_max': 0.0}
+                        for d in self.destinations}
+        self.delivered = {d.url: [] for d in self.destinations}
+        self._submitted = 0
+        self._queues = {}
+        self._workers = []
+        self._pools = {}
+
+    async def start(self):
+        for destination in self.destinations:
+            queue = asyncio.Queue(maxsize=self.queue_size)
+            pool = ConnectionPool(destination.url, destination.pool_size, self.timeout)
+            self._queues[destination.url] = queue
+            self._pools[destination.url] = pool
+            self._workers.append(asyncio.create_task(self._batcher(destination, queue, pool)))
+        return self
+
+    async def submit(self, record):
+        """ส่ง record หนึ่งรายการเข้า queue ของทุกปลายทาง คืนลำดับที่ของ record"""
+        position = self._submitted
+        self._submitted += 1
+        for url, queue in self._queues.items():
+            await queue.put((position, record))
+            self.metrics[url]['submitted'] += 1
+        return position
+
+    async def close(self):
+        """รอส่งที่ค้างอยู่ให้หมด แล้วปิด workers และ connections"""
+        for queue in self._queues.values():
+            await queue.put(None)
+        await asyncio.gather(*self._workers)
+        for pool in self._pools.values():
+            pool.close()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _batcher(self, destination, queue, pool):
+        """รวม records เป็น batch ตาม max_batch / window แล้วส่ง (ส่งพร้อมกันได้ตาม pool_size)"""
+        in_flight = set()
+        done = False
+        while not done:
+            item = await queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + destination.window
+            while len(batch) < destination.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    done = True
+                    break
+                batch.append(item)
+
+            task = asyncio.create_task(self._deliver(destination, pool, batch))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+    async def _deliver(self, destination, pool, batch):
+        metrics = self.metrics[destination.url]
+        positions = [position for position, _ in batch]
+        body = json.dumps({'count': len(batch), 'alerts': [record for _, record in batch]},
+                          ensure_ascii=False, default=str).encode('utf-8')
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                status = await pool.post(body, destination.headers)
+                if status == 429 or status >= 500:
+                    raise DeliveryError(f"HTTP {status}")
+                if status >= 400:
+                    # 4xx อื่นๆ retry ไปก็ไม่ผ่าน
+                    metrics['failed'] += len(batch)
+                    print(f"⚠️ {destination.url} ปฏิเสธ batch: HTTP {status}")
+                    return False
+                latency = time.perf_counter() - started
+                metrics['sent'] += len(batch)
+                metrics['batches'] += 1
+                metrics['latency_total'] += latency
+                metrics['latency_max'] = max(metrics['latency_max'], latency)
+                self.delivered[destination.url].extend(positions)
+                return True
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError,
+                    ValueError, DeliveryError) as e:
+                if attempt == self.max_retries:
+                    metrics['failed'] += len(batch)
+                    print(f"⚠️ ส่งไป {destination.url} ไม่สำเร็จหลัง {attempt + 1} ครั้ง: {e}")
+                    return False
+                metrics['retries'] += 1
+                delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+                await asyncio.sleep(random.uniform(0, delay))
+
+    def report(self):
+        """metrics ต่อปลายทาง พร้อม latency เฉลี่ยต่อ batch"""
+        report = {}
+        for url, metrics in self.metrics.items():
+            report[url] = dict(metrics)
+            report[url]['latency_avg'] = (metrics['latency_total'] / metrics['batches']
+                                          if metrics['batches'] else 0.0)
+        return report
+
+    def delivered_all(self):
+        """list ของ bool ต่อ record (ตามลำดับที่ submit): True เมื่อส่งสำเร็จครบทุกปลายทาง"""
+        received = [0] * self._submitted
+        for positions in self.delivered.values():
+            for position in positions:
+                received[position] += 1
+        return [count == len(self.delivered) for count in received]
+
+
+async def dispatch_records(records, destinations, **options):
+    """ส่ง records ทั้งหมด (iterable) แล้วคืน (delivery metrics, delivered)
+
+    delivered = list ของ bool ต่อ record: True เมื่อส่งสำเร็จครบทุกปลายทาง
+    """
+    dispatcher = NotificationDispatcher(destinations, **options)
+    async with dispatcher:
+        for record in records:
+            await dispatcher.submit(record)
+    return dispatcher.report(), dispatcher.delivered_all()
+
+
+async def dispatch_alerts_async(engine, alerts, destinations, **options):
+    """ส่ง AlertTable/alerts ผ่าน dispatcher ภายใน event loop ที่รันอยู่ (เช่น alert_server)"""
+    records = engine.iter_alert_records(alerts)
+    return await dispatch_records(records, destinations, **options)
+
+
+def dispatch_alerts(engine, alerts, destinations, **options):
+    """ส่ง AlertTable/alerts ผ่าน dispatcher (เรียกจากโค้ด sync ได้) คืน (metrics, delivered)"""
+    return asyncio.run(dispatch_alerts_async(engine, alerts, destinations, **options))
+
+
+# responses ของ LocalReceiver ตามรูปแบบ reply
+REPLIES = {
+    'json': b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nConnection: keep-alive\r\n\r\n{}",
+    'no_content': b"HTTP/1.1 204 No Content\r\nConnection: keep-alive\r\n\r\n",
+    'chunked': (b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\nConnection: keep-alive\r\n\r\n"
+                b"2\r\n{\"\r\nc;ext=1\r\nok\": \"yes\"}\n\r\n0\r\nX-Trailer: 1\r\n\r\n"),
+    'close': b"HTTP/1.1 200 OK\r\nConnection: close\r\n\r\n{}",
+}
+
+
+class LocalReceiver:
+    """HTTP receiver จำลองบน localhost สำหรับทดสอบ dispatcher
+
+    เก็บ batches ที่ได้รับไว้ใน self.batches; fail_first=N ตอบ 503 ใน N requests แรก
+    reply เลือกรูปแบบ response: 'json' (Content-Length), 'no_content' (204 ไม่มี body),
+    'chunked' (Transfer-Encoding: chunked) หรือ 'close' (ไม่มีความยาว ปิด connection หลังตอบ)
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, fail_first=0, delay=0.0, reply='json'):
+        self.host = host
+        self.port = port
+        self.fail_first = fail_first
+        self.delay = delay
+        self.reply = reply
+        self.batches: List[list] = []
+        self.requests = 0
+        self.connections = 0
+        self._server = None
+        self._handlers = set()
+        self._writers = set()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/alerts"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self._server.close()
+        # ปิด connections ที่ค้างอยู่ ให้ handlers จบเองด้วย EOF
+        for writer in list(self._writers):
+            writer.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        task.add_done_callback(self._handlers.discard)
+        self._writers.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    if name.strip().lower() == 'content-length':
+                        length = int(value)
+                body = await reader.readexactly(length)
+                self.requests += 1
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+
+                if self.requests <= self.fail_first:
+                    writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 2\r\n"
+                                 b"Connection: keep-alive\r\n\r\n{}")
+                    await writer.drain()
+                    continue
+                self.batches.append(json.loads(body)['alerts'])
+                writer.write(REPLIES[self.reply])
+                await writer.drain()
+                if self.reply == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
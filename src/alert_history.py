@@ -0,0 +1,184 @@
+"""
+Alert History - เก็บ alerts ของทุกรอบการรันลงฐานข้อมูล SQLite
+พร้อม query สำหรับดูแนวโน้ม เวลาที่ใช้แก้ไข และ alerts ที่เกิดซ้ำ
+"""
+
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from alert_system import SEVERITY_LEVELS
+
+
+class AlertHistory:
+    """ฐานข้อมูลประวัติ alerts (หนึ่งแถวต่อ alert ต่อรอบการรัน)
+
+    มี index บน (project_id, alert_type, month), runs.run_at และ (identity, run_id)
+    query ต่างๆ จึงยังเร็วแม้มี alerts สะสมเป็นล้านรายการ
+    """
+
+    def __init__(self, path='data/processed/alert_history.sqlite'):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_at TEXT NOT NULL,
+                data_file TEXT,
+                total INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_runs_run_at ON runs (run_at);
+
+            CREATE TABLE IF NOT EXISTS alerts (
+                run_id INTEGER NOT NULL REFERENCES runs (run_id),
+                identity INTEGER NOT NULL,
+                project_id TEXT NOT NULL,
+                g_code TEXT,
+                s_code TEXT,
+                month INTEGER,
+                year INTEGER,
+                alert_type TEXT NOT NULL,
+                severity INTEGER NOT NULL,   -- 0 = Critical ตาม SEVERITY_LEVELS
+                actual_value REAL,
+                variance REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_alerts_project_type_month ON alerts (project_id, alert_type, month);
+            CREATE INDEX IF NOT EXISTS idx_alerts_run ON alerts (run_id);
+            CREATE INDEX IF NOT EXISTS idx_alerts_identity ON alerts (identity, run_id);
+        """)
+        self.conn.commit()
+
+    def record_run(self, alerts, run_at=None, data_file=None):
+        """เพิ่ม alerts ของหนึ่งรอบการรัน คืน run_id"""
+        run_at = (run_at or datetime.now()).isoformat()
+        cur = self.conn.cursor()
+        cur.execute("INSERT INTO runs (run_at, data_file, total) VALUES (?, ?, ?)",
+                    (run_at, data_file, len(alerts)))
+        run_id = cur.lastrowid
+
+        if alerts:
+            frame = alerts.to_frame()
+            records = pd.DataFrame({
+                'run_id': run_id,
+                'identity': alerts.identity_keys().view(np.int64),
+                'project_id': frame['project_id'].astype(object),
+                'g_code': frame['g_code'].astype(object),
+                's_code': frame['s_code'].astype(object),
+                'month': frame['month'].astype(int),
+                'year': frame['year'].astype(int),
+                'alert_type': frame['alert_type'].astype(object),
+                'severity': alerts.severity_code.astype(int),
+                'actual_value': frame['actual_value'],
+                'variance': frame['variance'],
+            })
+            records = records.astype(object).where(records.notna(), None)
+            cur.executemany("INSERT INTO alerts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            records.itertuples(index=False, name=None))
+        self.conn.commit()
+        return run_id
+
+    def runs(self):
+        """รายการ runs เรียงตามเวลา"""
+        return pd.read_sql_query("SELECT * FROM runs ORDER BY run_at, run_id", self.conn,
+                                 parse_dates=['run_at'])
+
+    def _where(self, project_id=None, g_code=None, s_code=None, alert_type=None, month=None):
+        clauses, params = [], []
+        for column, value in (('project_id', project_id), ('g_code', g_code), ('s_code', s_code),
+                              ('alert_type', alert_type), ('month', month)):
+            if value is not None:
+                clauses.append(f"a.{column} = ?")
+                params.append(value)
+        return (' AND '.join(clauses) or '1'), params
+
+    def project_trend(self, project_id, alert_type=None):
+        """จำนวน alerts ต่อ severity ในแต่ละรอบของ project (index = run_at)"""
+        where, params = self._where(project_id=project_id, alert_type=alert_type)
+        counts = pd.read_sql_query(f"""
+            SELECT r.run_at, a.severity, COUNT(*) AS alerts
+            FROM alerts a JOIN runs r ON r.run_id = a.run_id
+            WHERE {where}
+            GROUP BY a.run_id, a.severity
+        """, self.conn, params=params, parse_dates=['run_at'])
+        trend = counts.pivot_table(index='run_at', columns='severity', values='alerts', fill_value=0)
+        trend.columns = [SEVERITY_LEVELS[code] for code in trend.columns]
+        return trend.reindex(self.runs()['run_at'].drop_duplicates(), fill_value=0).astype(int)
+
+    def episodes(self, project_id=None, g_code=None, s_code=None, alert_type=None, month=None,
+                 severity=None):
+        """ช่วงที่ alert แต่ละ identity เปิดอยู่ต่อเนื่องกัน (รอบติดกัน)
+
+        severity='Critical' นับเฉพาะรอบที่ alert อยู่ในระดับนั้นหรือรุนแรงกว่า
+        resolved_at = เวลาของรอบแรกที่ alert หายไป (NaT = ยังเปิดอยู่)
+        """
+        where, params = self._where(project_id, g_code, s_code, alert_type, month)
+        if severity is not None:
+            where += " AND a.severity <= ?"
+            params.append(SEVERITY_LEVELS.index(severity))
+        seen = pd.read_sql_query(f"""
+            SELECT a.identity, a.run_id, a.project_id, a.g_code, a.s_code, a.month, a.year,
+                   a.alert_type, a.severity
+            FROM alerts a WHERE {where}
+        """, self.conn, params=params)
+
+        runs = self.runs()
+        ordinal = pd.Series(np.arange(len(runs)), index=runs['run_id'])
+        seen['ordinal'] = ordinal.reindex(seen['run_id']).to_numpy()
+        seen = seen.sort_values(['identity', 'ordinal'], kind='stable')
+
+        # episode ใหม่เมื่อ identity เปลี่ยนหรือรอบไม่ต่อเนื่อง
+        identity = seen['identity'].to_numpy()
+        step = seen['ordinal'].to_numpy()
+        new_episode = np.ones(len(seen), dtype=bool)
+        new_episode[1:] = (identity[1:] != identity[:-1]) | (step[1:] != step[:-1] + 1)
+        seen['episode'] = np.cumsum(new_episode)
+
+        episodes = seen.groupby('episode', sort=False).agg(
+            identity=('identity', 'first'), project_id=('project_id', 'first'),
+            g_code=('g_code', 'first'), s_code=('s_code', 'first'), month=('month', 'first'),
+            year=('year', 'first'), alert_type=('alert_type', 'first'),
+            worst_severity=('severity', 'min'), first=('ordinal', 'min'), last=('ordinal', 'max'))
+
+        run_at = runs['run_at'].to_numpy()
+        episodes['opened_at'] = run_at[episodes['first'].to_numpy()]
+        next_run = episodes['last'].to_numpy() + 1
+        resolved = next_run < len(runs)
+        episodes['resolved_at'] = pd.NaT
+        episodes.loc[resolved, 'resolved_at'] = run_at[next_run[resolved]]
+        episodes['resolved_at'] = pd.to_datetime(episodes['resolved_at'])
+        episodes['runs'] = episodes['last'] - episodes['first'] + 1
+        episodes['worst_severity'] = [SEVERITY_LEVELS[code] for code in episodes['worst_severity']]
+        return episodes.drop(columns=['first', 'last']).reset_index(drop=True)
+
+    def time_to_resolve(self, **filters):
+        """เวลาที่ใช้ตั้งแต่ alert เปิดจนหายไป (เฉพาะ episodes ที่ resolve แล้ว)"""
+        episodes = self.episodes(**filters)
+        resolved = episodes.dropna(subset=['resolved_at']).copy()
+        resolved['time_to_resolve'] = resolved['resolved_at'] - resolved['opened_at']
+        return resolved
+
+    def recurrence(self, **filters):
+        """identities ที่เปิดมากกว่าหนึ่งครั้ง พร้อมจำนวนครั้ง เรียงจากมากไปน้อย"""
+        episodes = self.episodes(**filters)
+        counts = episodes.groupby(
+            ['identity', 'project_id', 'g_code', 's_code', 'month', 'year', 'alert_type'],
+            dropna=False).size().rename('occurrences').reset_index()
+        return counts[counts['occurrences'] > 1].sort_values('occurrences', ascending=False)
+
+    def open_since(self, project_id, g_code=None, s_code=None, alert_type=None, severity='Critical'):
+        """alerts ที่ยังเปิดอยู่ในรอบล่าสุดและเปิดต่อเนื่องมาตั้งแต่เมื่อไร
+
+        เช่น open_since('PRJ003', g_code='G004') ตอบว่า PRJ003 G004 เป็น Critical มานานแค่ไหน
+        """
+        episodes = self.episodes(project_id=project_id, g_code=g_code, s_code=s_code,
+                                 alert_type=alert_type, severity=severity)
+        current = episodes[episodes['resolved_at'].isna()].copy()
+        last_run = self.runs()['run_at'].max()
+        current['open_for'] = last_run - current['opened_at']
+        return current.sort_values('opened_at')
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,128 @@
+"""
+Alert Metrics - เก็บเวลาและตัวนับของ SimpleAlertEngine ต่อ phase และต่อ rule
+เปิดใช้โดยกำหนด engine.metrics = EngineMetrics() (ค่า default None = ไม่เก็บอะไรเลย)
+ส่งออกได้ทั้งแบบ dict และ Prometheus text format (สำหรับ node_exporter textfile collector)
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+# ตัวนับที่เก็บต่อ phase/rule
+COUNTERS = ['calls', 'seconds', 'rows', 'alerts', 'errors']
+
+# ชื่อ metric, คำอธิบาย ต่อ counter (ขึ้นต้นด้วย alert_engine_<phase|rule>_)
+METRIC_HELP = {
+    'calls': ('calls_total', "จำนวนครั้งที่เรียก"),
+    'seconds': ('seconds_total', "เวลาที่ใช้ (วินาที)"),
+    'rows': ('rows_total', "จำนวนแถวที่ประเมิน"),
+    'alerts': ('alerts_total', "จำนวน alerts ที่เกิด"),
+    'errors': ('errors_total', "จำนวน exceptions"),
+}
+
+
+def _new_stats():
+    return {counter: 0 for counter in COUNTERS}
+
+
+class EngineMetrics:
+    """ตัวนับสะสมของ engine: phases (load_data, evaluate, export, ...) และ rules (check ต่อ alert_type)
+
+    ทุกค่าเป็น counter สะสมข้ามรอบ (เหมาะกับ watch mode) เรียก reset() เพื่อเริ่มใหม่
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.rules = {}
+        self.started_at = time.time()
+
+    def reset(self):
+        self.phases.clear()
+        self.rules.clear()
+        self.started_at = time.time()
+
+    def _record(self, group, name, seconds, rows=0, alerts=0, errors=0):
+        stats = group.setdefault(name, _new_stats())
+        stats['calls'] += 1
+        stats['seconds'] += seconds
+        stats['rows'] += rows
+        stats['alerts'] += alerts
+        stats['errors'] += errors
+
+    @contextmanager
+    def _timed(self, group, name):
+        """จับเวลา block; body ใส่ rows/alerts ลงใน dict ที่ได้รับ, exception นับเป็น errors"""
+        counts = {'rows': 0, 'alerts': 0, 'errors': 0}
+        start = time.perf_counter()
+        try:
+            yield counts
+        except Exception:
+            counts['errors'] += 1
+            raise
+        finally:
+            self._record(group, name, time.perf_counter() - start, **counts)
+
+    def phase(self, name):
+        """context manager จับเวลา phase ของ engine"""
+        return self._timed(self.phases, name)
+
+    def rule(self, name):
+        """context manager จับเวลา rule หนึ่งตัว (โหมด vectorized)"""
+        return self._timed(self.rules, name)
+
+    def record_rule(self, name, seconds, rows, alerts, errors=0):
+        """บันทึกผลของ check function (โหมดทีละแถว ซึ่งจับเวลาเองต่อแถว)"""
+        self._record(self.rules, name, seconds, rows, alerts, errors)
+
+    def add_rule_alerts(self, name, alerts):
+        self.rules.setdefault(name, _new_stats())['alerts'] += alerts
+
+    def to_dict(self):
+        """{'phases': {...}, 'rules': {...}} พร้อม rows_per_second ต่อรายการ"""
+        def with_rate(group):
+            result = {}
+            for name, stats in group.items():
+                stats = dict(stats)
+                stats['rows_per_second'] = stats['rows'] / stats['seconds'] if stats['seconds'] > 0 else None
+                result[name] = stats
+            return result
+
+        return {
+            'started_at': self.started_at,
+            'phases': with_rate(self.phases),
+            'rules': with_rate(self.rules),
+        }
+
+    def to_prometheus(self, prefix='alert_engine'):
+        """metrics ใน Prometheus text exposition format"""
+        lines = []
+        for group_name, label, group in (('phase', 'phase', self.phases), ('rule', 'rule', self.rules)):
+            for counter in COUNTERS:
+                suffix, help_text = METRIC_HELP[counter]
+                metric = f"{prefix}_{group_name}_{suffix}"
+                lines.append(f"# HELP {metric} {help_text} ต่อ {group_name}")
+                lines.append(f"# TYPE {metric} counter")
+                for name, stats in group.items():
+                    lines.append(f'{metric}{{{label}="{name}"}} {stats[counter]}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path, prefix='alert_engine'):
+        """เขียน Prometheus text file แบบ atomic (เขียนไฟล์ชั่วคราวแล้ว rename)"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus(prefix))
+        os.replace(temp_path, path)
+        return path
+
+    def print_report(self):
+        """ตารางสรุปเวลา/ตัวนับต่อ phase และ rule"""
+        for title, group in (('Phases', self.phases), ('Rules', self.rules)):
+            if not group:
+                continue
+            print(f"⏱️ {title}:")
+            for name, stats in group.items():
+                print(f"   • {name:<22} {stats['seconds'] * 1000:10.1f} ms  calls {stats['calls']:>4}  "
+                      f"rows {stats['rows']:>10,}  alerts {stats['alerts']:>8,}  errors {stats['errors']}")
@@ -0,0 +1,254 @@
+"""
+Alert Server - HTTP API แบบ asyncio สำหรับอ่าน alerts โดยไม่ต้องรัน alert_system.py ใหม่
+ใช้เฉพาะ standard library + engine เดิม ทำงานบน localhost
+
+Endpoints:
+    GET /alerts?project=PRJ001&severity=Critical&type=cost_overrun&g_code=G001&month=6&limit=100&offset=0
+    GET /alerts?project=PRJ002&month=6-9&count=1   (เฉพาะจำนวน)
+    GET /summary
+    GET /top?n=10
+    GET /health
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+from alert_system import SimpleAlertManager
+
+STATUS_TEXT = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class AlertServer:
+    """HTTP server ที่เก็บ alerts ที่ประเมินแล้วไว้ในหน่วยความจำ
+
+    background task ตรวจ data file ทุก refresh_interval วินาทีและประเมินใหม่แบบ incremental
+    พร้อมสร้าง index/summary ใน thread แยก ระหว่างนั้น readers ยังอ่าน snapshot เดิมได้
+    (AlertTable ไม่ถูกแก้ไข) แล้วจึงสลับ snapshot ใหม่ทีเดียว responses ถูก cache ตาม version
+    """
+
+    def __init__(self, manager=None, host='127.0.0.1', port=8765, refresh_interval=30.0,
+                 cache_size=256):
+        self.manager = manager or SimpleAlertManager()
+        self.host = host
+        self.port = port
+        self.refresh_interval = refresh_interval
+        self.cache_size = cache_size
+        self.alerts = None
+        self.index = None
+        self.summary = {"total": 0}
+        self.version = 0
+        self._signature = None
+        self._responses = OrderedDict()
+
+    # === Data ===
+    def _evaluate(self):
+        """โหลดและประเมิน alerts แล้วสร้าง snapshot (alerts, index, summary) - รันใน thread pool
+
+        คืน None ถ้า data file ไม่เปลี่ยน
+        """
+        signature = self.manager._file_signature()
+        if signature is not None and signature == self._signature:
+            return None
+        self.manager.run_check(incremental=True)
+        self._signature = signature
+        return self._snapshot()
+
+    def _snapshot(self):
+        engine = self.manager.engine
+        return engine.alerts, engine.alert_index(), engine.get_alert_summary()
+
+    def _publish(self, snapshot=None):
+        """สลับ snapshot ที่ readers เห็นเป็นผลล่าสุด (ไม่มี snapshot = สร้างจาก engine ตอนนี้)"""
+        self.alerts, self.index, self.summary = snapshot or self._snapshot()
+        self.version += 1
+        self._responses.clear()
+
+    async def refresh(self):
+        loop = asyncio.get_running_loop()
+        snapshot = await loop.run_in_executor(None, self._evaluate)
+        if snapshot is not None:
+            self._publish(snapshot)
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"⚠️ Refresh failed: {e}")
+
+    # === Queries ===
+    def _filters(self, params):
+        """เงื่อนไขของ AlertIndex จาก query string (month รับทั้ง 6 และช่วง 6-9)"""
+        months = None
+        if 'month' in params:
+            months = []
+            for value in params['month']:
+                first, _, last = value.partition('-')
+                months.extend(range(int(first), int(last or first) + 1))
+        return {
+            'project': params.get('project'),
+            'alert_type': params.get('type'),
+            'severity': params.get('severity'),
+            'g_code': params.get('g_code'),
+            'month': months,
+        }
+
+    @staticmethod
+    def _count_param(params, name, default):
+        """ค่าจำนวนเต็มที่ไม่ติดลบจาก query string (ValueError = 400)"""
+        value = int(params.get(name, [str(default)])[0])
+        if value < 0:
+            raise ValueError(f"{name} must be >= 0")
+        return value
+
+    def _filter(self, params):
+        """ตำแหน่งของ alerts ที่ตรงกับ project/severity/type/g_code/month (ผ่าน inverted index)"""
+        return self.index.match(**self._filters(params))
+
+    def _route(self, path, params):
+        """คืน (status, payload) ตาม path"""
+        if path == '/health':
+            return 200, {'status': 'ok', 'version': self.version, 'alerts': self.summary['total']}
+        if self.alerts is None or self.index is None:
+            return 503, {'error': 'alerts not loaded yet'}
+        if path == '/summary':
+            return 200, dict(self.summary, version=self.version)
+        if path == '/top':
+            n = self._count_param(params, 'n', 10)
+            top = self.manager.engine.top_alerts(n, alerts=self.alerts)
+            return 200, {'alerts': list(self.manager.engine.iter_alert_records(top))}
+        if path == '/alerts':
+            if params.get('count', ['0'])[0] not in ('0', ''):
+                return 200, {'total': self.index.count(**self._filters(params))}
+            selected = self._filter(params)
+            offset = self._count_param(params, 'offset', 0)
+            limit = self._count_param(params, 'limit', 100)
+            page = self.alerts.take(selected[offset:offset + limit])
+            return 200, {
+                'total': len(selected),
+                'offset': offset,
+                'alerts': list(self.manager.engine.iter_alert_records(page))
+            }
+        return 404, {'error': f'unknown path {path}'}
+
+    def _response_body(self, target, use_gzip):
+        """(status, body, etag) - ใช้ cache ถ้า version และ query เดิม"""
+        key = (self.version, target, use_gzip)
+        cached = self._responses.get(key)
+        if cached is not None:
+            self._responses.move_to_end(key)
+            return cached
+
+        url = urlsplit(target)
+        try:
+            status, payload = self._route(url.path, parse_qs(url.query))
+        except (ValueError, IndexError) as e:
+            status, payload = 400, {'error': str(e)}
+        except Exception as e:
+            print(f"⚠️ Error ที่ {target}: {e!r}")
+            status, payload = 500, {'error': 'internal server error'}
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        # ETag แยกตาม encoding (representation ของ gzip ไม่ใช่ bytes เดียวกับแบบปกติ)
+        etag = f'"{self.version}-{hashlib.blake2b(body, digest_size=8).hexdigest()}{"-gz" if use_gzip else ""}"'
+        if use_gzip:
+            body = gzip.compress(body, compresslevel=5)
+
+        result = (status, body, etag)
+        if status == 200:
+            self._responses[key] = result
+            if len(self._responses) > self.cache_size:
+                self._responses.popitem(last=False)
+        return result
+
+    # === HTTP ===
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    await self._write(writer, 400, b'{"error": "bad request"}', None, False, False)
+                    break
+                method, target, version = parts
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and version == 'HTTP/1.1')
+
+                if method not in ('GET', 'HEAD'):
+                    await self._write(writer, 405, b'{"error": "method not allowed"}', None, False, keep_alive)
+                else:
+                    use_gzip = 'gzip' in headers.get('accept-encoding', '')
+                    status, body, etag = self._response_body(target, use_gzip)
+                    if status == 200 and headers.get('if-none-match') == etag:
+                        status, body = 304, b''
+                    await self._write(writer, status, b'' if method == 'HEAD' else body,
+                                      etag, use_gzip and status == 200, keep_alive,
+                                      content_length=len(body))
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _write(self, writer, status, body, etag, gzipped, keep_alive, content_length=None):
+        headers = [
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(body) if content_length is None else content_length}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+            "Cache-Control: no-cache",
+        ]
+        if etag:
+            # response ที่มี ETag ขึ้นกับ Accept-Encoding เสมอ (รวม 304 และแบบไม่ gzip)
+            headers.append(f"ETag: {etag}")
+            headers.append("Vary: Accept-Encoding")
+        if gzipped:
+            headers.append("Content-Encoding: gzip")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+
+    async def serve_forever(self):
+        await self.refresh()
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        refresher = asyncio.create_task(self._refresh_loop())
+        print(f"🌐 Alert API: http://{self.host}:{self.port}/alerts (refresh ทุก {self.refresh_interval}s)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            refresher.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP API สำหรับ alerts")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--refresh', type=float, default=30.0, help="ตรวจข้อมูลใหม่ทุกกี่วินาที")
+    args = parser.parse_args(argv)
+
+    server = AlertServer(host=args.host, port=args.port, refresh_interval=args.refresh)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("\n👋 หยุด server")
+
+
+if __name__ == "__main__":
+    main()
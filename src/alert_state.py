@@ -0,0 +1,132 @@
+"""
+Alert State Store - จำ alerts ที่แจ้งเตือนไปแล้วข้ามรอบการรัน
+ใช้ SQLite (มากับ Python) เพื่อกัน alerts ซ้ำ: แจ้งซ้ำเมื่อพ้น cooldown หรือเมื่อ severity สูงขึ้น
+"""
+
+import sqlite3
+import time
+
+import numpy as np
+
+
+class AlertStateStore:
+    """State store ของ alerts ที่ส่งแจ้งเตือนแล้ว keyed ด้วย alert identity hash
+
+    identity = (project_id, g_code, s_code, month, year, alert_type) จาก
+    AlertTable.identity_keys() เป็น INTEGER PRIMARY KEY จึง lookup ได้ต่อ alert
+    ในเวลาคงที่ (ทั้งชุดทำเป็น batch join ครั้งเดียว)
+    """
+
+    def __init__(self, path='data/processed/alert_state.sqlite', cooldown_hours=24):
+        self.path = path
+        self.cooldown = cooldown_hours * 3600
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS alert_state (
+                key INTEGER PRIMARY KEY,
+                severity INTEGER NOT NULL,      -- severity code ที่แจ้งล่าสุด (0 = Critical)
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                last_notified REAL NOT NULL,
+                notify_count INTEGER NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def filter_notifiable(self, alerts, now=None, record=True):
+        """คืน AlertTable ย่อยของ alerts ที่ควรแจ้งเตือน
+
+        แจ้งเมื่อ: ไม่เคยเห็น, severity สูงขึ้นกว่าที่แจ้งไว้ (escalation) หรือพ้น cooldown แล้ว
+        record=True บันทึกการแจ้งเตือนและ last_seen ลง store ทันที
+        record=False ไม่แก้ store (ส่งจริงแล้วค่อยเรียก record_notified กับรายการที่ส่งสำเร็จ)
+        """
+        if not alerts:
+            return alerts
+        now = time.time() if now is None else now
+        keys = alerts.identity_keys().view(np.int64)
+        severity = alerts.severity_code.astype(np.int64)
+
+        cur = self._stage(keys)
+        rows = cur.execute("""
+            SELECT i.pos, s.severity, s.last_notified
+            FROM incoming i JOIN alert_state s ON s.key = i.key
+        """).fetchall()
+
+        known = np.zeros(len(keys), dtype=bool)
+        last_severity = np.full(len(keys), np.iinfo(np.int64).max)
+        last_notified = np.zeros(len(keys))
+        if rows:
+            pos, sev, notified = (np.array(col) for col in zip(*rows))
+            known[pos] = True
+            last_severity[pos] = sev
+            last_notified[pos] = notified
+
+        notify = ~known | (severity < last_severity) | (now - last_notified >= self.cooldown)
+        notify &= self._first(keys)
+
+        if record:
+            self._record(cur, keys, severity, notify, now)
+        return alerts.take(notify)
+
+    def record_notified(self, alerts, notified, now=None):
+        """บันทึกว่า notified (AlertTable ย่อยของ alerts ที่ส่งสำเร็จ) ถูกแจ้งแล้ว
+
+        alerts ทั้งหมดถูกปรับ last_seen; alerts ที่ส่งไม่สำเร็จจะถูกแจ้งอีกในรอบถัดไป
+        """
+        if not alerts:
+            return
+        now = time.time() if now is None else now
+        keys = alerts.identity_keys().view(np.int64)
+        severity = alerts.severity_code.astype(np.int64)
+        notify = np.zeros(len(keys), dtype=bool)
+        if notified:
+            notify = np.isin(keys, notified.identity_keys().view(np.int64))
+        notify &= self._first(keys)
+        self._record(self._stage(keys), keys, severity, notify, now)
+
+    def _stage(self, keys):
+        """ใส่ keys ลง temp table incoming (สำหรับ join กับ alert_state)"""
+        cur = self.conn.cursor()
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS incoming (key INTEGER PRIMARY KEY, pos INTEGER)")
+        cur.execute("DELETE FROM incoming")
+        cur.executemany("INSERT OR IGNORE INTO incoming VALUES (?, ?)",
+                        zip(keys.tolist(), range(len(keys))))
+        return cur
+
+    @staticmethod
+    def _first(keys):
+        """key ซ้ำใน batch เดียวกัน นับเฉพาะรายการแรก"""
+        _, first = np.unique(keys, return_index=True)
+        unique = np.zeros(len(keys), dtype=bool)
+        unique[first] = True
+        return unique
+
+    def _record(self, cur, keys, severity, notify, now):
+        cur.executemany("""
+            INSERT INTO alert_state VALUES (?, ?, ?, ?, ?, 1)
+            ON CONFLICT(key) DO UPDATE SET
+                severity = excluded.severity,
+                last_seen = excluded.last_seen,
+                last_notified = excluded.last_notified,
+                notify_count = notify_count + 1
+        """, ((k, s, now, now, now) for k, s in zip(keys[notify].tolist(), severity[notify].tolist())))
+        cur.execute("""
+            UPDATE alert_state SET last_seen = ?
+            WHERE key IN (SELECT key FROM incoming)
+        """, (now,))
+        self.conn.commit()
+
+    def forget(self, older_than_days=90):
+        """ลบ alerts ที่ไม่เห็นมานานกว่าที่กำหนด"""
+        cutoff = time.time() - older_than_days * 86400
+        cur = self.conn.execute("DELETE FROM alert_state WHERE last_seen < ?", (cutoff,))
+        self.conn.commit()
+        return cur.rowcount
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM alert_state").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
@@ -5,54 +5,1012 @@ Simple Alert System - ระบบแจ้งเตือนแบบง่า
 
 import pandas as pd
 import numpy as np
+import argparse
 import json
+import gzip
+import hashlib
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
-from dataclasses import dataclass
-from typing import List, Dict
+from dataclasses import dataclass, field
+from typing import Any, List, Dict
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # optional: ใช้เฉพาะ alert snapshots
+    pa = None
+
+try:
+    import inotify_simple
+except ImportError:  # optional: watch mode ใช้ polling แทน
+    inotify_simple = None
+
+# โฟลเดอร์เก็บ alert snapshots แยกตามเวลาที่รัน (run=YYYYmmddTHHMMSS.ffffff)
+SNAPSHOT_DIR = 'data/processed/alert_snapshots'
+
+# Template ของ message ต่อ alert_type - render เมื่อแสดงผลหรือ export เท่านั้น
+ALERT_TEMPLATES = {
+    'cost_overrun': "เกินงบประมาณ {value:.1f}% (งบ: {budget:,.0f}, ใช้: {actual:,.0f})",
+    'progress_lag': "ความคืบหน้าล่าช้า - ใช้เงิน {value:.1f}% เทียบกับความคืบหน้า",
+    'schedule_delay': "ล่าช้าจากแผน {value:.1f}% (ควรอยู่ที่ {expected_progress:.1f}%, อยู่ที่ {progress:.1f}%)",
+    'low_efficiency': "ประสิทธิภาพต่ำ {value:.1f} คะแนน (ต่ำกว่า {threshold})",
+    'cost_acceleration': "ค่าใช้จ่ายเร่งตัว +{value:.1f}% ของงบเทียบกับเดือนก่อน (เกณฑ์ {threshold})",
+    'cpi_decline': "CPI ลดลงต่อเนื่อง {value:.0f} เดือน",
+    'burn_rate': "อัตราการใช้เงินคาดว่าจะใช้ {value:.1f}% ของงบคงเหลือภายในสิ้นปี",
+    'actual_anomaly': "ค่าใช้จ่ายผิดปกติ {value:.1f} SD จากค่าปกติของ cost code/project (ใช้: {actual:,.0f})",
+    'cpi_anomaly': "CPI ผิดปกติ {value:.1f} SD จากค่าปกติของ cost code/project",
+    'utilization_anomaly': "การใช้งบผิดปกติ {value:.1f} SD จากค่าปกติของ cost code/project",
+}
+
+# details ต่อ alert_type: key ใน details -> field ใน context (ต่อท้าย cost_code, month)
+ALERT_DETAILS = {
+    'cost_overrun': {'budget': 'budget', 'actual': 'actual', 'progress': 'progress'},
+    'progress_lag': {'progress': 'progress', 'cost_ratio': 'value'},
+    'schedule_delay': {'expected_progress': 'expected_progress', 'actual_progress': 'progress'},
+    'low_efficiency': {'efficiency_score': 'value'},
+    'cost_acceleration': {'acceleration_pct': 'value', 'budget': 'budget', 'actual': 'actual'},
+    'cpi_decline': {'months_declining': 'value'},
+    'burn_rate': {'projected_vs_remaining_pct': 'value', 'budget': 'budget', 'actual': 'actual'},
+    'actual_anomaly': {'z_score': 'value', 'actual': 'actual'},
+    'cpi_anomaly': {'z_score': 'value'},
+    'utilization_anomaly': {'z_score': 'value', 'budget': 'budget', 'actual': 'actual'},
+}
+
+# columns ของแถวต้นทางที่ formatter ต้องใช้
+SOURCE_COLUMNS = ['g_code', 's_code', 'month', 'total_budget', 'total_actual', 'progress_percentage']
+
+# key ของแต่ละแถวใน master data และ columns ที่มีผลต่อผลลัพธ์ของ rules (ใช้ทำ fingerprint)
+KEY_COLUMNS = ['project_id', 'g_code', 's_code', 'month', 'year']
+INPUT_COLUMNS = ['project_name', 'total_budget', 'total_actual', 'progress_percentage', 'efficiency_score', 'cpi',
+                 'budget_utilization_pct']
+
+# หนึ่ง time series ต่อ cost code ของ project (trend rules ดูข้ามเดือนภายใน series เดียวกัน)
+SERIES_COLUMNS = ['project_id', 'g_code', 's_code']
+
+# columns ที่แต่ละ rule อ่าน (load_data โหลดเฉพาะ columns ของ rules ที่เปิดใช้)
+RULE_COLUMNS = {
+    'cost_overrun': ['total_budget', 'total_actual'],
+    'progress_lag': ['total_budget', 'total_actual', 'progress_percentage'],
+    'schedule_delay': ['month', 'progress_percentage'],
+    'low_efficiency': ['efficiency_score'],
+    'cost_acceleration': ['total_budget', 'total_actual'],
+    'cpi_decline': ['cpi'],
+    'burn_rate': ['total_budget', 'total_actual'],
+    'actual_anomaly': ['total_actual'],
+    'cpi_anomaly': ['cpi'],
+    'utilization_anomaly': ['budget_utilization_pct'],
+}
+
+# rules ที่แจ้งเตือนเมื่อค่าต่ำกว่า threshold (ที่เหลือแจ้งเมื่อเกิน)
+BELOW_THRESHOLD_RULES = {'low_efficiency'}
+
+# dtype ของ master_data.csv: ids/codes เป็น categorical, เงินและค่าที่ rules หลักใช้คำนวณ
+# เป็น float64 (ผลลัพธ์ต้องตรงกับเดิม), ratio/score อื่นเป็น float32 เมื่อ compact=True
+MASTER_SCHEMA = {
+    'project_id': 'category',
+    'project_name': 'category',
+    'g_code': 'category',
+    's_code': 'category',
+    'description': 'category',
+    'cost_code_description': 'category',
+    'health_status': 'category',
+    'performance_category': 'category',
+    'alert_severity': 'category',
+    'alert_level': 'category',
+    'month': 'int16',
+    'year': 'int16',
+    'quarter': 'int8',
+    'total_budget': 'float64',
+    'total_actual': 'float64',
+    'progress_percentage': 'float64',
+    'efficiency_score': 'float64',
+    'cpi': 'float32',
+    'spi': 'float32',
+    'budget_utilization_pct': 'float32',
+    'progress_cost_ratio': 'float32',
+    'cost_variance_pct': 'float32',
+    'cost_risk_score': 'float32',
+    'schedule_risk_score': 'float32',
+    'overall_risk_score': 'float32',
+    'risk_overrun': 'int8',
+    'risk_progress_lag': 'int8',
+    'risk_high_variance': 'int8',
+    'risk_forecast_overrun': 'int8',
+}
+
+
+class AlertFormatter:
+    """สร้าง message และ details จาก template ตาม alert_type แบบ lazy"""
+
+    def __init__(self, templates=None, details=None):
+        self.templates = templates or ALERT_TEMPLATES
+        self.details_fields = details or ALERT_DETAILS
+
+    def context(self, row, value, threshold):
+        """ค่าที่ template ใช้ได้ จากแถวต้นทาง (mapping) + ค่าของ alert"""
+        month = row.get('month')
+        return {
+            'value': value,
+            'threshold': threshold,
+            'budget': row.get('total_budget'),
+            'actual': row.get('total_actual'),
+            'progress': row.get('progress_percentage'),
+            'month': month,
+            'expected_progress': (month / 12) * 100 if month is not None else None,
+            'cost_code': f"{row.get('g_code')}-{row.get('s_code')}",
+        }
+
+    def message(self, alert_type, row, value, threshold):
+        return self.templates[alert_type].format(**self.context(row, value, threshold))
+
+    def details(self, alert_type, row, value, threshold):
+        return self._details(alert_type, self.context(row, value, threshold))
+
+    def _details(self, alert_type, context):
+        details = {'cost_code': context['cost_code'], 'month': context['month']}
+        for key, name in self.details_fields[alert_type].items():
+            details[key] = context[name]
+        return details
+
+    def render(self, alert_type, row, value, threshold):
+        """(message, details) จาก context เดียวกัน (ใช้ตอน export ทีละหลาย alerts)"""
+        context = self.context(row, value, threshold)
+        return self.templates[alert_type].format(**context), self._details(alert_type, context)
+
+
+ALERT_FORMATTER = AlertFormatter()
+
 
 @dataclass
 class SimpleAlert:
-    """Alert object แบบง่าย"""
+    """Alert object แบบง่าย
+
+    message และ details ไม่ถูกเก็บไว้ แต่ render จากแถวต้นทาง (source) เมื่อเรียกใช้
+    """
     project_id: str
     project_name: str
     alert_type: str
     severity: str  # Critical, High, Medium, Low
-    message: str
     actual_value: float
     threshold: float
     variance: float
-    details: Dict
+    source: Any = field(default=None, repr=False)
+
+    @property
+    def message(self):
+        return ALERT_FORMATTER.message(self.alert_type, self.source, self.actual_value, self.threshold)
+
+    @property
+    def details(self):
+        return ALERT_FORMATTER.details(self.alert_type, self.source, self.actual_value, self.threshold)
+
+# ลำดับของ list = code ที่เก็บใน AlertTable (severity code = ลำดับความรุนแรง)
+SEVERITY_LEVELS = ['Critical', 'High', 'Medium', 'Low']
+ALERT_TYPES = ['cost_overrun', 'progress_lag', 'schedule_delay', 'low_efficiency',
+               'cost_acceleration', 'cpi_decline', 'burn_rate',
+               'actual_anomaly', 'cpi_anomaly', 'utilization_anomaly']
+
+# rules ที่ดูแนวโน้มข้ามเดือน ต้องเปิดเอง (engine.enabled_rules หรือ --trend-rules)
+TREND_RULES = ['cost_acceleration', 'cpi_decline', 'burn_rate']
+
+# anomaly rules: z-score เทียบกับสถิติสะสมต่อ (g_code, s_code) และต่อ project ของเดือนก่อนหน้า
+# ต้องเปิดเอง (--anomaly-rules) - alert_type -> column ที่ใช้
+ANOMALY_METRICS = {
+    'actual_anomaly': 'total_actual',
+    'cpi_anomaly': 'cpi',
+    'utilization_anomaly': 'budget_utilization_pct',
+}
+ANOMALY_RULES = list(ANOMALY_METRICS)
+
+
+def _unique_keys(keys):
+    """keys ที่ซ้ำกันต่อท้ายด้วยลำดับที่พบ เพื่อให้ทุกค่าไม่ซ้ำ (keys ที่ไม่ซ้ำคงค่าเดิม)"""
+    if pd.Index(keys).has_duplicates:
+        occurrence = pd.Series(keys).groupby(keys).cumcount().to_numpy()
+        keys = pd.util.hash_pandas_object(
+            pd.DataFrame({'key': keys, 'occurrence': occurrence}), index=False).to_numpy()
+    return keys
+
+
+def row_keys(df):
+    """hash (uint64) ของ KEY_COLUMNS ต่อแถว (ถ้า key ซ้ำจะต่อด้วยลำดับที่พบ)"""
+    return _unique_keys(pd.util.hash_pandas_object(df[KEY_COLUMNS], index=False).to_numpy())
+
+
+def alert_identity(keys, type_code):
+    """hash (uint64) ของ identity ต่อ alert จาก row key + alert_type"""
+    return pd.util.hash_pandas_object(
+        pd.DataFrame({'row': keys, 'type': pd.Categorical.from_codes(type_code, ALERT_TYPES)}),
+        index=False).to_numpy()
+
+
+def match_keys(old_keys, new_keys):
+    """hash join: ตำแหน่งใน old_keys ของแต่ละ new_keys (-1 ถ้าไม่พบ) - old_keys ต้องไม่ซ้ำ"""
+    return pd.Index(old_keys).get_indexer(new_keys)
+
+
+def series_keys(df):
+    """hash (uint64) ของ SERIES_COLUMNS ต่อแถว - แถวของ cost code เดียวกันได้ค่าเดียวกัน"""
+    return pd.util.hash_pandas_object(df[SERIES_COLUMNS], index=False).to_numpy()
+
+
+def anomaly_keys(df):
+    """hash (uint64) ของ scopes ที่ anomaly rules เก็บสถิติ: ((g_code, s_code), project_id) ต่อแถว
+
+    ids เป็น categorical ก่อน hash เพื่อให้ค่าเดิมได้ key เดิมข้ามรอบ (stats ถูกบันทึกไว้)
+    """
+    codes = df[['g_code', 's_code']].astype('category')
+    projects = df[['project_id']].astype('category')
+    return (pd.util.hash_pandas_object(codes, index=False).to_numpy(),
+            pd.util.hash_pandas_object(projects, index=False).to_numpy())
+
+
+def _ordered_counts(codes, labels):
+    """นับจำนวนต่อ code เรียงตามลำดับที่พบครั้งแรก (เหมือน dict.get เดิม)"""
+    if len(codes) == 0:
+        return {}
+    uniques, first_index, counts = np.unique(codes, return_index=True, return_counts=True)
+    order = np.argsort(first_index)
+    return {labels[code]: int(count) for code, count in zip(uniques[order], counts[order])}
+
+
+class AlertView:
+    """มุมมองของ alert หนึ่งแถวใน AlertTable ใช้แทน SimpleAlert ได้
+
+    message และ details ถูก render ด้วย formatter ของ table เมื่อเรียกใช้เท่านั้น
+    """
+
+    __slots__ = ('_table', '_i')
+
+    def __init__(self, table, i):
+        self._table = table
+        self._i = i
+
+    @property
+    def row_index(self):
+        return int(self._table.row_index[self._i])
+
+    @property
+    def project_id(self):
+        return self._table.project_categories[self._table.project_code[self._i]]
+
+    @property
+    def project_name(self):
+        return self._table.project_name(self._i)
+
+    @property
+    def alert_type(self):
+        return ALERT_TYPES[self._table.type_code[self._i]]
+
+    @property
+    def severity(self):
+        return SEVERITY_LEVELS[self._table.severity_code[self._i]]
+
+    @property
+    def actual_value(self):
+        return float(self._table.actual_value[self._i])
+
+    @property
+    def threshold(self):
+        return self._table.thresholds[self.alert_type]
+
+    @property
+    def variance(self):
+        return float(self._table.variance[self._i])
+
+    @property
+    def message(self):
+        return self._table.formatter.message(
+            self.alert_type, self._table.source_row(self._i), self.actual_value, self.threshold)
+
+    @property
+    def details(self):
+        return self._table.formatter.details(
+            self.alert_type, self._table.source_row(self._i), self.actual_value, self.threshold)
+
+    def __repr__(self):
+        return (f"AlertView(project_id={self.project_id!r}, alert_type={self.alert_type!r}, "
+                f"severity={self.severity!r}, actual_value={self.actual_value:.2f}, row_index={self.row_index})")
+
+
+class AlertTable:
+    """เก็บ alerts แบบ columnar (NumPy arrays) แทน list ของ SimpleAlert
+
+    แต่ละ alert ใช้หน่วยความจำราว 30 bytes: row_index ชี้กลับไปยังแถวใน master frame,
+    alert_type/severity/project_id เก็บเป็น categorical codes ส่วน message/details
+    render แบบ lazy ผ่าน AlertView และ AlertFormatter
+    """
+
+    def __init__(self, source, row_index, type_code, severity_code, actual_value, variance,
+                 thresholds, formatter=None, project_code=None, project_categories=None):
+        self.source = source
+        self.row_index = np.asarray(row_index, dtype=np.int64)
+        self.type_code = np.asarray(type_code, dtype=np.int8)
+        self.severity_code = np.asarray(severity_code, dtype=np.int8)
+        self.actual_value = np.asarray(actual_value, dtype=np.float64)
+        self.variance = np.asarray(variance, dtype=np.float64)
+        self.thresholds = dict(thresholds)
+        self.formatter = formatter or ALERT_FORMATTER
+
+        if project_code is None:
+            codes, categories = pd.factorize(source['project_id'])
+            project_code = codes[self.row_index]
+            project_categories = list(categories)
+        self.project_code = np.asarray(project_code, dtype=np.int32)
+        self.project_categories = project_categories
+
+    @classmethod
+    def empty(cls, source, thresholds, formatter=None):
+        return cls(source, [], [], [], [], [], thresholds, formatter)
+
+    @classmethod
+    def concat(cls, source, tables, thresholds, formatter=None):
+        """รวมหลาย table ที่ row_index อ้างถึง source เดียวกัน แล้วเรียงตามแถวและลำดับ rule"""
+        if not tables:
+            return cls.empty(source, thresholds, formatter)
+        row_index = np.concatenate([t.row_index for t in tables])
+        type_code = np.concatenate([t.type_code for t in tables])
+        order = np.lexsort((type_code, row_index))
+        return cls(
+            source, row_index[order], type_code[order],
+            np.concatenate([t.severity_code for t in tables])[order],
+            np.concatenate([t.actual_value for t in tables])[order],
+            np.concatenate([t.variance for t in tables])[order],
+            thresholds, formatter
+        )
+
+    def __len__(self):
+        return len(self.row_index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield AlertView(self, i)
+
+    def __getitem__(self, key):
+        """int -> AlertView, mask/array ของตำแหน่ง -> AlertTable ย่อย"""
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(self)
+            if not 0 <= key < len(self):
+                raise IndexError('alert index out of range')
+            return AlertView(self, int(key))
+        return self.take(key)
+
+    def take(self, indexer):
+        """คืน AlertTable ย่อยตาม boolean mask, slice หรือ array ของตำแหน่ง"""
+        return AlertTable(
+            self.source, self.row_index[indexer], self.type_code[indexer],
+            self.severity_code[indexer], self.actual_value[indexer], self.variance[indexer],
+            self.thresholds, self.formatter, self.project_code[indexer], self.project_categories
+        )
+
+    def project_name(self, i):
+        row = self.row_index[i]
+        if 'project_name' in self.source.columns:
+            return self.source['project_name'].iat[row]
+        return f"Project {self.project_categories[self.project_code[i]]}"
+
+    def source_row(self, i):
+        """ค่าจากแถวต้นทางของ alert ที่ i เป็น Python scalars (สำหรับ formatter)"""
+        row = self.row_index[i]
+        values = {}
+        for column in SOURCE_COLUMNS:
+            if column in self.source.columns:
+                value = self.source[column].iat[row]
+                values[column] = value.item() if isinstance(value, np.generic) else value
+        return values
+
+    def identity_keys(self):
+        """hash (uint64) ของ identity ต่อ alert: (project_id, g_code, s_code, month, year, alert_type)"""
+        return alert_identity(row_keys(self.source)[self.row_index], self.type_code)
+
+    def key_frame(self):
+        """KEY_COLUMNS ของแถวต้นทางต่อ alert (index 0..n-1)"""
+        return self.source[KEY_COLUMNS].iloc[self.row_index].reset_index(drop=True)
+
+    def severity_counts(self):
+        return _ordered_counts(self.severity_code, SEVERITY_LEVELS)
+
+    def type_counts(self):
+        return _ordered_counts(self.type_code, ALERT_TYPES)
+
+    def project_counts(self):
+        return _ordered_counts(self.project_code, self.project_categories)
+
+    def month_counts(self):
+        if 'month' not in self.source.columns:
+            return {}
+        codes, months = pd.factorize(self.source['month'].to_numpy()[self.row_index])
+        return _ordered_counts(codes, [m.item() if isinstance(m, np.generic) else m for m in months])
+
+    def equals(self, other):
+        """เทียบผลลัพธ์สองชุด (เช่น vectorized vs row-by-row)"""
+        return (
+            len(self) == len(other)
+            and np.array_equal(self.row_index, other.row_index)
+            and np.array_equal(self.type_code, other.type_code)
+            and np.array_equal(self.severity_code, other.severity_code)
+            and np.array_equal(self.actual_value, other.actual_value, equal_nan=True)
+            and np.array_equal(self.variance, other.variance, equal_nan=True)
+        )
+
+    def iter_records(self, chunk_size=10000):
+        """export records (dict) ทีละ alert
+
+        ดึงค่าจากแถวต้นทางเป็น lists ครั้งเดียวต่อ chunk แทนการอ่านทีละ cell ผ่าน AlertView
+        และ render message/details จาก context เดียวกัน (AlertView ใช้สำหรับ alert เดี่ยว)
+        """
+        columns = [c for c in SOURCE_COLUMNS if c in self.source.columns]
+        has_name = 'project_name' in self.source.columns
+        for start in range(0, len(self), chunk_size):
+            stop = min(start + chunk_size, len(self))
+            rows = self.row_index[start:stop]
+            values = {column: self.source[column].iloc[rows].tolist() for column in columns}
+            names = self.source['project_name'].iloc[rows].tolist() if has_name else None
+            type_codes = self.type_code[start:stop].tolist()
+            severity_codes = self.severity_code[start:stop].tolist()
+            project_codes = self.project_code[start:stop].tolist()
+            actual_values = self.actual_value[start:stop].tolist()
+            variances = self.variance[start:stop].tolist()
+
+            for k in range(stop - start):
+                alert_type = ALERT_TYPES[type_codes[k]]
+                project_id = self.project_categories[project_codes[k]]
+                threshold = self.thresholds[alert_type]
+                row = {column: values[column][k] for column in columns}
+                message, details = self.formatter.render(alert_type, row, actual_values[k], threshold)
+                yield {
+                    'project_id': project_id,
+                    'project_name': names[k] if has_name else f"Project {project_id}",
+                    'alert_type': alert_type,
+                    'severity': SEVERITY_LEVELS[severity_codes[k]],
+                    'message': message,
+                    'actual_value': actual_values[k],
+                    'threshold': threshold,
+                    'variance': variances[k],
+                    'details': details
+                }
+
+    def to_frame(self):
+        """alerts เป็น DataFrame แบบแบน มี dtypes ชัดเจนและ strings เป็น categorical"""
+        columns = [c for c in ['project_name', 'g_code', 's_code', 'month', 'year', 'total_budget',
+                               'total_actual', 'progress_percentage'] if c in self.source.columns]
+        rows = self.source[columns].iloc[self.row_index]
+
+        def source_column(name, dtype):
+            if name not in rows.columns:
+                return pd.Series(np.nan, index=range(len(self)), dtype='float64' if dtype != 'category' else dtype)
+            return rows[name].astype(dtype).reset_index(drop=True)
+
+        threshold = np.array([self.thresholds.get(t, np.nan) for t in ALERT_TYPES], dtype=float)
+        return pd.DataFrame({
+            'row_index': self.row_index,
+            'project_id': pd.Categorical.from_codes(self.project_code, self.project_categories),
+            'project_name': source_column('project_name', 'category'),
+            'g_code': source_column('g_code', 'category'),
+            's_code': source_column('s_code', 'category'),
+            'month': source_column('month', 'int16'),
+            'year': source_column('year', 'int16'),
+            'alert_type': pd.Categorical.from_codes(self.type_code, ALERT_TYPES),
+            'severity': pd.Categorical.from_codes(self.severity_code, SEVERITY_LEVELS, ordered=True),
+            'actual_value': self.actual_value,
+            'threshold': threshold[self.type_code],
+            'variance': self.variance,
+            'budget': source_column('total_budget', 'float64'),
+            'actual': source_column('total_actual', 'float64'),
+            'progress': source_column('progress_percentage', 'float64'),
+        })
+
+    def memory_usage(self):
+        """จำนวน bytes ที่ใช้โดย columns ของ table"""
+        return sum(a.nbytes for a in (self.row_index, self.type_code, self.severity_code,
+                                      self.project_code, self.actual_value, self.variance))
+
+    def __repr__(self):
+        return f"AlertTable({len(self)} alerts, {self.memory_usage():,} bytes)"
+
+
+@dataclass
+class AlertDelta:
+    """การเปลี่ยนแปลงของ alerts ระหว่างรอบก่อนกับรอบปัจจุบัน"""
+    added: AlertTable
+    resolved: AlertTable  # อ้างถึง master frame ของรอบก่อน
+    severity_changed: AlertTable
+    previous_severity: np.ndarray  # severity code เดิมของ severity_changed
+    rows_evaluated: int
+    rows_total: int
+
+    def summary(self):
+        return {
+            'added': len(self.added),
+            'resolved': len(self.resolved),
+            'severity_changed': len(self.severity_changed),
+            'rows_evaluated': self.rows_evaluated,
+            'rows_total': self.rows_total
+        }
+
+
+# ประเภทการเปลี่ยนแปลงใน AlertDiff.changes
+CHANGE_TYPES = ['new', 'resolved', 'escalated', 'de-escalated']
+
+
+@dataclass
+class AlertDiff:
+    """alerts ที่เปลี่ยนเทียบกับรอบก่อน (ผลของ SimpleAlertEngine.diff_alerts)"""
+    changes: pd.DataFrame  # หนึ่งแถวต่อ alert: change, KEY_COLUMNS, alert_type, severity, previous_severity
+    counts: Dict[str, int]  # new/resolved/escalated/de-escalated/unchanged
+
+    def summary(self):
+        return dict(self.counts)
+
+
+@dataclass
+class ThresholdSweep:
+    """ผลของ SimpleAlertEngine.sweep_thresholds: จำนวน alerts ต่อ config"""
+    configs: List[Dict]  # {'thresholds': {...}, 'severity_cutoffs': {...}} แบบเต็มต่อ config
+    counts: np.ndarray  # (configs, ALERT_TYPES, SEVERITY_LEVELS)
+    project_counts: np.ndarray  # (configs, projects)
+    projects: List[str]
+
+    def __len__(self):
+        return len(self.configs)
+
+    def totals(self):
+        return self.counts.sum(axis=(1, 2))
+
+    def summary(self, i):
+        """สรุปของ config ที่ i ในรูปแบบเดียวกับ get_alert_summary (เฉพาะค่าที่ไม่เป็นศูนย์)"""
+        counts = self.counts[i]
+        by_severity = counts.sum(axis=0)
+        by_type = counts.sum(axis=1)
+        return {
+            'total': int(counts.sum()),
+            'by_severity': {level: int(n) for level, n in zip(SEVERITY_LEVELS, by_severity) if n},
+            'by_type': {alert_type: int(n) for alert_type, n in zip(ALERT_TYPES, by_type) if n},
+            'by_project': {project: int(n) for project, n in zip(self.projects, self.project_counts[i]) if n}
+        }
+
+    def to_frame(self):
+        """หนึ่งแถวต่อ config: thresholds, cutoffs, total และจำนวนต่อ severity/type"""
+        rows = []
+        for config, counts in zip(self.configs, self.counts):
+            row = {}
+            for alert_type in ALERT_TYPES:
+                row[f"{alert_type}_threshold"] = config['thresholds'][alert_type]
+                critical, high = config['severity_cutoffs'][alert_type]
+                row[f"{alert_type}_critical"], row[f"{alert_type}_high"] = critical, high
+            row['total'] = int(counts.sum())
+            row.update({level: int(n) for level, n in zip(SEVERITY_LEVELS, counts.sum(axis=0))})
+            row.update({alert_type: int(n) for alert_type, n in zip(ALERT_TYPES, counts.sum(axis=1))})
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+
+def threshold_grid(thresholds=None, severity_cutoffs=None):
+    """cartesian product ของค่าที่จะลอง เช่น threshold_grid({'cost_overrun': [100, 110]},
+    {'cost_overrun': [(130, 115), (140, 120)]}) -> 4 configs สำหรับ sweep_thresholds"""
+    axes = [('thresholds', rule, values) for rule, values in (thresholds or {}).items()]
+    axes += [('severity_cutoffs', rule, values) for rule, values in (severity_cutoffs or {}).items()]
+    grid = []
+    for combination in itertools.product(*[values for _, _, values in axes]):
+        config = {'thresholds': {}, 'severity_cutoffs': {}}
+        for (group, rule, _), value in zip(axes, combination):
+            config[group][rule] = value
+        grid.append(config)
+    return grid
+
+
+# ระดับของ roll-up tree (ระดับ 0 = ทั้ง portfolio)
+ROLLUP_LEVELS = ['portfolio', 'project_id', 'g_code', 's_code']
+
+
+class AlertRollup:
+    """สรุป alerts แบบ tree: portfolio -> project -> g_code -> s_code
+
+    ต่อ node เก็บจำนวน alerts, severity ที่แย่ที่สุด และ overrun รวม (total_actual - total_budget
+    ที่เกินงบ นับครั้งเดียวต่อแถวต้นทางแม้มีหลาย alerts) สร้างด้วยการ sort alerts ครั้งเดียวตาม
+    (project, g_code, s_code) แล้วทุกระดับเป็นช่วงต่อเนื่องกัน ใช้ reduceat ต่อระดับ
+    children ของ node เป็นช่วง [child_start, child_end) ของระดับถัดไป จึงขยาย node ได้โดยไม่คำนวณใหม่
+    """
+
+    def __init__(self, labels, counts, worst, overrun, child_start, child_end, names=None):
+        self.labels = labels  # ต่อระดับ: labels ของ node (portfolio = [None])
+        self.counts = counts
+        self.worst = worst  # severity code ที่แย่ที่สุด (0 = Critical)
+        self.overrun = overrun
+        self.child_start = child_start  # ต่อระดับ (ยกเว้นระดับล่างสุด)
+        self.child_end = child_end
+        self.names = names or {}  # project_id -> project_name
+        self._paths = None
+
+    @classmethod
+    def build(cls, table):
+        """สร้าง tree จาก AlertTable"""
+        source, rows = table.source, table.row_index
+        n = len(table)
+        codes = [table.project_code.astype(np.int64)]
+        labels = [list(table.project_categories)]
+        for column in ('g_code', 's_code'):
+            if column in source.columns:
+                # factorize ทั้ง column (เร็วกับ arrow strings/categorical) แล้วเลือกแถวของ alerts
+                column_codes, uniques = pd.factorize(source[column], sort=True, use_na_sentinel=False)
+                column_codes = column_codes[rows]
+            else:
+                column_codes, uniques = np.zeros(n, dtype=np.int64), [None]
+            codes.append(column_codes.astype(np.int64))
+            labels.append([None if pd.isna(u) else u for u in uniques])
+
+        # key ผสมของแต่ละระดับ: project, (project, g_code), (project, g_code, s_code)
+        level_keys, key = [], np.zeros(n, dtype=np.int64)
+        for level_codes, level_labels in zip(codes, labels):
+            key = key * max(len(level_labels), 1) + level_codes
+            level_keys.append(key)
+        order = np.argsort(level_keys[-1], kind='stable')
+
+        severity = table.severity_code[order]
+        overrun = np.zeros(n)
+        if n and 'total_actual' in source.columns and 'total_budget' in source.columns:
+            # หลาย alerts ของแถวเดียวกันนับ overrun ครั้งเดียว
+            unique_rows, first = np.unique(rows, return_index=True)
+            excess = (source['total_actual'].iloc[unique_rows].to_numpy(dtype=float)
+                      - source['total_budget'].iloc[unique_rows].to_numpy(dtype=float))
+            overrun[first] = np.clip(np.nan_to_num(excess), 0, None)
+        overrun = overrun[order]
+
+        starts = [np.zeros(min(n, 1), dtype=np.int64)]
+        node_labels = [[None]]
+        for level_key, level_codes, level_labels in zip(level_keys, codes, labels):
+            sorted_key = level_key[order]
+            level_start = np.flatnonzero(np.r_[True, sorted_key[1:] != sorted_key[:-1]]) if n else \
+                np.zeros(0, dtype=np.int64)
+            starts.append(level_start)
+            node_labels.append([level_labels[c] for c in level_codes[order][level_start]])
+
+        counts, worst, totals, child_start, child_end = [], [], [], [], []
+        for depth, level_start in enumerate(starts):
+            counts.append(np.diff(np.append(level_start, n)))
+            worst.append(np.minimum.reduceat(severity, level_start) if n else np.zeros(0, dtype=np.int8))
+            totals.append(np.add.reduceat(overrun, level_start) if n else np.zeros(0))
+            if depth + 1 < len(starts):
+                child = starts[depth + 1]
+                child_start.append(np.searchsorted(child, level_start))
+                child_end.append(np.append(child_start[-1][1:], len(child)))
+
+        names = {}
+        if n and 'project_name' in source.columns:
+            first_rows = rows[order][starts[1]]
+            names = dict(zip(node_labels[1], source['project_name'].iloc[first_rows].tolist()))
+        return cls(node_labels, counts, worst, totals, child_start, child_end, names)
+
+    def node(self, depth, i):
+        """node ที่ i ของระดับ depth เป็น dict"""
+        label = self.labels[depth][i]
+        node = {
+            'level': ROLLUP_LEVELS[depth],
+            'key': label,
+            'alerts': int(self.counts[depth][i]),
+            'worst_severity': SEVERITY_LEVELS[self.worst[depth][i]],
+            'overrun': float(self.overrun[depth][i]),
+            'children': int(self.child_end[depth][i] - self.child_start[depth][i])
+            if depth < len(self.child_start) else 0,
+        }
+        if depth == 1 and label in self.names:
+            node['name'] = self.names[label]
+        return node
+
+    def root(self):
+        """node ของทั้ง portfolio (None ถ้าไม่มี alerts)"""
+        return self.node(0, 0) if len(self.counts[0]) else None
+
+    def _parent(self, depth):
+        """index ของ parent (ระดับ depth - 1) ต่อ node ของระดับ depth"""
+        start, end = self.child_start[depth - 1], self.child_end[depth - 1]
+        return np.repeat(np.arange(len(start)), end - start)
+
+    def _keys(self, depth):
+        """labels ของระดับ 1..depth ต่อ node ของระดับ depth (list ต่อระดับ)"""
+        columns, index = [], np.arange(len(self.labels[depth]))
+        for upper in range(depth, 0, -1):
+            labels = self.labels[upper]
+            columns.append([labels[i] for i in index])
+            index = self._parent(upper)[index]
+        return columns[::-1]
+
+    def _locate(self, path):
+        """(depth, index) ของ node ตาม path เช่น ('PRJ001', 'G001')"""
+        path = tuple(path)
+        if not path:
+            return (0, 0) if len(self.counts[0]) else None
+        if self._paths is None:
+            self._paths = {}
+            for depth in range(1, len(ROLLUP_LEVELS)):
+                for i, key in enumerate(zip(*self._keys(depth))):
+                    self._paths[key] = (depth, i)
+        return self._paths.get(path)
+
+    def children(self, path=(), sort='severity'):
+        """nodes ลูกของ path (() = projects ทั้งหมด) เรียงตาม severity แล้วจำนวน alerts
+        (sort='severity') หรือตาม key (sort=None)"""
+        located = self._locate(path)
+        if located is None or located[0] >= len(self.child_start):
+            return []
+        depth, i = located
+        indices = np.arange(self.child_start[depth][i], self.child_end[depth][i])
+        if sort == 'severity':
+            indices = indices[np.lexsort((-self.counts[depth + 1][indices], self.worst[depth + 1][indices]))]
+        return [self.node(depth + 1, j) for j in indices]
+
+    def to_frame(self, level='s_code'):
+        """หนึ่งแถวต่อ node ของระดับ level พร้อม keys ของระดับบนทั้งหมด"""
+        depth = ROLLUP_LEVELS.index(level)
+        frame = pd.DataFrame(dict(zip(ROLLUP_LEVELS[1:depth + 1], self._keys(depth))) if depth else {})
+        frame['alerts'] = self.counts[depth]
+        frame['worst_severity'] = pd.Categorical.from_codes(self.worst[depth], SEVERITY_LEVELS, ordered=True)
+        frame['overrun'] = self.overrun[depth]
+        return frame
+
+
+# fields ที่ query ได้ของ AlertIndex
+INDEX_FIELDS = ['project', 'alert_type', 'severity', 'g_code', 'month']
+
+
+class AlertIndex:
+    """inverted index ของ AlertTable: postings (ตำแหน่งของ alerts เรียงจากน้อยไปมาก) ต่อค่าของแต่ละ field
+
+    postings ของทุกค่าใน field เก็บเป็น CSR: positions ที่เรียงตาม code แล้วตามตำแหน่ง กับ offsets
+    ต่อ code query เริ่มจาก field ที่ postings รวมสั้นที่สุด (รู้ขนาดจาก offsets) แล้วตรวจ fields
+    อื่นด้วย codes ของ candidates เท่านั้น งานต่อ query จึงขึ้นกับขนาดของผลลัพธ์ ไม่ใช่จำนวน alerts
+    """
+
+    def __init__(self, table):
+        self.table = table
+        source, rows = table.source, table.row_index
+        self.codes, self.values = {}, {}
+        self.codes['project'] = table.project_code
+        self.values['project'] = list(table.project_categories)
+        self.codes['alert_type'] = table.type_code
+        self.values['alert_type'] = list(ALERT_TYPES)
+        self.codes['severity'] = table.severity_code
+        self.values['severity'] = list(SEVERITY_LEVELS)
+        for field in ('g_code', 'month'):
+            if field in source.columns:
+                codes, uniques = pd.factorize(source[field], sort=True)
+                self.codes[field] = codes[rows]
+                self.values[field] = [u.item() if isinstance(u, np.generic) else u for u in uniques]
+            else:
+                self.codes[field] = np.full(len(table), -1, dtype=np.int64)
+                self.values[field] = []
+
+        self.positions, self.offsets, self._lookup = {}, {}, {}
+        for field in INDEX_FIELDS:
+            codes = self.codes[field]
+            valid = codes >= 0
+            # stable sort: ตำแหน่งภายในแต่ละค่ายังเรียงจากน้อยไปมาก
+            order = np.argsort(codes, kind='stable')
+            self.positions[field] = order[len(codes) - int(valid.sum()):]
+            self.offsets[field] = np.concatenate(
+                [[0], np.cumsum(np.bincount(codes[valid], minlength=len(self.values[field])))])
+            self._lookup[field] = {value: code for code, value in enumerate(self.values[field])}
+
+    def _codes_of(self, field, values):
+        """codes ของค่าที่ระบุ (ค่าที่ไม่มีใน alerts ถูกข้าม; alert_type/severity ที่ไม่รู้จักเป็น ValueError)"""
+        if isinstance(values, (str, int, np.integer)):
+            values = [values]
+        lookup = self._lookup[field]
+        codes = []
+        for value in values:
+            if field == 'month':
+                value = int(value)
+            code = lookup.get(value)
+            if code is None and field in ('alert_type', 'severity'):
+                raise ValueError(f"{field} ไม่ถูกต้อง: {value!r}")
+            if code is not None:
+                codes.append(code)
+        return np.unique(np.asarray(codes, dtype=np.int64))
+
+    def postings(self, field, codes):
+        """ตำแหน่ง (เรียงแล้ว) ของ alerts ที่ field มี code ใดใน codes"""
+        offsets, positions = self.offsets[field], self.positions[field]
+        if len(codes) == 1:
+            return positions[offsets[codes[0]]:offsets[codes[0] + 1]]
+        return np.sort(np.concatenate([positions[offsets[c]:offsets[c + 1]] for c in codes]))
+
+    def match(self, **filters):
+        """ตำแหน่งของ alerts ที่ตรงทุกเงื่อนไข (field=value หรือ list ของค่า; None = ไม่กรอง)"""
+        selected = {field: self._codes_of(field, values)
+                    for field, values in filters.items() if values is not None}
+        if not selected:
+            return np.arange(len(self.table))
+
+        sizes = {field: int((self.offsets[field][codes + 1] - self.offsets[field][codes]).sum())
+                 for field, codes in selected.items()}
+        driver = min(sizes, key=sizes.get)
+        candidates = self.postings(driver, selected[driver]) if sizes[driver] else np.zeros(0, dtype=np.int64)
+        for field, codes in selected.items():
+            if field == driver or not len(candidates):
+                continue
+            candidate_codes = self.codes[field][candidates]
+            if len(codes) == 1:
+                keep = candidate_codes == codes[0]
+            else:
+                # lookup table ต่อ code แทน isin (code -1 = ไม่มีค่า ชี้ไปช่องท้ายที่เป็น False)
+                allowed = np.zeros(len(self.values[field]) + 1, dtype=bool)
+                allowed[codes] = True
+                keep = allowed[candidate_codes]
+            candidates = candidates[keep]
+        return candidates
+
+    def count(self, **filters):
+        """จำนวน alerts ที่ตรงเงื่อนไข (เงื่อนไขเดียวใช้ offsets โดยตรง)"""
+        selected = {field: values for field, values in filters.items() if values is not None}
+        if len(selected) == 1:
+            (field, values), = selected.items()
+            codes = self._codes_of(field, values)
+            return int((self.offsets[field][codes + 1] - self.offsets[field][codes]).sum())
+        return len(self.match(**selected))
+
 
 class SimpleAlertEngine:
     """Alert Engine แบบง่าย"""
     
-    def __init__(self, data_file='data/processed/master_data.csv'):
+    def __init__(self, data_file='data/processed/master_data.csv', csv_engine=None, compact=False):
         self.data_file = data_file
         self.alerts = []
         
+        # rules ที่เปิดใช้ - load_data อ่านเฉพาะ columns ที่ rules เหล่านี้ประกาศไว้
+        self.enabled_rules = [rule for rule in ALERT_TYPES if rule not in TREND_RULES + ANOMALY_RULES]
+        self.extra_columns = []
+        
+        # csv_engine: None = pandas 'c' parser, 'pyarrow' = multithreaded parser (ถ้ามี)
+        # compact=True ลด ratio/score columns ที่ rules หลักไม่ได้ใช้คำนวณเป็น float32
+        self.csv_engine = csv_engine
+        self.compact = compact
+        
         # Alert thresholds
         self.thresholds = {
             'cost_overrun': 100,      # เกิน 100% ของงบประมาณ
             'progress_lag': 150,      # cost/progress ratio > 150%
             'high_variance': 25,      # variance > 25%
             'low_efficiency': 40,     # efficiency < 40
-            'schedule_delay': 20      # ล่าช้า > 20%
+            'schedule_delay': 20,     # ล่าช้า > 20%
+            'cost_acceleration': 10,  # utilization เพิ่มเร็วขึ้น > 10 จุด% เทียบกับเดือนก่อน
+            'cpi_decline': 2,         # CPI ลดลงต่อเนื่อง > 2 เดือน
+            'burn_rate': 100,         # slope ของการใช้เงิน x เดือนที่เหลือ > 100% ของงบคงเหลือ
+            'actual_anomaly': 3,      # |z-score| > 3 เทียบกับเดือนก่อนหน้าของ cost code/project
+            'cpi_anomaly': 3,
+            'utilization_anomaly': 3
+        }
+        
+        # จำนวนเดือนของ rolling window ที่ใช้หา slope ของ burn rate
+        self.trend_window = 3
+        
+        # เกณฑ์ความรุนแรงต่อ rule: (Critical, High) - เกินค่านี้ หรือต่ำกว่าสำหรับ low_efficiency
+        # ค่าที่ผ่าน threshold แต่ไม่ถึงทั้งสองเกณฑ์เป็น Medium
+        self.severity_cutoffs = {
+            'cost_overrun': (130, 115),
+            'progress_lag': (250, 200),
+            'schedule_delay': (50, 35),
+            'low_efficiency': (20, 30),
+            'cost_acceleration': (30, 20),
+            'cpi_decline': (5, 3),
+            'burn_rate': (200, 150),
+            'actual_anomaly': (5, 4),
+            'cpi_anomaly': (5, 4),
+            'utilization_anomaly': (5, 4)
         }
         
+        # True = ประเมินแบบ vectorized (เร็ว), False = ทีละแถวแบบเดิม
+        self.vectorized = True
+        
+        # render message/details เฉพาะตอนแสดงผลหรือ export
+        self.formatter = ALERT_FORMATTER
+        
+        # AlertHistory (alert_history.py) - ถ้ากำหนด จะบันทึก alerts ทุกรอบที่รัน
+        self.history = None
+        
+        # EngineMetrics (alert_metrics.py) - ถ้ากำหนด จะจับเวลา/นับต่อ phase และต่อ rule
+        self.metrics = None
+        
+        # AnomalyStats (alert_anomaly.py) ของ anomaly rules - None = เริ่มใหม่เมื่อประเมินครั้งแรก
+        # จำนวนค่าขั้นต่ำของ key ก่อนจะให้ z-score
+        self.anomaly_stats = None
+        self.anomaly_min_count = 3
+    
+    def _phase(self, name):
+        """context manager จับเวลา phase เมื่อเปิด metrics (ไม่เช่นนั้นไม่ทำอะไร)"""
+        if self.metrics is None:
+            return nullcontext({})
+        return self.metrics.phase(name)
+    
+    def _rule(self, name):
+        if self.metrics is None:
+            return nullcontext({})
+        return self.metrics.rule(name)
+        
+    def required_columns(self):
+        """columns ที่ rules ที่เปิดใช้ต้องการ + keys และ columns สำหรับแสดงผล"""
+        columns = KEY_COLUMNS + ['project_name'] + SOURCE_COLUMNS
+        for rule in self.enabled_rules:
+            columns += RULE_COLUMNS.get(rule, [])
+        columns += self.extra_columns
+        return list(dict.fromkeys(columns))
+
+    def _read_options(self, available):
+        """usecols/dtype/engine สำหรับ pd.read_csv ตาม MASTER_SCHEMA"""
+        usecols = [c for c in self.required_columns() if c in available]
+        dtype = {}
+        for column in usecols:
+            column_type = MASTER_SCHEMA.get(column)
+            if column_type == 'float32' and not self.compact:
+                column_type = 'float64'
+            if column_type is not None:
+                dtype[column] = column_type
+        
+        options = {'usecols': usecols, 'dtype': dtype}
+        if self.csv_engine == 'pyarrow':
+            if pa is None:
+                print("⚠️ ไม่พบ pyarrow - ใช้ parser ปกติแทน")
+            else:
+                options['engine'] = 'pyarrow'
+        elif self.csv_engine is not None:
+            options['engine'] = self.csv_engine
+        return options
+
     def load_data(self):
-        """โหลดข้อมูล"""
-        try:
-            print(f"📊 กำลังโหลดข้อมูลจาก {self.data_file}...")
-            self.df = pd.read_csv(self.data_file)
-            print(f"✅ โหลดข้อมูลสำเร็จ: {len(self.df):,} records")
+        """โหลดข้อมูล (เฉพาะ columns ที่ rules ใช้ พร้อม dtypes จาก MASTER_SCHEMA)"""
+        with self._phase('load_data') as phase:
+            try:
+                print(f"📊 กำลังโหลดข้อมูลจาก {self.data_file}...")
+                available = pd.read_csv(self.data_file, nrows=0).columns
+                self.df = pd.read_csv(self.data_file, **self._read_options(available))
+                phase['rows'] = len(self.df)
+                print(f"✅ โหลดข้อมูลสำเร็จ: {len(self.df):,} records")
+                return True
+            except FileNotFoundError:
+                phase['errors'] = 1
+                print(f"❌ ไม่พบไฟล์: {self.data_file}")
+                print("💡 ตรวจสอบว่าได้รัน ETL script แล้วหรือยัง")
+                return False
+            except Exception as e:
+                phase['errors'] = 1
+                print(f"❌ Error loading data: {str(e)}")
+                return False
+    
+    def missing_columns(self):
+        """columns ที่ rules ที่เปิดใช้ต้องการแต่ไม่มีใน self.df"""
+        needed = [column for rule in self.enabled_rules for column in RULE_COLUMNS.get(rule, [])]
+        return [column for column in dict.fromkeys(needed) if column not in self.df.columns]
+    
+    def _ensure_data(self):
+        """โหลดข้อมูลถ้ายังไม่ได้โหลด หรือโหลดใหม่ถ้า rules ที่เปิดหลังโหลดต้องใช้ columns ที่ยังไม่มี
+
+        columns ที่ไม่มีแม้ในไฟล์ต้นทางจะแจ้งเตือน (rules เหล่านั้นไม่ถูกประเมิน) แทนการข้ามเงียบๆ
+        """
+        if not hasattr(self, 'df'):
+            return self.load_data()
+        
+        missing = self.missing_columns()
+        if not missing:
             return True
-        except FileNotFoundError:
-            print(f"❌ ไม่พบไฟล์: {self.data_file}")
-            print("💡 ตรวจสอบว่าได้รัน ETL script แล้วหรือยัง")
-            return False
-        except Exception as e:
-            print(f"❌ Error loading data: {str(e)}")
-            return False
+        try:
+            available = set(pd.read_csv(self.data_file, nrows=0).columns)
+        except (OSError, ValueError):
+            available = set()
+        if available.intersection(missing):
+            print(f"🔄 rules ที่เปิดใช้ต้องการ columns ที่ยังไม่ได้โหลด ({', '.join(missing)}) - โหลดข้อมูลใหม่")
+            if not self.load_data():
+                return False
+            missing = self.missing_columns()
+        if missing:
+            skipped = [rule for rule in self.enabled_rules
+                       if any(column in missing for column in RULE_COLUMNS.get(rule, []))]
+            print(f"⚠️ ไม่มี columns {', '.join(missing)} ในข้อมูล - ข้าม rules: {', '.join(skipped)}")
+        return True
     
     def check_cost_overrun(self, row):
         """ตรวจสอบการเกินงบประมาณ"""
@@ -62,24 +1020,18 @@ class SimpleAlertEngine:
         utilization = (row['total_actual'] / row['total_budget']) * 100
         
         if utilization > self.thresholds['cost_overrun']:
-            severity = 'Critical' if utilization > 130 else 'High' if utilization > 115 else 'Medium'
+            critical, high = self.severity_cutoffs['cost_overrun']
+            severity = 'Critical' if utilization > critical else 'High' if utilization > high else 'Medium'
             
             return SimpleAlert(
                 project_id=row['project_id'],
                 project_name=row.get('project_name', f"Project {row['project_id']}"),
                 alert_type='cost_overrun',
                 severity=severity,
-                message=f"เกินงบประมาณ {utilization:.1f}% (งบ: {row['total_budget']:,.0f}, ใช้: {row['total_actual']:,.0f})",
                 actual_value=utilization,
                 threshold=self.thresholds['cost_overrun'],
                 variance=utilization - self.thresholds['cost_overrun'],
-                details={
-                    'cost_code': f"{row['g_code']}-{row['s_code']}",
-                    'month': row['month'],
-                    'budget': row['total_budget'],
-                    'actual': row['total_actual'],
-                    'progress': row['progress_percentage']
-                }
+                source=row
             )
         return None
     
@@ -92,23 +1044,18 @@ class SimpleAlertEngine:
         cost_ratio = (row['total_actual'] / (row['progress_percentage'] * row['total_budget'] / 100)) * 100
         
         if cost_ratio > self.thresholds['progress_lag']:
-            severity = 'Critical' if cost_ratio > 250 else 'High' if cost_ratio > 200 else 'Medium'
+            critical, high = self.severity_cutoffs['progress_lag']
+            severity = 'Critical' if cost_ratio > critical else 'High' if cost_ratio > high else 'Medium'
             
             return SimpleAlert(
                 project_id=row['project_id'],
                 project_name=row.get('project_name', f"Project {row['project_id']}"),
                 alert_type='progress_lag',
                 severity=severity,
-                message=f"ความคืบหน้าล่าช้า - ใช้เงิน {cost_ratio:.1f}% เทียบกับความคืบหน้า",
                 actual_value=cost_ratio,
                 threshold=self.thresholds['progress_lag'],
                 variance=cost_ratio - self.thresholds['progress_lag'],
-                details={
-                    'cost_code': f"{row['g_code']}-{row['s_code']}",
-                    'month': row['month'],
-                    'progress': row['progress_percentage'],
-                    'cost_ratio': cost_ratio
-                }
+                source=row
             )
         return None
     
@@ -119,23 +1066,18 @@ class SimpleAlertEngine:
         delay = expected_progress - row['progress_percentage']
         
         if delay > self.thresholds['schedule_delay']:
-            severity = 'Critical' if delay > 50 else 'High' if delay > 35 else 'Medium'
+            critical, high = self.severity_cutoffs['schedule_delay']
+            severity = 'Critical' if delay > critical else 'High' if delay > high else 'Medium'
             
             return SimpleAlert(
                 project_id=row['project_id'],
                 project_name=row.get('project_name', f"Project {row['project_id']}"),
                 alert_type='schedule_delay',
                 severity=severity,
-                message=f"ล่าช้าจากแผน {delay:.1f}% (ควรอยู่ที่ {expected_progress:.1f}%, อยู่ที่ {row['progress_percentage']:.1f}%)",
                 actual_value=delay,
                 threshold=self.thresholds['schedule_delay'],
                 variance=delay - self.thresholds['schedule_delay'],
-                details={
-                    'cost_code': f"{row['g_code']}-{row['s_code']}",
-                    'month': row['month'],
-                    'expected_progress': expected_progress,
-                    'actual_progress': row['progress_percentage']
-                }
+                source=row
             )
         return None
     
@@ -147,90 +1089,767 @@ class SimpleAlertEngine:
         efficiency = row['efficiency_score']
         
         if efficiency < self.thresholds['low_efficiency']:
-            severity = 'Critical' if efficiency < 20 else 'High' if efficiency < 30 else 'Medium'
+            critical, high = self.severity_cutoffs['low_efficiency']
+            severity = 'Critical' if efficiency < critical else 'High' if efficiency < high else 'Medium'
             
             return SimpleAlert(
                 project_id=row['project_id'],
                 project_name=row.get('project_name', f"Project {row['project_id']}"),
                 alert_type='low_efficiency',
                 severity=severity,
-                message=f"ประสิทธิภาพต่ำ {efficiency:.1f} คะแนน (ต่ำกว่า {self.thresholds['low_efficiency']})",
                 actual_value=efficiency,
                 threshold=self.thresholds['low_efficiency'],
                 variance=self.thresholds['low_efficiency'] - efficiency,
-                details={
-                    'cost_code': f"{row['g_code']}-{row['s_code']}",
-                    'month': row['month'],
-                    'efficiency_score': efficiency
-                }
+                source=row
             )
         return None
     
-    def evaluate_all_alerts(self):
-        """ประเมิน alerts ทั้งหมด"""
-        if not hasattr(self, 'df'):
-            if not self.load_data():
-                return []
-        
-        print("🔍 กำลังประเมิน alerts...")
+    def _rule_value(self, alert_type, df):
+        """ค่าที่ rule เทียบกับ threshold: (valid, value) หรือ None ถ้าไม่มี columns ที่ต้องใช้
+
+        ไม่ขึ้นกับ thresholds/severity cutoffs จึงคำนวณครั้งเดียวแล้วใช้กับหลาย config ได้
+        """
+        def column(name):
+            return df[name].to_numpy(dtype=float)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # check_cost_overrun
+            if alert_type == 'cost_overrun':
+                budget, actual = column('total_budget'), column('total_actual')
+                return budget != 0, (actual / budget) * 100
+
+            # check_progress_lag
+            if alert_type == 'progress_lag':
+                budget, actual = column('total_budget'), column('total_actual')
+                progress = column('progress_percentage')
+                cost_ratio = (actual / (progress * budget / 100)) * 100
+                return (progress != 0) & (budget != 0), cost_ratio
+
+            # check_schedule_delay
+            if alert_type == 'schedule_delay':
+                expected_progress = (column('month') / 12) * 100
+                return np.ones(len(df), dtype=bool), expected_progress - column('progress_percentage')
+
+            # check_efficiency
+            if alert_type == 'low_efficiency' and 'efficiency_score' in df.columns:
+                efficiency = column('efficiency_score')
+                return ~np.isnan(efficiency), efficiency
+
+        if alert_type in TREND_RULES:
+            return self._trend_values(df).get(alert_type)
+        if alert_type in ANOMALY_RULES:
+            return self._anomaly_values(df).get(alert_type)
+        return None
+
+    def _anomaly_values(self, df):
+        """ค่าของ anomaly rules ต่อแถว: {alert_type: (valid, |z|)} (cache ต่อ DataFrame)
+
+        แถวของเดือนที่ใหม่กว่า anomaly_stats.through_period ถูกประมวลผลทีละเดือนตามลำดับเวลา:
+        ให้คะแนนกับสถิติของเดือนก่อนหน้าก่อน แล้วจึงรวมเดือนนั้นเข้า stats ค่าคือ |z| ที่มากกว่า
+        ระหว่าง scope (g_code, s_code) กับ project เดือนล่าสุดของ df ยังไม่ถูกรวม (ข้อมูลของเดือนปัจจุบัน
+        มักถูกแก้ต่อ) จึงให้คะแนนใหม่ทุกรอบและถูกรวมเมื่อมีเดือนที่ใหม่กว่า
+
+        แถวของเดือนที่รวมไปแล้วใช้คะแนนที่เก็บไว้ใน stats (เฉพาะแถวที่เกิน threshold ตอนรวม)
+        ถ้าแถวเหล่านั้นถูกแก้/เพิ่ม/ลบหลังรอบก่อนใน process เดียวกัน ค่าเดิมถูกถอดออกจาก stats
+        และให้คะแนนใหม่เทียบกับ stats ที่แก้แล้ว (เดือนถัดไปจึงเห็นสถิติที่ถูกต้อง แต่คะแนนของเดือนที่
+        รวมไปแล้วไม่ถูกคำนวณย้อนหลัง) process ใหม่ที่โหลด stats จากไฟล์ไม่เห็นการแก้ที่เกิดระหว่างนั้น
+        และการลด threshold ไม่ทำให้แถวของเดือนที่รวมแล้วที่ไม่เคยเกิน threshold เดิมแจ้งเตือน
+        """
+        cache = getattr(self, '_anomaly_cache', None)
+        if cache is not None and cache[0] is df:
+            return cache[1]
+        if self.anomaly_stats is None:
+            from alert_anomaly import AnomalyStats
+            self.anomaly_stats = AnomalyStats(ANOMALY_METRICS.values())
+        stats = self.anomaly_stats
+        min_count = self.anomaly_min_count
+        rules = {column: rule for rule, column in ANOMALY_METRICS.items()}
+        floors = np.array([self.thresholds.get(rules.get(column), np.inf) for column in stats.metrics])
+
+        def score(cost_codes, projects, values):
+            with np.errstate(invalid='ignore'):
+                return np.fmax(np.abs(stats.score(cost_codes, values, min_count)),
+                               np.abs(stats.score(projects, values, min_count)))
+
+        n = len(df)
+        values = np.column_stack([df[column].to_numpy(dtype=float) if column in df.columns
+                                  else np.full(n, np.nan) for column in stats.metrics] or [np.zeros(n)])
+        scores = np.full((n, len(stats.metrics)), np.nan)
+        month = df['month'].to_numpy(dtype=np.int64)
+        year = df['year'].to_numpy(dtype=np.int64) if 'year' in df.columns else np.zeros(n, dtype=np.int64)
+        period = year * 12 + month
+        keys = row_keys(df)
+        cost_code_keys, project_keys = anomaly_keys(df)
+        absorbed = np.flatnonzero(period <= stats.through_period)
+        fresh = np.flatnonzero(period > stats.through_period)
+
+        if len(absorbed):
+            scores[absorbed] = stats.flagged(keys[absorbed])
+            # แถวของรอบก่อน (ใน process นี้ กับ stats ชุดเดียวกัน) ใช้หาแถวที่ถูกแก้/เพิ่ม/ลบ
+            previous = getattr(self, '_anomaly_rows', None)
+            if previous is not None and previous[0] is stats:
+                _, old_keys, old_values, old_cost_codes, old_projects, old_period = previous
+                old_absorbed = np.flatnonzero(old_period <= stats.through_period)
+                position = match_keys(old_keys[old_absorbed], keys[absorbed])
+                matched = position >= 0
+                same = np.zeros(len(absorbed), dtype=bool)
+                old_rows = old_absorbed[position[matched]]
+                same[matched] = ((old_values[old_rows] == values[absorbed[matched]])
+                                 | (np.isnan(old_values[old_rows]) & np.isnan(values[absorbed[matched]]))
+                                 ).all(axis=1)
+                kept = np.zeros(len(old_absorbed), dtype=bool)
+                kept[position[matched & same]] = True
+                stale, changed = old_absorbed[~kept], absorbed[~same]
+                if len(stale) or len(changed):
+                    stats.remove(old_cost_codes[stale], old_values[stale])
+                    stats.remove(old_projects[stale], old_values[stale])
+                    scores[changed] = score(cost_code_keys[changed], project_keys[changed], values[changed])
+                    stats.update(cost_code_keys[changed], values[changed])
+                    stats.update(project_keys[changed], values[changed])
+                    stats.flag(old_keys[stale], np.full((len(stale), len(floors)), np.nan), floors)
+                    stats.flag(keys[changed], scores[changed], floors)
+
+        if len(fresh):
+            fresh = fresh[np.argsort(period[fresh], kind='stable')]
+            latest = period[fresh[-1]]
+            # เรียงตามเดือนครั้งเดียว แต่ละเดือนจึงเป็นช่วงต่อเนื่อง
+            bounds = np.flatnonzero(np.diff(period[fresh])) + 1
+            for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(fresh)]):
+                rows = fresh[start:end]
+                scores[rows] = score(cost_code_keys[rows], project_keys[rows], values[rows])
+                if period[rows[0]] == latest:
+                    break  # เดือนล่าสุดรอจนมีเดือนที่ใหม่กว่า
+                stats.update(cost_code_keys[rows], values[rows])
+                stats.update(project_keys[rows], values[rows])
+                stats.flag(keys[rows], scores[rows], floors)
+                stats.through_period = int(period[rows[0]])
+
+        results = {}
+        for alert_type, column in ANOMALY_METRICS.items():
+            if column in stats.metrics and column in df.columns:
+                value = scores[:, stats.metrics.index(column)]
+                results[alert_type] = (~np.isnan(value), value)
+        self._anomaly_rows = (stats, keys, values, cost_code_keys, project_keys, period)
+        self._anomaly_cache = (df, results)
+        return results
+
+    def _trend_values(self, df):
+        """ค่าของ trend rules ต่อแถว: {alert_type: (valid, value)} (cache ต่อ DataFrame)
+
+        เรียงแถวครั้งเดียวตาม (series, year, month) แล้วคำนวณ shift/rolling window ด้วย
+        NumPy ทั้งตาราง แถวก่อนหน้านับเฉพาะเมื่ออยู่ใน series เดียวกันและเป็นเดือนติดกัน
+        - cost_acceleration: ผลต่างอันดับสองของ utilization (จุด% ต่อเดือน)
+        - cpi_decline: จำนวนเดือนติดกันที่ CPI ลดลง
+        - burn_rate: slope ของ total_actual ใน trend_window เดือนล่าสุด x เดือนที่เหลือของปี
+          เทียบกับงบคงเหลือ (%)
+        """
+        cache = getattr(self, '_trend_cache', None)
+        if cache is not None and cache[0] is df and cache[1] == self.trend_window:
+            return cache[2]
+
+        n = len(df)
+        if n == 0:
+            return {rule: (np.zeros(0, dtype=bool), np.zeros(0)) for rule in TREND_RULES}
+        series = pd.factorize(series_keys(df))[0]
+        month = df['month'].to_numpy(dtype=np.int64)
+        year = df['year'].to_numpy(dtype=np.int64) if 'year' in df.columns else np.zeros(n, dtype=np.int64)
+        period = year * 12 + month
+        # key เดียว (series, period) เรียงเร็วกว่า lexsort; ข้อมูลที่เรียงอยู่แล้วไม่ต้องสลับแถว
+        first = int(period.min())
+        sort_key = series.astype(np.int64) * (int(period.max()) - first + 1) + (period - first)
+        in_order = not (np.diff(sort_key) < 0).any()
+        order = slice(None) if in_order else np.argsort(sort_key, kind='stable')
+        period, series = period[order], series[order]
+
+        # continues[i] = แถว i (ตามลำดับที่เรียง) ต่อจากเดือนก่อนหน้าใน series เดียวกัน
+        continues = np.zeros(n, dtype=bool)
+        continues[1:] = (series[1:] == series[:-1]) & (np.diff(period) == 1)
+        position = np.arange(n)
+        # streak = จำนวนเดือนติดกันที่สิ้นสุดที่แถวนี้ (นับตัวเอง)
+        streak = position - np.maximum.accumulate(np.where(continues, -1, position)) + 1
+
+        def previous(values):
+            shifted = np.empty(n)
+            shifted[0] = np.nan
+            shifted[1:] = values[:-1]
+            shifted[~continues] = np.nan
+            return shifted
+
+        def restore(valid, value):
+            """จากลำดับที่เรียงกลับเป็นลำดับแถวเดิม"""
+            if in_order:
+                return valid, value
+            original_valid, original_value = np.empty(n, dtype=bool), np.empty(n)
+            original_valid[order], original_value[order] = valid, value
+            return original_valid, original_value
+
+        def column(name):
+            return df[name].to_numpy(dtype=float)[order]
+
+        results = {}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            budget, actual = column('total_budget'), column('total_actual')
+
+            utilization = np.where(budget != 0, actual / budget * 100, np.nan)
+            change = utilization - previous(utilization)
+            acceleration = change - previous(change)
+            results['cost_acceleration'] = restore(~np.isnan(acceleration), acceleration)
+
+            if 'cpi' in df.columns:
+                cpi = column('cpi')
+                declining = continues & (cpi < previous(cpi))
+                months = position - np.maximum.accumulate(np.where(declining, -1, position))
+                results['cpi_decline'] = restore(np.ones(n, dtype=bool), months.astype(float))
+
+            # slope ของ least squares บน window: ผลรวมถ่วงน้ำหนักของค่าที่ shift ไป
+            window = max(int(self.trend_window), 2)
+            offsets = np.arange(window) - (window - 1) / 2
+            weights = offsets / (offsets ** 2).sum()
+            slope = np.zeros(n)
+            for lag, weight in enumerate(weights[::-1]):
+                shifted = np.empty(n)
+                shifted[:lag] = np.nan
+                shifted[lag:] = actual[:n - lag]
+                slope += weight * shifted
+            remaining_budget = budget - actual
+            months_left = 12 - month[order]
+            burn = slope * months_left / remaining_budget * 100
+            valid = (streak >= window) & (remaining_budget > 0) & (months_left > 0) & ~np.isnan(burn)
+            results['burn_rate'] = restore(valid, burn)
+
+        self._trend_cache = (df, self.trend_window, results)
+        return results
+
+    @staticmethod
+    def _apply_rule(alert_type, valid, value, threshold, cutoffs):
+        """(mask, severity_code) ของ rule ตาม threshold และ (Critical, High) cutoffs"""
+        sign = -1 if alert_type in BELOW_THRESHOLD_RULES else 1
+        score = value * sign
+        critical, high = cutoffs
+        with np.errstate(invalid='ignore'):
+            mask = valid & (score > threshold * sign)
+            severity = np.where(score > critical * sign, 0, np.where(score > high * sign, 1, 2))
+        return mask, severity
+
+    def _rule_results(self, df, rules=None, rows=None):
+        """คำนวณ rules ที่เปิดใช้แบบ vectorized: คืน {alert_type: (mask, value, severity_code)}
+
+        rows = ตำแหน่งของแถวใน df ที่ต้องการ (None = ทุกแถว) ผลลัพธ์เรียงตาม df.iloc[rows]
+        anomaly rules ยังคำนวณจากทั้ง df (stats ต้องเห็นทุกแถวของทุกเดือน) แล้วจึงเลือกแถว
+        """
+        rules = self.enabled_rules if rules is None else rules
+        subset = df if rows is None else df.iloc[rows]
+        results = {}
+        for alert_type in ALERT_TYPES:
+            if alert_type not in rules:
+                continue
+            with self._rule(alert_type) as rule:
+                rule['rows'] = len(subset)
+                if alert_type in ANOMALY_RULES and rows is not None:
+                    rule_value = self._rule_value(alert_type, df)
+                    rule_value = rule_value and (rule_value[0][rows], rule_value[1][rows])
+                else:
+                    rule_value = self._rule_value(alert_type, subset)
+                if rule_value is None:
+                    continue
+                valid, value = rule_value
+                mask, severity = self._apply_rule(alert_type, valid, value, self.thresholds[alert_type],
+                                                  self.severity_cutoffs[alert_type])
+                results[alert_type] = (mask, value, severity)
+
+        if self.metrics is not None:
+            for alert_type, (mask, _, _) in results.items():
+                self.metrics.add_rule_alerts(alert_type, int(np.count_nonzero(mask)))
+
+        return results
+
+    @property
+    def checks(self):
+        """alert_type -> check function แบบทีละแถว (เฉพาะ rules ที่เปิดใช้)"""
+        checks = {
+            'cost_overrun': self.check_cost_overrun,
+            'progress_lag': self.check_progress_lag,
+            'schedule_delay': self.check_schedule_delay,
+            'low_efficiency': self.check_efficiency
+        }
+        return {name: check for name, check in checks.items() if name in self.enabled_rules}
+
+    def _evaluate_rows(self):
+        """ประเมินทีละแถวด้วย check functions (วิธีเดิม)"""
+        columns = {'row_index': [], 'type_code': [], 'severity_code': [],
+                   'actual_value': [], 'variance': []}
+        checks = self.checks
+        check_functions = list(checks.values())
         
-        alerts = []
-        check_functions = [
-            self.check_cost_overrun,
-            self.check_progress_lag,
-            self.check_schedule_delay,
-            self.check_efficiency
-        ]
+        # ตัวนับต่อ check (จับเวลาต่อแถวเฉพาะเมื่อเปิด metrics)
+        timed = self.metrics is not None
+        seconds = [0.0] * len(check_functions)
+        fired = [0] * len(check_functions)
+        errors = [0] * len(check_functions)
         
-        for _, row in self.df.iterrows():
-            for check_func in check_functions:
+        for position, (_, row) in enumerate(self.df.iterrows()):
+            for k, check_func in enumerate(check_functions):
+                if timed:
+                    start = time.perf_counter()
                 try:
                     alert = check_func(row)
                     if alert:
-                        alerts.append(alert)
+                        fired[k] += 1
+                        columns['row_index'].append(position)
+                        columns['type_code'].append(ALERT_TYPES.index(alert.alert_type))
+                        columns['severity_code'].append(SEVERITY_LEVELS.index(alert.severity))
+                        columns['actual_value'].append(alert.actual_value)
+                        columns['variance'].append(alert.variance)
                 except Exception as e:
+                    errors[k] += 1
                     print(f"⚠️ Error checking {check_func.__name__} for {row['project_id']}: {e}")
+                if timed:
+                    seconds[k] += time.perf_counter() - start
+        
+        if timed:
+            for k, alert_type in enumerate(checks):
+                self.metrics.record_rule(alert_type, seconds[k], len(self.df), fired[k], errors[k])
+        alerts = AlertTable(self.df, thresholds=self.thresholds, formatter=self.formatter, **columns)
+        
+        # trend/anomaly rules ต้องเห็นหลายเดือนพร้อมกัน จึงประเมินแบบ vectorized เสมอ
+        series_rules = [rule for rule in self.enabled_rules if rule in TREND_RULES + ANOMALY_RULES]
+        if series_rules:
+            alerts = AlertTable.concat(self.df, [alerts, self._evaluate_vectorized(rules=series_rules)],
+                                       self.thresholds, self.formatter)
+        return alerts
+
+    def _evaluate_vectorized(self, df=None, rules=None, rows=None):
+        """ประเมินทั้งตารางด้วย masks ของ NumPy ผลลัพธ์ตรงกับ _evaluate_rows
+
+        rows = ประเมินเฉพาะแถวเหล่านี้ของ df (row_index ของผลลัพธ์อ้างอิง df.iloc[rows])
+        """
+        df = self.df if df is None else df
+        results = self._rule_results(df, rules, rows)
+        if rows is not None:
+            df = df.iloc[rows]
+        if not results:
+            return AlertTable.empty(df, self.thresholds, self.formatter)
+
+        row_index, type_code, severity_code, actual_value = [], [], [], []
+        for alert_type, (mask, values, severity) in results.items():
+            hits = np.flatnonzero(mask)
+            row_index.append(hits)
+            type_code.append(np.full(len(hits), ALERT_TYPES.index(alert_type)))
+            severity_code.append(severity[hits])
+            actual_value.append(values[hits])
+        row_index = np.concatenate(row_index)
+        type_code = np.concatenate(type_code)
+        severity_code = np.concatenate(severity_code)
+        actual_value = np.concatenate(actual_value)
+
+        # เรียงแบบเดียวกับวิธีเดิม: ตามแถว แล้วตามลำดับ check
+        order = np.lexsort((type_code, row_index))
+        row_index, type_code = row_index[order], type_code[order]
+        severity_code, actual_value = severity_code[order], actual_value[order]
+
+        threshold = np.array([self.thresholds[t] for t in ALERT_TYPES], dtype=float)[type_code]
+        below = np.isin(type_code, [ALERT_TYPES.index(rule) for rule in BELOW_THRESHOLD_RULES])
+        variance = np.where(below, threshold - actual_value, actual_value - threshold)
+
+        return AlertTable(df, row_index, type_code, severity_code, actual_value, variance,
+                          self.thresholds, self.formatter)
+
+    def evaluate_all_alerts(self, vectorized=None):
+        """ประเมิน alerts ทั้งหมด
+
+        vectorized=True ประเมินทั้งคอลัมน์ในครั้งเดียว, False ใช้ check functions ทีละแถว
+        (ค่า default มาจาก self.vectorized) ผลลัพธ์ของทั้งสองแบบต้องเหมือนกัน
+        """
+        if not self._ensure_data():
+            return []
+        
+        if vectorized is None:
+            vectorized = self.vectorized
+
+        print(f"🔍 กำลังประเมิน alerts ({'vectorized' if vectorized else 'row-by-row'})...")
+        
+        with self._phase('evaluate') as phase:
+            if vectorized:
+                alerts = self._evaluate_vectorized()
+            else:
+                alerts = self._evaluate_rows()
+            phase['rows'], phase['alerts'] = len(self.df), len(alerts)
         
         self.alerts = alerts
         print(f"🚨 พบ {len(alerts)} alerts")
         return alerts
     
+    def sweep_thresholds(self, grid):
+        """what-if: นับ alerts ของหลายชุด thresholds/severity cutoffs ในการคำนวณครั้งเดียว
+
+        grid เป็น list ของ {'thresholds': {...}, 'severity_cutoffs': {...}} ที่ระบุเฉพาะค่า
+        ที่ต่างจากของ engine (ดู threshold_grid) ค่าของแต่ละ rule คำนวณครั้งเดียว แล้วจัดลง
+        ช่วงระหว่างเกณฑ์ทั้งหมดของทุก config (searchsorted) + histogram ต่อ project
+        จำนวนที่เกินแต่ละเกณฑ์ได้จาก cumulative sum เวลาแทบไม่ขึ้นกับจำนวน configs
+        ไม่เปลี่ยน self.alerts
+        """
+        if not self._ensure_data():
+            return None
+        df = self.df
+        configs = [{
+            'thresholds': {**self.thresholds, **config.get('thresholds', {})},
+            'severity_cutoffs': {**self.severity_cutoffs, **config.get('severity_cutoffs', {})}
+        } for config in grid]
+        project_code, projects = pd.factorize(df['project_id'])
+        n_projects = len(projects)
+        
+        counts = np.zeros((len(configs), len(ALERT_TYPES), len(SEVERITY_LEVELS)), dtype=np.int64)
+        project_counts = np.zeros((len(configs), n_projects), dtype=np.int64)
+        
+        with self._phase('sweep') as phase:
+            phase['rows'] = len(df)
+            for t, alert_type in enumerate(ALERT_TYPES):
+                if alert_type not in self.enabled_rules:
+                    continue
+                rule_value = self._rule_value(alert_type, df)
+                if rule_value is None:
+                    continue
+                valid, value = rule_value
+                keep = valid & ~np.isnan(value)
+                sign = -1 if alert_type in BELOW_THRESHOLD_RULES else 1
+                score = value[keep] * sign
+                
+                # เกณฑ์ต่อ config (ในหน่วยของ score): alert, High ขึ้นไป, Critical, High+Critical
+                levels = np.array([
+                    (config['thresholds'][alert_type],) + tuple(config['severity_cutoffs'][alert_type])
+                    for config in configs], dtype=float) * sign
+                threshold, critical, high = levels[:, 0], levels[:, 1], levels[:, 2]
+                cuts = np.stack([threshold, np.maximum(threshold, high), np.maximum(threshold, critical),
+                                 np.maximum(np.maximum(threshold, high), critical)], axis=1)
+                points, position = np.unique(cuts, return_inverse=True)
+                position = position.reshape(cuts.shape)
+                
+                # bucket = จำนวนเกณฑ์ที่น้อยกว่า score -> score > points[j] เมื่อ bucket > j
+                bucket = np.searchsorted(points, score, side='left')
+                width = len(points) + 1
+                histogram = np.bincount(project_code[keep].astype(np.int64) * width + bucket,
+                                        minlength=n_projects * width).reshape(n_projects, width)
+                above = np.cumsum(histogram[:, ::-1], axis=1)[:, ::-1][:, 1:]  # (projects, points)
+                total = above.sum(axis=0)
+                
+                fired = total[position[:, 0]]
+                critical_count = total[position[:, 2]]
+                high_count = total[position[:, 1]] - total[position[:, 3]]
+                counts[:, t, 0] = critical_count
+                counts[:, t, 1] = high_count
+                counts[:, t, 2] = fired - critical_count - high_count
+                project_counts += above[:, position[:, 0]].T
+            phase['alerts'] = int(counts.sum())
+        
+        return ThresholdSweep(configs, counts, project_counts, list(projects))
+    
+    def load_threshold_profile(self, path='data/processed/threshold_profile.json'):
+        """ใช้ thresholds/severity cutoffs จาก profile (สร้างด้วย alert_calibration.py)
+
+        rules ที่ไม่มีใน profile ใช้ค่าเดิม มีผลกับการประเมินครั้งถัดไป
+        """
+        with open(path, encoding='utf-8') as f:
+            profile = json.load(f)
+        self.thresholds.update(profile.get('thresholds', {}))
+        for alert_type, (critical, high) in profile.get('severity_cutoffs', {}).items():
+            self.severity_cutoffs[alert_type] = (critical, high)
+        print(f"🎯 ใช้ threshold profile จาก {path} ({', '.join(profile.get('thresholds', {}))})")
+        return profile
+    
+    @staticmethod
+    def _row_keys(df):
+        return row_keys(df)
+
+    @staticmethod
+    def _row_fingerprints(df):
+        """hash ของ input columns ต่อแถว ใช้ตรวจว่าแถวเปลี่ยนหรือไม่"""
+        columns = [c for c in KEY_COLUMNS + INPUT_COLUMNS if c in df.columns]
+        return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+    def _row_state(self, df):
+        """(keys, fingerprints) ของ df - cache ไว้ต่อ DataFrame"""
+        state = getattr(self, '_state', None)
+        if state is None or state[0] is not df:
+            state = (df, self._row_keys(df), self._row_fingerprints(df))
+            self._state = state
+        return state[1], state[2]
+
+    def evaluate_incremental(self):
+        """โหลดข้อมูลใหม่แล้วประเมินเฉพาะแถวที่เพิ่มหรือเปลี่ยน
+
+        แถวถูกจับคู่ด้วย (project_id, g_code, s_code, month, year) และเทียบ fingerprint
+        ของ input columns; alerts ของแถวที่ไม่เปลี่ยนถูกนำกลับมาใช้ ผลลัพธ์เหมือนการ
+        ประเมินใหม่ทั้งหมด การเปลี่ยนแปลงเก็บไว้ที่ self.last_delta
+        """
+        previous_df = getattr(self, 'df', None)
+        previous_alerts = self.alerts
+
+        if not self.load_data():
+            if previous_df is not None:
+                self.df = previous_df
+            return self.alerts
+
+        if (previous_df is None or not isinstance(previous_alerts, AlertTable)
+                or previous_alerts.source is not previous_df):
+            # ยังไม่มีผลของรอบก่อน -> ประเมินทั้งหมด
+            alerts = self.evaluate_all_alerts(vectorized=True)
+            empty = AlertTable.empty(self.df, self.thresholds, self.formatter)
+            self.last_delta = AlertDelta(
+                added=alerts, resolved=empty, severity_changed=empty,
+                previous_severity=np.array([], dtype=np.int8),
+                rows_evaluated=len(self.df), rows_total=len(self.df))
+            return alerts
+
+        with self._phase('evaluate_incremental') as phase:
+            old_keys, old_fingerprints = self._row_state(previous_df)
+            new_keys, new_fingerprints = self._row_state(self.df)
+
+            # จับคู่แถวใหม่กับแถวเดิม แล้วหาแถวที่ไม่เปลี่ยน
+            old_position = pd.Index(old_keys).get_indexer(new_keys)
+            matched = old_position >= 0
+            unchanged = matched.copy()
+            unchanged[matched] = old_fingerprints[old_position[matched]] == new_fingerprints[matched]
+            if self._evaluated_config != self._evaluation_config():
+                unchanged[:] = False  # config ของ rules เปลี่ยน ต้องประเมินใหม่ทุกแถว
+            elif any(rule in TREND_RULES for rule in self.enabled_rules):
+                # trend rules ขึ้นกับเดือนอื่นใน series -> ประเมินใหม่ทั้ง series ที่มีแถวเปลี่ยนหรือหายไป
+                unchanged &= ~self._changed_series(previous_df, old_position, unchanged)
+            dirty = np.flatnonzero(~unchanged)
+
+            print(f"🔍 ประเมินแบบ incremental: {len(dirty):,} จาก {len(self.df):,} แถวที่เปลี่ยน")
+
+            # alerts เดิมของแถวที่ไม่เปลี่ยน -> ย้าย row_index ไปยังตำแหน่งใหม่
+            old_to_new = np.full(len(previous_df), -1, dtype=np.int64)
+            old_to_new[old_position[unchanged]] = np.flatnonzero(unchanged)
+            remapped = old_to_new[previous_alerts.row_index]
+            kept = remapped >= 0
+            carried = previous_alerts.take(kept)
+            carried.row_index = remapped[kept]
+
+            # ประเมินเฉพาะแถวที่เปลี่ยน
+            fresh = self._evaluate_vectorized(rows=dirty)
+            fresh.row_index = dirty[fresh.row_index]
+
+            alerts = AlertTable.concat(self.df, [carried, fresh], self.thresholds, self.formatter)
+            fresh = AlertTable.concat(self.df, [fresh], self.thresholds, self.formatter)
+            stale = previous_alerts.take(~kept)
+            self.last_delta = self._alert_delta(stale, old_keys, fresh, new_keys, len(dirty))
+            phase['rows'], phase['alerts'] = len(dirty), len(alerts)
+
+        self.alerts = alerts
+        print(f"🚨 พบ {len(alerts)} alerts ({self.last_delta.summary()})")
+        return alerts
+
+    def _changed_series(self, previous_df, old_position, unchanged):
+        """mask ของแถวใหม่ที่อยู่ใน series (project, g_code, s_code) ที่มีแถวเพิ่ม เปลี่ยน หรือถูกลบ"""
+        new_series, old_series = series_keys(self.df), series_keys(previous_df)
+        kept = np.zeros(len(previous_df), dtype=bool)
+        kept[old_position[unchanged]] = True
+        changed = np.union1d(new_series[~unchanged], old_series[~kept])
+        return np.isin(new_series, changed)
+
+    def _alert_delta(self, stale, old_keys, fresh, new_keys, rows_evaluated):
+        """เทียบ alerts เดิมของแถวที่เปลี่ยน (stale) กับผลประเมินใหม่ (fresh)"""
+        position = match_keys(alert_identity(old_keys[stale.row_index], stale.type_code),
+                              alert_identity(new_keys[fresh.row_index], fresh.type_code))
+        matched = position >= 0
+        found = np.zeros(len(stale), dtype=bool)
+        found[position[matched]] = True
+        previous_severity = stale.severity_code[position[matched]]
+        changed = previous_severity != fresh.severity_code[matched]
+
+        return AlertDelta(
+            added=fresh.take(~matched),
+            resolved=stale.take(~found),
+            severity_changed=fresh.take(np.flatnonzero(matched)[changed]),
+            previous_severity=previous_severity[changed],
+            rows_evaluated=rows_evaluated,
+            rows_total=len(new_keys)
+        )
+
+    def diff_alerts(self, previous=None):
+        """เทียบ alerts ปัจจุบันกับรอบก่อน: new, resolved, escalated, de-escalated
+
+        previous: path ของ snapshot (default: snapshot ล่าสุด), DataFrame แบบ snapshot
+        (load_alert_snapshot) หรือ AlertTable ของรอบก่อน จับคู่ด้วย hash ของ identity
+        (project_id, g_code, s_code, month, year, alert_type) แบบ hash join คืน AlertDiff
+        """
+        if previous is None or isinstance(previous, str):
+            previous = load_alert_snapshot(previous)
+        current = self.alerts
+        if not isinstance(current, AlertTable):
+            current = self.evaluate_all_alerts()
+            if not isinstance(current, AlertTable):
+                return None
+
+        with self._phase('diff') as phase:
+            old_keys, old_type, old_severity = _alert_identity_columns(previous)
+            new_keys, new_type, new_severity = _alert_identity_columns(current)
+            position = match_keys(_identity_hash(old_keys, old_type), _identity_hash(new_keys, new_type))
+
+            matched = position >= 0
+            found = np.zeros(len(old_type), dtype=bool)
+            found[position[matched]] = True
+            previous_severity = np.full(len(new_type), -1, dtype=np.int8)
+            previous_severity[matched] = old_severity[position[matched]]
+            escalated = matched & (new_severity < previous_severity)
+            deescalated = matched & (new_severity > previous_severity)
+            resolved = np.flatnonzero(~found)
+
+            parts = []
+            for change, rows in (('new', np.flatnonzero(~matched)), ('escalated', np.flatnonzero(escalated)),
+                                 ('de-escalated', np.flatnonzero(deescalated))):
+                parts.append(_change_frame(change, new_keys, new_type, new_severity,
+                                           previous_severity, rows))
+            parts.append(_change_frame('resolved', old_keys, old_type, np.full(len(old_type), -1),
+                                       old_severity, resolved))
+            changes = pd.concat(parts, ignore_index=True)
+            changes['change'] = pd.Categorical(changes['change'], categories=CHANGE_TYPES)
+
+            counts = {
+                'new': int((~matched).sum()),
+                'resolved': len(resolved),
+                'escalated': int(escalated.sum()),
+                'de-escalated': int(deescalated.sum()),
+                'unchanged': int(matched.sum() - escalated.sum() - deescalated.sum()),
+            }
+            phase['alerts'] = len(new_type) + len(old_type)
+
+        print(f"🔄 เทียบกับรอบก่อน: ใหม่ {counts['new']:,}, หายไป {counts['resolved']:,}, "
+              f"รุนแรงขึ้น {counts['escalated']:,}, ลดลง {counts['de-escalated']:,}, "
+              f"เหมือนเดิม {counts['unchanged']:,}")
+        return AlertDiff(changes, counts)
+    
+    @property
+    def alerts(self):
+        return self._alerts
+
+    @alerts.setter
+    def alerts(self, alerts):
+        # alert set เปลี่ยน -> ล้าง indexes/summaries ที่ cache ไว้
+        self._alerts = alerts
+        self._cache = {}
+        # config ที่ใช้ประเมิน alert set นี้ (evaluate_incremental ตรวจว่าเปลี่ยนหรือไม่)
+        self._evaluated_config = self._evaluation_config()
+
+    def _evaluation_config(self):
+        """ทุกค่าที่มีผลต่อผลลัพธ์ของ rules: thresholds, cutoffs, rules ที่เปิด, trend/anomaly settings"""
+        return (
+            dict(getattr(self, 'thresholds', {})),
+            dict(getattr(self, 'severity_cutoffs', {})),
+            tuple(getattr(self, 'enabled_rules', ())),
+            getattr(self, 'trend_window', None),
+            getattr(self, 'anomaly_min_count', None),
+            id(getattr(self, 'anomaly_stats', None)),
+        )
+
+    def _cached(self, name, build):
+        """คืนค่าที่ cache ไว้สำหรับ alert set ปัจจุบัน หรือสร้างใหม่ด้วย build()"""
+        if name not in self._cache:
+            self._cache[name] = build()
+        return self._cache[name]
+
+    def _count_index(self):
+        """นับ alerts ตาม severity/type/project/month ครั้งเดียวต่อการประเมิน"""
+        alerts = self.alerts
+        return {
+            "by_severity": alerts.severity_counts(),
+            "by_type": alerts.type_counts(),
+            "by_project": alerts.project_counts(),
+            "by_month": alerts.month_counts()
+        }
+
+    def get_alert_counts(self, by='severity'):
+        """จำนวน alerts ตาม 'severity', 'type', 'project' หรือ 'month' (จาก cache)"""
+        if not self.alerts:
+            return {}
+        return dict(self._cached('counts', self._count_index)[f"by_{by}"])
+
     def get_alert_summary(self):
         """สรุป alerts"""
         if not self.alerts:
             return {"total": 0}
         
-        summary = {
-            "total": len(self.alerts),
-            "by_severity": {},
-            "by_type": {},
-            "by_project": {}
-        }
-        
-        for alert in self.alerts:
-            # By severity
-            severity = alert.severity
-            summary["by_severity"][severity] = summary["by_severity"].get(severity, 0) + 1
-            
-            # By type
-            alert_type = alert.alert_type
-            summary["by_type"][alert_type] = summary["by_type"].get(alert_type, 0) + 1
-            
-            # By project
-            project = alert.project_id
-            summary["by_project"][project] = summary["by_project"].get(project, 0) + 1
+        with self._phase('summary') as phase:
+            counts = self._cached('counts', self._count_index)
+            phase['alerts'] = len(self.alerts)
+            return {
+                "total": len(self.alerts),
+                "by_severity": dict(counts['by_severity']),
+                "by_type": dict(counts['by_type']),
+                "by_project": dict(counts['by_project'])
+            }
+    
+    def alert_rollup(self):
+        """roll-up tree portfolio -> project -> g_code -> s_code (AlertRollup, cache จนกว่าจะประเมินใหม่)"""
+        if not isinstance(self.alerts, AlertTable):
+            return None
         
-        return summary
+        with self._phase('rollup') as phase:
+            phase['alerts'] = len(self.alerts)
+            return self._cached('rollup', lambda: AlertRollup.build(self.alerts))
+    
+    def alert_index(self):
+        """inverted index ของ alerts ปัจจุบัน (AlertIndex, cache จนกว่าจะประเมินใหม่)"""
+        if not isinstance(self.alerts, AlertTable):
+            return None
+        return self._cached('index', lambda: AlertIndex(self.alerts))
     
+    def query(self, project=None, alert_type=None, severity=None, g_code=None, month=None,
+              count_only=False):
+        """alerts ที่ตรงทุกเงื่อนไข เช่น query('PRJ002', 'progress_lag', 'Critical', month=range(6, 10))
+
+        แต่ละเงื่อนไขเป็นค่าเดียวหรือ list ของค่า คืน AlertTable ย่อย (iterate ได้เป็น AlertView)
+        หรือจำนวน alerts ถ้า count_only
+        """
+        index = self.alert_index()
+        if index is None:
+            return 0 if count_only else []
+        filters = {'project': project, 'alert_type': alert_type, 'severity': severity,
+                   'g_code': g_code, 'month': month}
+        if count_only:
+            return index.count(**filters)
+        return self.alerts.take(index.match(**filters))
+    
+    def top_alerts(self, n=10, alerts=None):
+        """n alerts ที่รุนแรงที่สุด เรียงตาม severity แล้วตาม variance (มากก่อน)
+
+        ไม่ sort ทั้งชุด: นับจำนวนต่อ severity เพื่อหาระดับที่ตัดที่ k แล้วใช้
+        argpartition เฉพาะ alerts ในระดับนั้น จากนั้น sort แค่ k รายการที่เลือก
+        """
+        table = self.alerts if alerts is None else alerts
+        if not table:
+            return table
+        if n <= 0:
+            return table.take(np.array([], dtype=np.int64))
+        
+        k = min(n, len(table))
+        severity = table.severity_code
+        variance = np.where(np.isnan(table.variance), -np.inf, table.variance)
+        
+        # ระดับ severity ที่ alert ลำดับที่ k ตกอยู่
+        cumulative = np.cumsum(np.bincount(severity, minlength=len(SEVERITY_LEVELS)))
+        cut_level = int(np.searchsorted(cumulative, k))
+        above = np.flatnonzero(severity < cut_level)
+        at_level = np.flatnonzero(severity == cut_level)
+        
+        remaining = k - len(above)
+        if remaining < len(at_level):
+            at_level = at_level[np.argpartition(-variance[at_level], remaining - 1)[:remaining]]
+        selected = np.concatenate([above, at_level])
+        
+        # เรียงเฉพาะ k รายการ: severity, variance มากก่อน, ลำดับเดิม
+        order = np.lexsort((selected, -variance[selected], severity[selected]))
+        return table.take(selected[order])
+
     def print_alerts(self, limit=20):
         """แสดง alerts ใน console"""
         if not self.alerts:
             print("✅ ไม่พบ alerts")
             return
         
-        # เรียงตาม severity
-        severity_order = ['Critical', 'High', 'Medium', 'Low']
-        sorted_alerts = sorted(self.alerts, key=lambda x: severity_order.index(x.severity))
+        # เลือก top alerts ตาม severity และ variance
+        top_alerts = self.top_alerts(limit)
         
         print(f"\n{'='*80}")
         print(f"🚨 BUDGET ALERTS REPORT - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -245,10 +1864,10 @@ class SimpleAlertEngine:
         print(f"   Projects Affected: {len(summary['by_project'])}")
         
         print(f"\n{'='*80}")
-        print(f"🔥 TOP {min(limit, len(sorted_alerts))} ALERTS:")
+        print(f"🔥 TOP {len(top_alerts)} ALERTS:")
         print(f"{'='*80}")
         
-        for i, alert in enumerate(sorted_alerts[:limit], 1):
+        for i, alert in enumerate(top_alerts, 1):
             severity_emoji = {
                 'Critical': '🔴',
                 'High': '🟠', 
@@ -262,69 +1881,472 @@ class SimpleAlertEngine:
             print(f"   📋 Cost Code: {alert.details.get('cost_code', 'N/A')} | Month: {alert.details.get('month', 'N/A')}")
             print(f"   📈 Current: {alert.actual_value:.1f} | Threshold: {alert.threshold:.1f} | Variance: {alert.variance:.1f}")
         
-        if len(sorted_alerts) > limit:
-            print(f"\n... และอีก {len(sorted_alerts) - limit} alerts")
+        if len(self.alerts) > limit:
+            print(f"\n... และอีก {len(self.alerts) - limit} alerts")
         
         print(f"{'='*80}")
     
+    @staticmethod
+    def _alert_record(alert):
+        """alert หนึ่งรายการในรูปแบบ dict สำหรับ export"""
+        return {
+            'project_id': alert.project_id,
+            'project_name': alert.project_name,
+            'alert_type': alert.alert_type,
+            'severity': alert.severity,
+            'message': alert.message,
+            'actual_value': alert.actual_value,
+            'threshold': alert.threshold,
+            'variance': alert.variance,
+            'details': alert.details
+        }
+
+    def iter_alert_records(self, alerts=None):
+        """generator ของ export records ทีละ alert (ไม่สร้าง list ทั้งหมดในหน่วยความจำ)"""
+        alerts = self.alerts if alerts is None else alerts
+        if isinstance(alerts, AlertTable):
+            yield from alerts.iter_records()
+        else:
+            for alert in alerts:
+                yield self._alert_record(alert)
+
     def export_alerts_json(self, filename='alerts_report.json'):
         """Export alerts เป็น JSON"""
         if not self.alerts:
             print("ไม่มี alerts ให้ export")
             return
         
-        export_data = {
+        with self._phase('export_json') as phase:
+            export_data = {
+                'timestamp': datetime.now().isoformat(),
+                'summary': self.get_alert_summary(),
+                'alerts': list(self.iter_alert_records())
+            }
+            
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(export_data, f, indent=2, ensure_ascii=False)
+            phase['alerts'] = len(export_data['alerts'])
+        
+        print(f"💾 Exported alerts to {filename}")
+
+    def export_alerts_ndjson(self, filename='alerts_report.ndjson', compress=False, header_file=None):
+        """Export alerts แบบ streaming: หนึ่ง alert ต่อหนึ่งบรรทัด (NDJSON)
+
+        summary และ timestamp ถูกเขียนแยกใน header file ขนาดเล็ก (default:
+        <ชื่อไฟล์>.header.json) หลังเขียน alerts ครบแล้ว จึงใช้เป็นสัญญาณว่าไฟล์สมบูรณ์
+        compress=True หรือชื่อไฟล์ลงท้าย .gz จะบีบอัดด้วย gzip
+        หน่วยความจำคงที่ไม่ขึ้นกับจำนวน alerts
+        """
+        if not self.alerts:
+            print("ไม่มี alerts ให้ export")
+            return
+        
+        if compress and not filename.endswith('.gz'):
+            filename += '.gz'
+        compress = filename.endswith('.gz')
+        if header_file is None:
+            base = filename[:-3] if compress else filename
+            base = base[:-len('.ndjson')] if base.endswith('.ndjson') else base
+            header_file = f"{base}.header.json"
+        
+        opener = gzip.open if compress else open
+        count = 0
+        with self._phase('export_ndjson') as phase, opener(filename, 'wt', encoding='utf-8') as f:
+            for record in self.iter_alert_records():
+                f.write(json.dumps(record, ensure_ascii=False))
+                f.write('\n')
+                count += 1
+            phase['alerts'] = count
+        
+        header = {
             'timestamp': datetime.now().isoformat(),
-            'summary': self.get_alert_summary(),
-            'alerts': []
+            'format': 'ndjson',
+            'alerts_file': os.path.basename(filename),
+            'compressed': compress,
+            'count': count,
+            'summary': self.get_alert_summary()
         }
+        with open(header_file, 'w', encoding='utf-8') as f:
+            json.dump(header, f, indent=2, ensure_ascii=False)
+        
+        print(f"💾 Exported {count:,} alerts to {filename} (header: {header_file})")
+    
+    def write_snapshot(self, base_dir=SNAPSHOT_DIR, run_time=None, format='arrow'):
+        """เขียน alerts เป็นไฟล์ columnar (Arrow IPC หรือ Parquet) ต่อรอบการรัน
+
+        ไฟล์อยู่ที่ <base_dir>/run=<YYYYmmddTHHMMSS.ffffff>/alerts.<arrow|parquet> (ระดับ microsecond
+        จึงไม่ชนกันเมื่อรันหลายรอบในวินาทีเดียว) ไม่เขียนทับ snapshot ที่มีอยู่แล้ว
+        columns แบน มี dtypes ถูกต้อง และ strings เป็น dictionary-encoded
+        Arrow IPC ไม่บีบอัด จึงโหลดกลับแบบ memory-map ได้ (ต้องมี pyarrow)
+        """
+        if pa is None:
+            print("⚠️ ไม่พบ pyarrow - ข้ามการเขียน snapshot (pip install pyarrow)")
+            return None
+        if not self.alerts:
+            print("ไม่มี alerts ให้ export")
+            return None
+        
+        run_time = run_time or datetime.now()
+        run_dir = os.path.join(base_dir, f"run={run_time.strftime('%Y%m%dT%H%M%S.%f')}")
+        path = os.path.join(run_dir, f"alerts.{'parquet' if format == 'parquet' else 'arrow'}")
+        if os.path.exists(path):
+            raise FileExistsError(f"มี snapshot ของรอบ {run_time.isoformat()} อยู่แล้ว: {path}")
+        os.makedirs(run_dir, exist_ok=True)
         
-        for alert in self.alerts:
-            export_data['alerts'].append({
-                'project_id': alert.project_id,
-                'project_name': alert.project_name,
-                'alert_type': alert.alert_type,
-                'severity': alert.severity,
-                'message': alert.message,
-                'actual_value': alert.actual_value,
-                'threshold': alert.threshold,
-                'variance': alert.variance,
-                'details': alert.details
+        with self._phase('snapshot') as phase:
+            table = pa.Table.from_pandas(self.alerts.to_frame(), preserve_index=False)
+            table = table.replace_schema_metadata({
+                'run_time': run_time.isoformat(),
+                'data_file': str(self.data_file),
+                'thresholds': json.dumps(self.thresholds)
             })
+            
+            if format == 'parquet':
+                pq.write_table(table, path)
+            else:
+                feather.write_feather(table, path, compression='uncompressed')
+            phase['alerts'] = len(self.alerts)
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(export_data, f, indent=2, ensure_ascii=False)
+        print(f"💾 Saved alert snapshot to {path}")
+        return path
+    
+    def _critical_index(self):
+        """critical alerts จัดกลุ่มตาม project ด้วย stable argsort ครั้งเดียว"""
+        critical_alerts = self.alerts.take(self.alerts.severity_code == SEVERITY_LEVELS.index('Critical'))
+        codes = critical_alerts.project_code
+        order = np.argsort(codes, kind='stable')
+        uniques, starts = np.unique(codes[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
         
-        print(f"💾 Exported alerts to {filename}")
+        groups = []
+        for code, start, end in zip(uniques, starts, ends):
+            groups.append((order[start], code, critical_alerts.take(order[start:end])))
+        groups.sort(key=lambda group: group[0])  # เรียง project ตามลำดับที่พบ
+        
+        return {
+            critical_alerts.project_categories[code]: {
+                'project_name': project_alerts[0].project_name,
+                'alerts': project_alerts
+            }
+            for _, code, project_alerts in groups
+        }
+
+    def record_history(self, run_time=None):
+        """บันทึก alerts ของรอบนี้ลง self.history คืน run_id"""
+        if self.history is None:
+            return None
+        alerts = self.alerts if self.alerts else AlertTable.empty(self.df, self.thresholds)
+        with self._phase('history') as phase:
+            run_id = self.history.record_run(alerts, run_at=run_time, data_file=str(self.data_file))
+            phase['alerts'] = len(alerts)
+        print(f"🗄️ บันทึก alerts ลง history (run {run_id})")
+        return run_id
     
     def get_critical_projects(self):
         """ดึงโครงการที่มี critical alerts"""
-        critical_alerts = [a for a in self.alerts if a.severity == 'Critical']
-        projects = {}
-        
-        for alert in critical_alerts:
-            project_id = alert.project_id
-            if project_id not in projects:
-                projects[project_id] = {
-                    'project_name': alert.project_name,
-                    'alerts': []
-                }
-            projects[project_id]['alerts'].append(alert)
+        if not self.alerts:
+            return {}
         
-        return projects
+        return dict(self._cached('critical_projects', self._critical_index))
+
+def _alert_identity_columns(alerts):
+    """(KEY_COLUMNS frame, type_code, severity_code) จาก AlertTable หรือ DataFrame แบบ snapshot"""
+    if isinstance(alerts, AlertTable):
+        return alerts.key_frame(), alerts.type_code, alerts.severity_code
+    frame = alerts.reset_index(drop=True)
+    type_code = pd.Categorical(frame['alert_type'], categories=ALERT_TYPES).codes
+    severity_code = pd.Categorical(frame['severity'], categories=SEVERITY_LEVELS).codes
+    return frame[KEY_COLUMNS], type_code, severity_code
+
+
+def _identity_hash(keys, type_code):
+    """identity ที่เทียบข้าม source ได้: ids เป็น categorical และ month/year เป็น int64 ก่อน hash
+    (ค่า hash ของ NaN ใน object กับ categorical ต่างกัน)"""
+    keys = keys.astype({'project_id': 'category', 'g_code': 'category', 's_code': 'category',
+                        'month': 'int64', 'year': 'int64'})
+    row = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+    return _unique_keys(alert_identity(row, type_code))
+
+
+def _change_frame(change, keys, type_code, severity_code, previous_severity, rows):
+    """แถวของ AlertDiff.changes สำหรับ alerts ที่ตำแหน่ง rows"""
+    frame = keys.iloc[rows].reset_index(drop=True)
+    frame.insert(0, 'change', change)
+    frame['alert_type'] = pd.Categorical.from_codes(np.asarray(type_code)[rows], ALERT_TYPES)
+    for column, codes in (('severity', severity_code), ('previous_severity', previous_severity)):
+        frame[column] = pd.Categorical.from_codes(np.asarray(codes)[rows], SEVERITY_LEVELS, ordered=True)
+    return frame
+
+
+def list_alert_snapshots(base_dir=SNAPSHOT_DIR):
+    """paths ของ snapshots ทั้งหมด เรียงจากเก่าไปใหม่"""
+    if not os.path.isdir(base_dir):
+        return []
+    paths = []
+    for run_dir in sorted(d for d in os.listdir(base_dir) if d.startswith('run=')):
+        for name in ('alerts.arrow', 'alerts.parquet'):
+            path = os.path.join(base_dir, run_dir, name)
+            if os.path.exists(path):
+                paths.append(path)
+    return paths
+
+
+def load_alert_snapshot(path=None, memory_map=True, as_arrow=False):
+    """โหลด snapshot กลับมา (default: snapshot ล่าสุด)
+
+    ไฟล์ .arrow ถูก memory-map แทนการอ่านทั้งไฟล์; as_arrow=True คืน pyarrow.Table
+    มิฉะนั้นคืน DataFrame ที่ dictionary columns เป็น categorical
+    """
+    if pa is None:
+        raise ImportError("load_alert_snapshot ต้องใช้ pyarrow (pip install pyarrow)")
+    if path is None:
+        snapshots = list_alert_snapshots()
+        if not snapshots:
+            raise FileNotFoundError(f"ไม่พบ snapshot ใน {SNAPSHOT_DIR}")
+        path = snapshots[-1]
+    
+    if path.endswith('.parquet'):
+        table = pq.read_table(path, memory_map=memory_map)
+    elif memory_map:
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    else:
+        table = feather.read_table(path, memory_map=False)
+    
+    return table if as_arrow else table.to_pandas()
+
+
+def _evaluate_shard(shard, thresholds, enabled_rules, severity_cutoffs, trend_window):
+    """ประเมิน alerts ของ shard หนึ่ง (projects ที่ติดกันหลาย projects) - รันใน worker process"""
+    start = time.perf_counter()
+    engine = SimpleAlertEngine()
+    engine.thresholds = thresholds
+    engine.enabled_rules = enabled_rules
+    engine.severity_cutoffs = severity_cutoffs
+    engine.trend_window = trend_window
+    table = engine._evaluate_vectorized(shard)
+    columns = (table.row_index, table.type_code, table.severity_code, table.actual_value, table.variance)
+    return columns, time.perf_counter() - start
+
 
 class SimpleAlertManager:
     """Alert Manager แบบง่าย"""
     
-    def __init__(self):
+    def __init__(self, workers=None, state_store=None):
         self.engine = SimpleAlertEngine()
+        
+        # จำนวน processes สำหรับ parallel mode (default = จำนวน CPU)
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_timings = []
+        
+        # ข้อมูลน้อยกว่านี้ประเมินใน process เดียว (ค่า pickle/spawn มากกว่างานที่ได้)
+        self.parallel_min_rows = 200_000
+        
+        # AlertStateStore (alert_state.py) สำหรับกันการแจ้งเตือนซ้ำข้ามรอบ
+        self.state_store = state_store
+    
+    def notifiable_alerts(self, min_severity='Critical', record=True):
+        """alerts ที่รุนแรงอย่างน้อย min_severity และยังไม่ถูกแจ้ง (ตาม state_store)
+
+        record=False ไม่บันทึกลง state_store (ผู้เรียกบันทึกเองหลังส่งสำเร็จ)
+        """
+        alerts = self._severe_alerts(min_severity)
+        if alerts and self.state_store is not None:
+            alerts = self.state_store.filter_notifiable(alerts, record=record)
+        return alerts
+    
+    def _severe_alerts(self, min_severity):
+        alerts = self.engine.alerts
+        if not alerts:
+            return alerts
+        return alerts.take(alerts.severity_code <= SEVERITY_LEVELS.index(min_severity))
+    
+    def notify(self, destinations, min_severity='Critical', **options):
+        """ส่ง alerts ที่ต้องแจ้งไปยัง webhooks/gateways แบบ batch (ดู alert_dispatcher.py)"""
+        from alert_dispatcher import dispatch_alerts
+        
+        alerts = self.notifiable_alerts(min_severity, record=False)
+        if not alerts:
+            print("📭 ไม่มี alerts ใหม่ที่ต้องแจ้ง")
+            return {}
+        
+        print(f"📤 กำลังส่ง {len(alerts):,} alerts ไปยัง {len(destinations)} ปลายทาง...")
+        report, delivered = dispatch_alerts(self.engine, alerts, destinations, **options)
+        for url, metrics in report.items():
+            print(f"   • {url}: ส่งแล้ว {metrics['sent']:,} ใน {metrics['batches']} batches, "
+                  f"ล้มเหลว {metrics['failed']:,}, retries {metrics['retries']}")
+        
+        # บันทึกเฉพาะ alerts ที่ส่งสำเร็จครบทุกปลายทาง ที่เหลือจะถูกแจ้งอีกในรอบถัดไป
+        if self.state_store is not None:
+            self.state_store.record_notified(self._severe_alerts(min_severity),
+                                             alerts.take(np.array(delivered, dtype=bool)))
+        return report
     
-    def run_check(self):
-        """รัน alert check"""
+    def run_check(self, vectorized=None, incremental=False, parallel=False):
+        """รัน alert check
+
+        incremental=True โหลดข้อมูลใหม่และประเมินเฉพาะแถวที่เปลี่ยนตั้งแต่รอบก่อน
+        (ดูการเปลี่ยนแปลงได้ที่ engine.last_delta)
+        parallel=True แบ่งข้อมูลตาม project_id แล้วประเมินใน process pool
+        """
         print("🚨 เริ่ม Simple Alert Check...")
-        alerts = self.engine.evaluate_all_alerts()
+        if incremental:
+            alerts = self.engine.evaluate_incremental()
+        elif parallel:
+            alerts = self.run_parallel()
+        else:
+            alerts = self.engine.evaluate_all_alerts(vectorized=vectorized)
+        
+        if self.engine.history is not None and hasattr(self.engine, 'df'):
+            self.engine.record_history()
+        return alerts
+    
+    def run_parallel(self, workers=None):
+        """ประเมิน alerts แบบขนาน แบ่ง shard ตาม project_id
+
+        projects ติดกันถูกรวมเป็นประมาณ workers shards ที่มีจำนวนแถวใกล้เคียงกัน (project
+        หนึ่งไม่ถูกแบ่งข้าม shard) ข้อมูลที่น้อยกว่า parallel_min_rows ประเมินใน process เดียว
+        ผลลัพธ์ถูกรวมและเรียงตามแถวของ master data จึงเหมือนการรันแบบ serial ทุกประการ
+        เวลาที่ใช้ต่อ shard เก็บไว้ที่ self.shard_timings
+        """
+        engine = self.engine
+        if not engine._ensure_data():
+            return []
+        workers = workers or self.workers
+        df = engine.df
+        if len(df) < self.parallel_min_rows:
+            workers = 1
+        
+        # ตำแหน่งแถวของแต่ละ project (เรียงตามลำดับที่พบ) แล้วตัดที่ขอบ project ให้ได้ workers shards
+        codes, projects = pd.factorize(df['project_id'])
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(projects) + 1))
+        targets = np.linspace(0, len(df), min(workers, max(len(projects), 1)) + 1)
+        cuts = np.unique(np.r_[0, bounds[np.searchsorted(bounds, targets[1:-1])], len(df)])
+        shards = [order[cuts[i]:cuts[i + 1]] for i in range(len(cuts) - 1)]
+        shard_projects = np.diff(np.searchsorted(bounds, cuts))
+        
+        print(f"🔍 กำลังประเมิน alerts แบบขนาน: {len(projects)} projects ใน {len(shards)} shards, "
+              f"{workers} workers...")
+        start = time.perf_counter()
+        
+        # anomaly rules ใช้สถิติข้าม projects ต่อ (g_code, s_code) -> ประเมินใน process หลัก
+        shard_rules = [rule for rule in engine.enabled_rules if rule not in ANOMALY_RULES]
+        anomaly_rules = [rule for rule in engine.enabled_rules if rule in ANOMALY_RULES]
+        args = [(df.iloc[positions], engine.thresholds, shard_rules, engine.severity_cutoffs,
+                 engine.trend_window) for positions in shards]
+        with engine._phase('evaluate_parallel') as phase:
+            if workers > 1 and len(shards) > 1:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(_evaluate_shard, *zip(*args)))
+            else:
+                results = [_evaluate_shard(*arg) for arg in args]
+            phase['rows'] = len(df)
+            phase['alerts'] = sum(len(columns[0]) for columns, _ in results)
+        
+        tables, self.shard_timings = [], []
+        for shard, (positions, (columns, seconds)) in enumerate(zip(shards, results)):
+            row_index, type_code, severity_code, actual_value, variance = columns
+            tables.append(AlertTable(df, positions[row_index], type_code, severity_code,
+                                     actual_value, variance, engine.thresholds, engine.formatter))
+            self.shard_timings.append({
+                'shard': shard,
+                'projects': int(shard_projects[shard]),
+                'rows': len(positions),
+                'alerts': len(row_index),
+                'seconds': seconds
+            })
+        
+        if anomaly_rules:
+            tables.append(engine._evaluate_vectorized(rules=anomaly_rules))
+        alerts = AlertTable.concat(df, tables, engine.thresholds, engine.formatter)
+        engine.alerts = alerts
+        
+        elapsed = time.perf_counter() - start
+        print(f"🚨 พบ {len(alerts)} alerts ({elapsed:.2f}s)")
+        for timing in self.shard_timings:
+            print(f"   ⏱️ shard {timing['shard']} ({timing['projects']:,} projects): {timing['rows']:,} rows, "
+                  f"{timing['alerts']:,} alerts, {timing['seconds'] * 1000:.1f} ms")
         return alerts
     
+    def _file_signature(self):
+        """(mtime, size) ของ data file หรือ None ถ้าไม่มีไฟล์"""
+        try:
+            stat = os.stat(self.engine.data_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _file_hash(self):
+        """hash ของเนื้อหาไฟล์ (อ่านทีละ 1 MB)"""
+        digest = hashlib.blake2b(digest_size=16)
+        with open(self.engine.data_file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _wait_for_change(self, inotify, interval):
+        """รอ event จาก inotify หรือ sleep ตาม interval (polling)"""
+        if inotify is None:
+            time.sleep(interval)
+            return
+        name = os.path.basename(self.engine.data_file)
+        for event in inotify.read(timeout=int(interval * 1000)):
+            if event.name == name:
+                return
+
+    def watch(self, interval=2.0, debounce=1.0, max_cycles=None, on_update=None):
+        """ประเมิน alerts ใหม่ทุกครั้งที่ data file เปลี่ยน (ทำงานจนกด Ctrl+C)
+
+        ตรวจการเปลี่ยนแปลงด้วย mtime/size (ใช้ inotify ถ้ามี inotify_simple) รอให้ไฟล์นิ่ง
+        อย่างน้อย debounce วินาที แล้วเทียบ content hash ก่อนประเมินแบบ incremental
+        ข้อมูลและ alerts รอบก่อนอยู่ในหน่วยความจำตลอด จึงประเมินเฉพาะแถวที่เปลี่ยน
+        on_update(alerts, delta) ถูกเรียกหลังประเมินแต่ละรอบ
+        max_cycles จำกัดจำนวนรอบการประเมิน (None = ไม่จำกัด)
+        """
+        inotify = None
+        if inotify_simple is not None:
+            inotify = inotify_simple.INotify()
+            flags = inotify_simple.flags
+            watch_dir = os.path.dirname(os.path.abspath(self.engine.data_file))
+            inotify.add_watch(watch_dir, flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE)
+        
+        print(f"👀 Watch mode: {self.engine.data_file} "
+              f"({'inotify' if inotify else f'polling ทุก {interval}s'}) - กด Ctrl+C เพื่อหยุด")
+        
+        last_signature, last_hash, cycles = None, None, 0
+        try:
+            while max_cycles is None or cycles < max_cycles:
+                signature = self._file_signature()
+                if signature is None or signature == last_signature:
+                    self._wait_for_change(inotify, interval)
+                    continue
+                
+                # debounce: รอจนไฟล์ไม่เปลี่ยนระหว่างที่ ETL ยังเขียนอยู่
+                time.sleep(debounce)
+                if self._file_signature() != signature:
+                    continue
+                last_signature = signature
+                
+                content_hash = self._file_hash()
+                if content_hash == last_hash:
+                    continue
+                last_hash = content_hash
+                
+                started = time.perf_counter()
+                alerts = self.run_check(incremental=True)
+                delta = getattr(self.engine, 'last_delta', None)
+                cycles += 1
+                print(f"⏱️ ประเมินเสร็จใน {time.perf_counter() - started:.2f}s "
+                      f"- {delta.summary() if delta else ''}")
+                if on_update is not None:
+                    on_update(alerts, delta)
+        except KeyboardInterrupt:
+            print("\n👋 หยุด watch mode")
+        finally:
+            if inotify is not None:
+                inotify.close()
+        return self.engine.alerts
+    
     def show_dashboard(self):
         """แสดง dashboard ใน console"""
         alerts = self.engine.alerts
@@ -353,33 +2375,100 @@ class SimpleAlertManager:
         print(f"📊 Total Alerts: {summary['total']}")
         print(f"🔥 Critical: {critical_count} | High: {high_count} | Medium: {summary['by_severity'].get('Medium', 0)}")
         
-        # Top projects with issues
-        print(f"\n📋 Top Projects with Most Alerts:")
-        project_counts = summary['by_project']
-        top_projects = sorted(project_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-        
-        for project_id, count in top_projects:
-            print(f"   • {project_id}: {count} alerts")
+        # Projects ที่รุนแรงที่สุด พร้อม g_code ที่เป็นต้นเหตุ (จาก roll-up tree)
+        rollup = self.engine.alert_rollup()
+        print(f"\n📋 Top Projects (worst severity, alerts, overrun):")
+        for project in rollup.children()[:5]:
+            print(f"   • {project['key']}: [{project['worst_severity']}] {project['alerts']} alerts, "
+                  f"overrun {project['overrun']:,.0f}")
+            for group in rollup.children((project['key'],))[:3]:
+                print(f"       - {group['key']}: [{group['worst_severity']}] {group['alerts']} alerts, "
+                      f"overrun {group['overrun']:,.0f} ({group['children']} s_codes)")
         
         # Alert types breakdown
         print(f"\n📈 Alert Types:")
         for alert_type, count in summary['by_type'].items():
             print(f"   • {alert_type.replace('_', ' ').title()}: {count}")
         
+        # Alerts ที่รุนแรงที่สุด
+        print(f"\n🔥 Top Alerts:")
+        for alert in self.engine.top_alerts(3):
+            print(f"   • [{alert.severity}] {alert.project_id} {alert.alert_type}: variance {alert.variance:.1f}")
+        
         print(f"{'='*60}")
 
 # === MAIN EXECUTION ===
-def main():
+def parse_args(argv=None):
+    """อ่าน command line options"""
+    parser = argparse.ArgumentParser(description="Simple AI Budget Alert System")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="จำนวน processes (>1 = ประเมินแบบขนานแบ่งตาม project)")
+    parser.add_argument('--history', metavar='DB',
+                        help="บันทึก alerts ของรอบนี้ลงฐานข้อมูลประวัติ (SQLite)")
+    parser.add_argument('--notify', metavar='URL', action='append', default=[],
+                        help="ส่ง critical alerts ไปยัง webhook (ระบุได้หลายครั้ง)")
+    parser.add_argument('--state-db', metavar='DB',
+                        help="state store สำหรับกันการแจ้งเตือนซ้ำข้ามรอบ (SQLite)")
+    parser.add_argument('--watch', action='store_true',
+                        help="ทำงานต่อเนื่อง ประเมินใหม่เมื่อ master_data.csv เปลี่ยน")
+    parser.add_argument('--interval', type=float, default=2.0,
+                        help="ช่วงเวลา polling ของ watch mode (วินาที)")
+    parser.add_argument('--trend-rules', action='store_true',
+                        help="เปิด trend rules (cost_acceleration, cpi_decline, burn_rate)")
+    parser.add_argument('--anomaly-rules', action='store_true',
+                        help="เปิด anomaly rules (actual_anomaly, cpi_anomaly, utilization_anomaly)")
+    parser.add_argument('--anomaly-state', metavar='FILE',
+                        help="โหลด/บันทึกสถิติของ anomaly rules (.npz) ข้ามรอบ - ประเมินเฉพาะเดือนที่ใหม่กว่า stats")
+    parser.add_argument('--profile', metavar='FILE',
+                        help="ใช้ thresholds จาก profile ที่สร้างด้วย alert_calibration.py")
+    parser.add_argument('--metrics', metavar='FILE',
+                        help="จับเวลาต่อ phase/rule และเขียนเป็น Prometheus text file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main function สำหรับรัน alert system"""
+    args = parse_args(argv)
     print("🚨 Simple AI Budget Alert System")
     print("=" * 60)
     
     # สร้าง alert manager
-    alert_manager = SimpleAlertManager()
+    alert_manager = SimpleAlertManager(workers=args.workers)
+    if args.state_db:
+        from alert_state import AlertStateStore
+        alert_manager.state_store = AlertStateStore(args.state_db)
+    if args.history:
+        from alert_history import AlertHistory
+        alert_manager.engine.history = AlertHistory(args.history)
+    if args.trend_rules:
+        alert_manager.engine.enabled_rules += TREND_RULES
+    if args.anomaly_rules or args.anomaly_state:
+        alert_manager.engine.enabled_rules += ANOMALY_RULES
+    if args.anomaly_state and os.path.exists(args.anomaly_state):
+        from alert_anomaly import AnomalyStats
+        alert_manager.engine.anomaly_stats = AnomalyStats.load(args.anomaly_state)
+    if args.profile:
+        alert_manager.engine.load_threshold_profile(args.profile)
+    metrics = None
+    if args.metrics:
+        from alert_metrics import EngineMetrics
+        metrics = alert_manager.engine.metrics = EngineMetrics()
+    
+    if args.watch:
+        def on_update(alerts, delta):
+            alert_manager.show_dashboard()
+            if args.anomaly_state and alert_manager.engine.anomaly_stats is not None:
+                alert_manager.engine.anomaly_stats.save(args.anomaly_state)
+            if metrics is not None:
+                metrics.write_prometheus(args.metrics)
+        
+        alert_manager.watch(interval=args.interval, on_update=on_update)
+        return
     
     try:
         # รัน alert check
-        alerts = alert_manager.run_check()
+        alerts = alert_manager.run_check(parallel=args.workers > 1)
+        if args.anomaly_state and alert_manager.engine.anomaly_stats is not None:
+            alert_manager.engine.anomaly_stats.save(args.anomaly_state)
         
         if alerts:
             # แสดง dashboard
@@ -391,6 +2480,11 @@ def main():
             # Export JSON
             alert_manager.engine.export_alerts_json()
             
+            # เทียบกับ snapshot ของรอบก่อน แล้วบันทึก snapshot รอบนี้ (ถ้ามี pyarrow)
+            if pa is not None and list_alert_snapshots():
+                alert_manager.engine.diff_alerts()
+            alert_manager.engine.write_snapshot()
+            
             # แสดง critical projects
             critical_projects = alert_manager.engine.get_critical_projects()
             if critical_projects:
@@ -398,6 +2492,10 @@ def main():
                 for project_id, project_data in critical_projects.items():
                     print(f"   🔴 {project_data['project_name']} ({project_id})")
                     print(f"       {len(project_data['alerts'])} critical alerts")
+            
+            # ส่ง critical alerts ไปยัง webhooks
+            if args.notify:
+                alert_manager.notify(args.notify)
         else:
             print("✅ เยี่ยม! ไม่พบ alerts - ทุกโครงการอยู่ในสถานะดี")
         
@@ -405,8 +2503,14 @@ def main():
         print(f"\n💡 การใช้งานเพิ่มเติม:")
         print(f"   • ดู alerts ทั้งหมด: alert_manager.engine.print_alerts()")
         print(f"   • Export JSON: alert_manager.engine.export_alerts_json()")
+        print(f"   • Export NDJSON (streaming): alert_manager.engine.export_alerts_ndjson(compress=True)")
         print(f"   • แก้ไข thresholds: alert_manager.engine.thresholds")
         
+        if metrics is not None:
+            metrics.print_report()
+            metrics.write_prometheus(args.metrics)
+            print(f"📈 บันทึก metrics ที่ {args.metrics}")
+        
     except Exception as e:
         print(f"❌ Error: {e}")
         print(f"💡 ตรวจสอบว่าไฟล์ data/processed/master_data.csv มีอยู่หรือไม่")
@@ -0,0 +1,150 @@
+"""
+Synthetic Data Generator - สร้าง master data จำลองขนาดใหญ่สำหรับทดสอบ/benchmark
+columns เข้ากันได้กับ master_data.csv และใช้การกระจายของ budget/actual/progress
+จากข้อมูลจริง (resample จาก reference file)
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+REFERENCE_FILE = 'data/processed/master_data.csv'
+
+
+class SyntheticMasterData:
+    """สร้าง master data ตามจำนวน projects × cost codes × months
+
+    budget สุ่มจาก log-budget ของ reference, actual = budget × utilization ที่ resample
+    จาก reference (+ noise เล็กน้อย), progress resample ตามเดือนจาก reference
+    derived columns (cpi, spi, efficiency_score, ...) คำนวณด้วยสูตรเดียวกับ ETL
+    """
+
+    def __init__(self, reference_file=REFERENCE_FILE, seed=42):
+        self.rng = np.random.default_rng(seed)
+        self._fit(reference_file)
+
+    def _fit(self, reference_file):
+        if os.path.exists(reference_file):
+            ref = pd.read_csv(reference_file, usecols=[
+                'g_code', 's_code', 'description', 'month', 'total_budget', 'total_actual',
+                'progress_percentage'])
+            ref = ref[ref['total_budget'] > 0]
+            self.log_budget = np.log(ref['total_budget'].to_numpy())
+            self.utilization = (ref['total_actual'] / ref['total_budget']).to_numpy()
+            self.progress_by_month = {
+                month: group.to_numpy() for month, group in ref.groupby('month')['progress_percentage']}
+            self.cost_codes = ref[['g_code', 's_code', 'description']].drop_duplicates().reset_index(drop=True)
+        else:
+            # ค่าประมาณจากข้อมูลชุดแรก (5 projects × 25 cost codes × 12 months)
+            self.log_budget = self.rng.normal(15.7, 0.64, 5000)
+            self.utilization = self.rng.normal(0.99, 0.185, 5000).clip(0.5, 1.5)
+            self.progress_by_month = {m: self.rng.uniform(0, 100, 1000) for m in range(1, 13)}
+            self.cost_codes = pd.DataFrame({'g_code': ['G001'], 's_code': [np.nan], 'description': ['งานทั่วไป']})
+
+    def _cost_code_catalog(self, n_codes):
+        """cost codes n รายการ: ใช้ของ reference ก่อน แล้วสร้าง G### ใหม่ต่อท้าย"""
+        catalog = self.cost_codes.iloc[:n_codes]
+        extra = n_codes - len(catalog)
+        if extra > 0:
+            index = np.arange(extra)
+            generated = pd.DataFrame({
+                'g_code': [f"G{100 + i // 4:03d}" for i in index],
+                's_code': [np.nan if i % 4 == 0 else f"S{i % 4:03d}" for i in index],
+                'description': [f"งานจำลอง {i + 1}" for i in index],
+            })
+            catalog = pd.concat([catalog, generated], ignore_index=True)
+        return catalog
+
+    def generate(self, projects=5, cost_codes=25, months=12, start_year=2024, project_offset=0):
+        """DataFrame ขนาด projects × cost_codes × months แถว"""
+        rng = self.rng
+        catalog = self._cost_code_catalog(cost_codes)
+        n = projects * cost_codes * months
+
+        project_index = np.repeat(np.arange(projects) + project_offset, cost_codes * months)
+        code_index = np.tile(np.repeat(np.arange(cost_codes), months), projects)
+        period = np.tile(np.arange(months), projects * cost_codes)
+        month = period % 12 + 1
+        year = start_year + period // 12
+
+        budget = np.exp(rng.choice(self.log_budget, n) + rng.normal(0, 0.05, n)).round(2)
+        actual = (budget * rng.choice(self.utilization, n) * rng.lognormal(0, 0.03, n)).round(2)
+        progress = np.empty(n)
+        for m, values in self.progress_by_month.items():
+            mask = month == m
+            progress[mask] = rng.choice(values, mask.sum())
+        progress = (progress + rng.normal(0, 1.0, n)).clip(0, 100).round(2)
+
+        project_ids = np.array([f"PRJ{i + 1:03d}" for i in range(project_offset, project_offset + projects)])
+        df = pd.DataFrame({
+            'project_id': project_ids[project_index - project_offset],
+            'g_code': catalog['g_code'].to_numpy()[code_index],
+            's_code': catalog['s_code'].to_numpy()[code_index],
+            'description': catalog['description'].to_numpy()[code_index],
+            'month': month,
+            'year': year,
+            'total_budget': budget,
+            'total_actual': actual,
+            'progress_percentage': progress,
+        })
+        df['project_name'] = 'โครงการจำลอง ' + df['project_id']
+
+        # derived features ตามสูตรใน ETL (add_derived_features / create_alert_flags)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            expected_progress = (month / 12) * 100
+            cpi = np.where(actual > 0, budget / actual, 1.0)
+            df['cpi'] = cpi
+            df['spi'] = np.where(expected_progress > 0, progress / expected_progress, 1.0)
+            df['budget_utilization_pct'] = (actual / budget) * 100
+            cost_efficiency = np.where(actual > 0, budget / actual, 1.0)
+            progress_efficiency = np.where(expected_progress > 0, progress / expected_progress, 1.0)
+            df['efficiency_score'] = (
+                np.clip(cost_efficiency, 0, 2) * 0.4 +
+                np.clip(progress_efficiency, 0, 2) * 0.4 +
+                np.clip(cpi, 0, 2) * 0.2
+            ) * 50
+            df['eac'] = np.where(cpi > 0, budget / cpi, budget * 2)
+        df['risk_overrun'] = (actual > budget).astype(int)
+        df['risk_progress_lag'] = (actual > progress * budget / 100 * 1.5).astype(int)
+        df['risk_high_variance'] = (np.abs(df['budget_utilization_pct'] - 100) > 25).astype(int)
+        df['risk_forecast_overrun'] = (df['eac'] > budget * 1.15).astype(int)
+        df['date'] = pd.to_datetime(dict(year=year, month=month, day=1)).dt.strftime('%Y-%m-%d')
+        return df
+
+    def write_csv(self, path, projects=5, cost_codes=25, months=12, projects_per_chunk=None):
+        """เขียนลง CSV ทีละกลุ่มของ projects (หน่วยความจำไม่ขึ้นกับขนาดรวม)"""
+        rows_per_project = cost_codes * months
+        projects_per_chunk = projects_per_chunk or max(1, 1_000_000 // rows_per_project)
+        written = 0
+        for offset in range(0, projects, projects_per_chunk):
+            chunk = self.generate(min(projects_per_chunk, projects - offset), cost_codes, months,
+                                  project_offset=offset)
+            chunk.to_csv(path, mode='w' if offset == 0 else 'a', header=offset == 0,
+                         index=False, encoding='utf-8')
+            written += len(chunk)
+        return written
+
+
+def shape_for_rows(rows, cost_codes=25, months=12):
+    """จำนวน projects ที่ทำให้ได้ราว rows แถว (cost_codes × months ต่อ project)"""
+    return max(1, round(rows / (cost_codes * months)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="สร้าง master_data.csv จำลอง")
+    parser.add_argument('output')
+    parser.add_argument('--projects', type=int, default=5)
+    parser.add_argument('--cost-codes', type=int, default=25)
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    generator = SyntheticMasterData(seed=args.seed)
+    rows = generator.write_csv(args.output, args.projects, args.cost_codes, args.months)
+    print(f"✅ สร้าง {args.output}: {rows:,} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+fixtures ร่วมของ regression tests: master data จริง (data/processed/master_data.csv)
+และ master data จำลองขนาดเล็กจาก synthetic_data.py
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from alert_system import SimpleAlertEngine  # noqa: E402
+from synthetic_data import SyntheticMasterData  # noqa: E402
+
+MASTER_DATA = os.path.join(ROOT, 'data', 'processed', 'master_data.csv')
+
+
+@pytest.fixture(scope='session')
+def master_csv():
+    return MASTER_DATA
+
+
+@pytest.fixture(scope='session')
+def synthetic_csv(tmp_path_factory):
+    """8 projects × 12 cost codes × 15 เดือน (ข้ามปี) ~1,440 แถว"""
+    path = str(tmp_path_factory.mktemp('data') / 'master_synthetic.csv')
+    SyntheticMasterData(MASTER_DATA, seed=7).write_csv(path, projects=8, cost_codes=12, months=15)
+    return path
+
+
+@pytest.fixture(params=['master', 'synthetic'])
+def data_file(request, master_csv, synthetic_csv):
+    return master_csv if request.param == 'master' else synthetic_csv
+
+
+def make_engine(data_file, rules=(), **settings):
+    """engine ที่โหลดข้อมูลแล้ว พร้อม rules เพิ่มเติม (เช่น TREND_RULES) และค่าอื่นๆ"""
+    engine = SimpleAlertEngine(data_file)
+    engine.enabled_rules = engine.enabled_rules + [rule for rule in rules if rule not in engine.enabled_rules]
+    for name, value in settings.items():
+        setattr(engine, name, value)
+    engine.load_data()
+    return engine
@@ -0,0 +1,214 @@
+"""anomaly rules: z-score แบบ streaming ต้องตรงกับการคำนวณตรงๆ ต่อเนื่องข้ามรอบ/process
+และรับมือการแก้ข้อมูลของเดือนที่ประเมินไปแล้ว"""
+
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from alert_anomaly import AnomalyStats
+from alert_system import ALERT_TYPES, ANOMALY_METRICS, ANOMALY_RULES, SimpleAlertEngine
+from conftest import make_engine
+
+
+def engine_with(data_file, stats=None):
+    engine = make_engine(data_file, ANOMALY_RULES)
+    engine.anomaly_stats = stats
+    return engine
+
+
+def periods(df):
+    return (df['year'] * 12 + df['month']).to_numpy()
+
+
+def reference_scores(df, column, min_count=3):
+    """|z| ที่มากกว่าระหว่าง (g_code, s_code) กับ project เทียบกับค่าของเดือนก่อนหน้าทั้งหมด"""
+    period = periods(df)
+    values = df[column].to_numpy(dtype=float)
+    scopes = [list(zip(df['g_code'].astype(object), df['s_code'].astype(object).where(df['s_code'].notna(), None))),
+              list(df['project_id'].astype(object))]
+    history = [{}, {}]
+    scores = np.full(len(df), np.nan)
+    for month in np.unique(period):
+        rows = np.flatnonzero(period == month)
+        for row in rows:
+            for scope, seen in zip(scopes, history):
+                previous = seen.get(scope[row], [])
+                if len(previous) >= min_count and np.std(previous, ddof=1) > 0 and not np.isnan(values[row]):
+                    z = abs(values[row] - np.mean(previous)) / np.std(previous, ddof=1)
+                    scores[row] = np.fmax(scores[row], z)
+        for row in rows:
+            if not np.isnan(values[row]):
+                for scope, seen in zip(scopes, history):
+                    seen.setdefault(scope[row], []).append(values[row])
+    return scores
+
+
+def anomaly_alerts(alerts):
+    return alerts.take(np.isin(alerts.type_code, [ALERT_TYPES.index(rule) for rule in ANOMALY_RULES]))
+
+
+def test_scores_match_reference(data_file):
+    engine = engine_with(data_file)
+    results = engine._anomaly_values(engine.df)
+    for rule, column in ANOMALY_METRICS.items():
+        valid, score = results[rule]
+        expected = reference_scores(engine.df, column)
+        assert np.allclose(np.where(valid, score, np.nan), expected, equal_nan=True), rule
+    # เดือนล่าสุดให้คะแนนแล้วแต่ยังไม่รวมเข้า stats
+    assert engine.anomaly_stats.through_period == np.unique(periods(engine.df))[-2]
+
+
+def test_saved_state_keeps_alerts(tmp_path, data_file):
+    engine = engine_with(data_file)
+    alerts = engine.evaluate_all_alerts()
+    assert len(anomaly_alerts(alerts)) > 0
+    path = str(tmp_path / 'anomaly_state.npz')
+    engine.anomaly_stats.save(path)
+    # เก็บเฉพาะแถวที่เกิน threshold ไม่ใช่ทุกแถว
+    assert 0 < len(engine.anomaly_stats.flagged_keys) < len(engine.df)
+
+    reloaded = engine_with(data_file, AnomalyStats.load(path))
+    assert reloaded.evaluate_all_alerts().equals(alerts)
+
+
+def first_months(engine, months):
+    period = periods(engine.df)
+    cut = np.unique(period)[months - 1]
+    return engine.df[period <= cut].reset_index(drop=True)
+
+
+@pytest.mark.parametrize('same_process', [True, False])
+def test_split_runs_match_single_pass(tmp_path, data_file, same_process):
+    expected = engine_with(data_file).evaluate_all_alerts()
+
+    first = engine_with(data_file)
+    full_df = first.df
+    first.df = first_months(first, 6)
+    first.evaluate_all_alerts()
+    if same_process:
+        second = first
+        second.df = full_df
+    else:
+        path = str(tmp_path / 'anomaly_state.npz')
+        first.anomaly_stats.save(path)
+        second = engine_with(data_file, AnomalyStats.load(path))
+    assert second.evaluate_all_alerts().equals(expected)
+
+
+def revise(df, period, factor, rows=20):
+    """คูณ total_actual (และคอลัมน์ที่ขึ้นกับมัน) ของ rows แถวแรกของเดือน period"""
+    df = df.copy()
+    target = df.index[periods(df) == period][:rows]
+    df.loc[target, 'total_actual'] *= factor
+    df.loc[target, 'budget_utilization_pct'] *= factor
+    df.loc[target, 'cpi'] /= factor
+    return df
+
+
+@pytest.mark.parametrize('extra_rules', [(), ('cost_overrun', 'progress_lag')], ids=['anomaly', 'mixed'])
+def test_incremental_revise_and_append_matches_full(tmp_path, data_file, extra_rules):
+    path = str(tmp_path / 'master_data.csv')
+    full = pd.read_csv(data_file)
+    month = periods(full)
+    last, previous = np.unique(month)[-1], np.unique(month)[-2]
+    full[month < last].to_csv(path, index=False)
+
+    engine = SimpleAlertEngine(path)
+    engine.enabled_rules = list(extra_rules) + ANOMALY_RULES
+    engine.evaluate_incremental()
+
+    # แก้เดือน N-1 (ที่ประเมินไปแล้ว) และเพิ่มเดือน N
+    revise(full, previous, 3.0).to_csv(path, index=False)
+    updated = engine.evaluate_incremental()
+    assert engine.last_delta.rows_evaluated < len(engine.df)
+
+    rebuilt = SimpleAlertEngine(path)
+    rebuilt.enabled_rules = list(engine.enabled_rules)
+    expected = rebuilt.evaluate_all_alerts()
+    assert len(anomaly_alerts(expected)) > 0
+    assert updated.equals(expected)
+
+
+def test_deep_revision_corrects_stats(data_file):
+    engine = engine_with(data_file)
+    full_df = engine.df
+    unique = np.unique(periods(full_df))
+    engine.df = first_months(engine, len(unique) - 1)
+    engine.evaluate_all_alerts()
+
+    # แก้และลบแถวของเดือนที่รวมเข้า stats ไปแล้ว แล้วจึงเพิ่มเดือนใหม่
+    deep = unique[2]
+    revised = revise(full_df, deep, 5.0)
+    revised = revised.drop(index=revised.index[periods(revised) == unique[3]][:7]).reset_index(drop=True)
+    engine.df = revised[periods(revised) < unique[-1]].reset_index(drop=True)
+    engine.evaluate_all_alerts()
+    engine.df = revised
+    engine.evaluate_all_alerts()
+
+    rebuilt = engine_with(data_file)
+    rebuilt.df = revised
+    expected = rebuilt._anomaly_values(revised)
+    stats, reference = engine.anomaly_stats, rebuilt.anomaly_stats
+    assert stats.through_period == reference.through_period
+    assert np.array_equal(stats.keys, reference.keys)
+    for name in ('count', 'mean', 'm2'):
+        assert np.allclose(getattr(stats, name), getattr(reference, name)), name
+
+    # เดือนใหม่ให้คะแนนด้วยสถิติที่แก้แล้ว ตรงกับการประเมินใหม่ทั้งหมด
+    latest = periods(revised) == unique[-1]
+    results = engine._anomaly_values(revised)
+    for rule in ANOMALY_RULES:
+        assert np.array_equal(results[rule][0][latest], expected[rule][0][latest]), rule
+        assert np.allclose(results[rule][1][latest], expected[rule][1][latest], equal_nan=True), rule
+
+
+def test_legacy_state_file_loads(tmp_path):
+    path = str(tmp_path / 'legacy.npz')
+    np.savez(path, metrics=np.array(['total_actual']), keys=np.array([1, 2], dtype=np.uint64),
+             count=np.ones((2, 1)), mean=np.zeros((2, 1)), m2=np.zeros((2, 1)), through_period=24300,
+             row_keys=np.array([7], dtype=np.uint64), row_values=np.ones((1, 1)), row_scores=np.ones((1, 1)))
+    stats = AnomalyStats.load(path)
+    assert len(stats) == 2 and stats.through_period == 24300
+    assert len(stats.flagged_keys) == 0
+    assert np.isnan(stats.flagged(np.array([7], dtype=np.uint64))).all()
+
+
+def test_flag_keeps_only_rows_above_floor():
+    stats = AnomalyStats(['a', 'b'])
+    floors = np.array([3.0, 3.0])
+    keys = np.array([30, 10, 20], dtype=np.uint64)
+    stats.flag(keys, np.array([[4.0, 1.0], [2.0, np.nan], [5.0, 6.0]]), floors)
+    assert stats.flagged_keys.tolist() == [20, 30]
+    np.testing.assert_array_equal(stats.flagged(keys), [[4.0, np.nan], [np.nan, np.nan], [5.0, 6.0]])
+
+    # แทนค่าเดิม และลบแถวที่ไม่เกินแล้ว
+    stats.flag(np.array([30, 20], dtype=np.uint64), np.array([[9.0, 9.0], [1.0, 1.0]]), floors)
+    assert stats.flagged_keys.tolist() == [30]
+    np.testing.assert_array_equal(stats.flagged_scores, [[9.0, 9.0]])
+
+
+@pytest.mark.parametrize('batches', [1, 3])
+def test_update_and_remove_match_numpy(batches):
+    rng = np.random.default_rng(0)
+    keys = rng.integers(0, 5, 300).astype(np.uint64)
+    values = rng.normal(size=(300, 2))
+    values[rng.random((300, 2)) < 0.1] = np.nan
+    stats = AnomalyStats(['a', 'b'])
+    for part in np.array_split(np.arange(300), batches):
+        stats.update(keys[part], values[part])
+    removed = rng.random(300) < 0.3
+    removed[keys == 4] = True  # key ที่ถูกถอดจนหมด
+    stats.remove(keys[removed], values[removed])
+
+    keys, values = keys[~removed], values[~removed]
+    for position, key in enumerate(stats.keys):
+        for m in range(2):
+            column = values[keys == key, m]
+            column = column[~np.isnan(column)]
+            assert stats.count[position, m] == len(column)
+            assert np.isclose(stats.mean[position, m], column.mean() if len(column) else 0.0)
+            assert np.isclose(stats.m2[position, m], ((column - column.mean()) ** 2).sum() if len(column) else 0.0)
+    with pytest.raises(KeyError):
+        stats.remove(np.array([99], dtype=np.uint64), np.ones((1, 2)))
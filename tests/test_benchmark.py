@@ -0,0 +1,70 @@
+"""synthetic data และ benchmark: shape, columns และสูตร derived columns"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from alert_benchmark import PHASES, benchmark_size, parse_size
+from alert_system import INPUT_COLUMNS, KEY_COLUMNS, SOURCE_COLUMNS
+from conftest import MASTER_DATA
+from synthetic_data import SyntheticMasterData, shape_for_rows
+
+
+@pytest.fixture(scope='module')
+def generated():
+    return SyntheticMasterData(MASTER_DATA, seed=3).generate(projects=4, cost_codes=30, months=15)
+
+
+def test_generate_shape_and_columns(generated):
+    reference = pd.read_csv(MASTER_DATA, nrows=5)
+    assert len(generated) == 4 * 30 * 15
+    # columns ชุดย่อยของ master_data.csv ที่ครอบคลุมทุก column ที่ engine ใช้
+    assert set(generated.columns) <= set(reference.columns)
+    assert set(KEY_COLUMNS + INPUT_COLUMNS + SOURCE_COLUMNS) <= set(generated.columns)
+    assert list(generated['project_id'].unique()) == ['PRJ001', 'PRJ002', 'PRJ003', 'PRJ004']
+    # หนึ่งแถวต่อ project × cost code × เดือน
+    keys = generated[['project_id', 'g_code', 's_code', 'year', 'month']].astype(str)
+    assert not keys.duplicated().any()
+    assert generated.groupby('project_id').size().eq(30 * 15).all()
+    assert sorted(set(zip(generated['year'], generated['month'])))[-1] == (2025, 3)
+    assert generated['progress_percentage'].between(0, 100).all()
+    assert (generated['total_budget'] > 0).all()
+
+
+def test_generate_derived_columns(generated):
+    budget, actual = generated['total_budget'], generated['total_actual']
+    np.testing.assert_allclose(generated['budget_utilization_pct'], actual / budget * 100)
+    np.testing.assert_allclose(generated['cpi'], np.where(actual > 0, budget / actual, 1.0))
+    assert generated['risk_overrun'].eq((actual > budget).astype(int)).all()
+
+
+def test_seed_is_reproducible():
+    first = SyntheticMasterData(MASTER_DATA, seed=11).generate(projects=2, cost_codes=5, months=3)
+    again = SyntheticMasterData(MASTER_DATA, seed=11).generate(projects=2, cost_codes=5, months=3)
+    other = SyntheticMasterData(MASTER_DATA, seed=12).generate(projects=2, cost_codes=5, months=3)
+    pd.testing.assert_frame_equal(first, again)
+    assert not first['total_actual'].equals(other['total_actual'])
+
+
+def test_write_csv_in_chunks_matches_shape(tmp_path):
+    path = str(tmp_path / 'master.csv')
+    written = SyntheticMasterData(MASTER_DATA, seed=5).write_csv(
+        path, projects=5, cost_codes=6, months=4, projects_per_chunk=2)
+    df = pd.read_csv(path)
+    assert written == len(df) == 5 * 6 * 4
+    assert list(df['project_id'].unique()) == [f"PRJ{i:03d}" for i in range(1, 6)]
+
+
+def test_sizes():
+    assert parse_size('10k') == 10_000 and parse_size('1.5M') == 1_500_000 and parse_size('42') == 42
+    assert shape_for_rows(10_000) == 33 and shape_for_rows(10) == 1
+
+
+def test_benchmark_size_reports_every_phase(tmp_path):
+    result = benchmark_size(3000, str(tmp_path), cost_codes=10, months=12)
+    assert result['rows'] == result['projects'] * 10 * 12 == 3000
+    assert list(result['phases']) == PHASES
+    for phase in result['phases'].values():
+        assert phase['seconds'] >= 0 and phase['peak_bytes'] is None
+    assert result['alerts'] > 0
+    assert not (tmp_path / 'master_3000.csv').exists()
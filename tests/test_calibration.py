@@ -0,0 +1,115 @@
+"""RuleCurve ต้องตรงกับการไล่ทุก threshold แบบ brute force (รวมค่าที่เท่ากันและ k = -1)"""
+
+import numpy as np
+import pytest
+
+from alert_calibration import DEFAULT_LABELS, RuleCurve, calibrate
+from conftest import make_engine
+
+
+def brute_force(score, labels):
+    """(alerts, precision, recall) ของทุก alert set {score >= u} เรียงจาก u มากไปน้อย"""
+    positives = labels.sum()
+    rows = []
+    for u in np.unique(score)[::-1]:
+        fired = score >= u
+        tp = labels[fired].sum()
+        rows.append((fired.sum(), tp / fired.sum(), tp / positives if positives else 0.0))
+    return rows
+
+
+def sample(seed, n=400, levels=25):
+    """scores ที่มีค่าซ้ำกันมาก และ labels ที่สัมพันธ์กับ score"""
+    rng = np.random.default_rng(seed)
+    score = rng.integers(0, levels, n) / 2.0
+    labels = (rng.random(n) < score / score.max() * 0.9).astype(np.int64)
+    return score, labels
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_candidates_match_brute_force(seed):
+    score, labels = sample(seed)
+    curve = RuleCurve(score, labels)
+    expected = brute_force(score, labels)
+    assert len(curve) == len(expected)
+    np.testing.assert_array_equal(curve.alerts, [row[0] for row in expected])
+    np.testing.assert_allclose(curve.precision, [row[1] for row in expected])
+    np.testing.assert_allclose(curve.recall, [row[2] for row in expected])
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_cut_and_at_match_brute_force(seed):
+    score, labels = sample(seed)
+    curve = RuleCurve(score, labels)
+    for k in range(-1, len(curve)):
+        threshold = curve.cut(k)
+        fired = score > threshold
+        # threshold ของ candidate k แจ้งเตือนตรงกับ alert set ของ k พอดี (k = -1 ไม่แจ้งเลย)
+        assert fired.sum() == (curve.alerts[k] if k >= 0 else 0)
+
+        alerts, precision, recall = curve.at(threshold)
+        assert alerts == fired.sum()
+        if alerts:
+            assert precision == pytest.approx(labels[fired].mean())
+        else:
+            assert precision is None
+        assert recall == pytest.approx(labels[fired].sum() / labels.sum())
+
+    # threshold ที่ตรงกับค่าที่มีอยู่: ค่าที่เท่ากันไม่ถูกนับ (score > threshold)
+    for threshold in np.unique(score):
+        assert curve.at(threshold)[0] == (score > threshold).sum()
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('limit', [None, 0, 6])
+def test_best_matches_brute_force(seed, limit):
+    score, labels = sample(seed)
+    curve = RuleCurve(score, labels)
+    rows = brute_force(score, labels)[:None if limit is None else limit + 1]
+    precision = np.array([row[1] for row in rows])
+    recall = np.array([row[2] for row in rows])
+
+    for target in (0.5, 0.8, 0.95, 1.01):
+        k = curve.best(min_precision=target, limit=limit)
+        passing = precision >= target
+        if not passing.any():
+            assert k == -1
+        else:
+            assert precision[k] >= target and recall[k] == recall[passing].max()
+
+    for target in (0.1, 0.6, 1.0):
+        k = curve.best(min_recall=target, limit=limit)
+        passing = recall >= target
+        if passing.any():
+            assert recall[k] >= target and precision[k] == precision[passing].max()
+        else:
+            assert k == len(rows) - 1
+
+    f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+    assert f1[curve.best(limit=limit)] == f1.max()
+
+
+def test_edge_cases():
+    assert RuleCurve(np.array([]), np.array([], dtype=np.int64)).cut(-1) == 0.0
+    curve = RuleCurve(np.array([3.0, 3.0, 3.0]), np.array([1, 0, 1]))
+    assert len(curve) == 1 and curve.alerts.tolist() == [3]
+    assert curve.cut(-1) == 3.0 and curve.cut(0) == 2.0
+    assert curve.at(3.0) == (0, None, 0.0)
+    assert curve.best(min_precision=0.9) == -1
+    assert curve.best(limit=-1) == -1
+
+
+def test_calibrated_thresholds_reproduce_metrics(master_csv):
+    engine = make_engine(master_csv, extra_columns=sorted(set(DEFAULT_LABELS.values())))
+    profile = calibrate(engine)
+    assert profile['thresholds']
+    for alert_type, threshold in profile['thresholds'].items():
+        tuned = profile['metrics'][alert_type]['calibrated']
+        valid, value = engine._rule_value(alert_type, engine.df)
+        fired, _ = engine._apply_rule(alert_type, valid, value, threshold,
+                                      engine.severity_cutoffs[alert_type])
+        label = engine.df[profile['metrics'][alert_type]['label']].to_numpy()
+        keep = valid & ~np.isnan(value)
+        assert tuned['alerts'] == (fired & keep).sum()
+        if tuned['alerts']:
+            assert tuned['precision'] == pytest.approx(label[fired & keep].mean())
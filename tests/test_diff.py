@@ -0,0 +1,42 @@
+"""diff_alerts: เทียบกับ snapshot หรือ AlertTable รอบก่อนได้ผลเดียวกัน และตรงกับการจับคู่ identity ตรงๆ"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from alert_system import AlertTable
+from conftest import make_engine
+
+pytest.importorskip('pyarrow')
+
+
+def test_diff_against_snapshot(tmp_path, master_csv):
+    engine = make_engine(master_csv)
+    previous = engine.evaluate_all_alerts()
+    path = engine.write_snapshot(base_dir=str(tmp_path))
+    assert engine.diff_alerts(path).counts == {
+        'new': 0, 'resolved': 0, 'escalated': 0, 'de-escalated': 0, 'unchanged': len(previous)}
+
+    engine.thresholds['cost_overrun'] = 110
+    engine.severity_cutoffs['progress_lag'] = (220, 180)
+    current = engine.evaluate_all_alerts()
+    from_snapshot = engine.diff_alerts(path)
+    from_table = engine.diff_alerts(previous)
+    assert from_snapshot.counts == from_table.counts
+    pd.testing.assert_frame_equal(from_snapshot.changes, from_table.changes, check_categorical=False)
+
+    # ตรวจกับการจับคู่แบบตรงไปตรงมาด้วย tuple ของ identity
+    def identities(alerts):
+        frame = alerts.to_frame() if isinstance(alerts, AlertTable) else alerts
+        keys = frame[['project_id', 'g_code', 's_code', 'month', 'year', 'alert_type']].astype(object)
+        keys = keys.where(keys.notna(), None)
+        severity = frame['severity'].cat.codes.to_numpy()
+        return dict(zip(map(tuple, keys.to_numpy()), severity))
+
+    old, new = identities(previous), identities(current)
+    common = old.keys() & new.keys()
+    assert from_snapshot.counts['new'] == len(new.keys() - old.keys())
+    assert from_snapshot.counts['resolved'] == len(old.keys() - new.keys())
+    assert from_snapshot.counts['escalated'] == sum(new[k] < old[k] for k in common)
+    assert from_snapshot.counts['de-escalated'] == sum(new[k] > old[k] for k in common)
+    assert np.sum(list(from_snapshot.counts.values())) - from_snapshot.counts['resolved'] == len(current)
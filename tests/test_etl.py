@@ -0,0 +1,89 @@
+"""BudgetETL.load_data: อ่านไฟล์ดิบพร้อมกันด้วย dtypes ตาม RAW_SCHEMA"""
+
+import importlib
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+from conftest import ROOT
+
+RAW_DIR = os.path.join(ROOT, 'data', 'raw')
+
+
+@pytest.fixture(scope='module')
+def etl(tmp_path_factory):
+    """import etl.py จาก data/processed (logging ของ etl เขียน etl_log.log ลง cwd จึงย้ายไป tmp)"""
+    workdir = tmp_path_factory.mktemp('etl')
+    cwd = os.getcwd()
+    sys.path.insert(0, os.path.join(ROOT, 'data', 'processed'))
+    os.chdir(workdir)
+    try:
+        yield importlib.import_module('etl')
+    finally:
+        os.chdir(cwd)
+        sys.path.remove(os.path.join(ROOT, 'data', 'processed'))
+
+
+def load(etl, tmp_path, **options):
+    pipeline = etl.BudgetETL(data_dir=RAW_DIR, output_dir=str(tmp_path / 'out'), **options)
+    pipeline.files = {key: os.path.basename(path) for key, path in pipeline.files.items()}
+    pipeline.load_data()
+    return pipeline
+
+
+def test_load_uses_schema_dtypes(etl, tmp_path):
+    tables = load(etl, tmp_path).dataframes
+    assert set(tables) == set(etl.RAW_SCHEMA)
+    for key, df in tables.items():
+        declared = {**etl.KEY_DTYPES, **etl.RAW_SCHEMA[key].get('dtype', {})}
+        for column, dtype in declared.items():
+            if column in df.columns:
+                if dtype == 'category':
+                    assert isinstance(df[column].dtype, pd.CategoricalDtype), (key, column)
+                else:
+                    assert df[column].dtype == dtype, (key, column)
+        for column in etl.RAW_SCHEMA[key].get('parse_dates', []):
+            assert pd.api.types.is_datetime64_any_dtype(df[column]), (key, column)
+
+    # ค่าเท่ากับการอ่านแบบเดา type (ต่างกันเฉพาะ dtype)
+    raw = pd.read_csv(os.path.join(RAW_DIR, 'actual_cost_data.csv'), encoding='utf-8-sig')
+    actual = tables['actual_cost']
+    assert len(actual) == len(raw)
+    pd.testing.assert_series_equal(actual['total_actual'], raw['total_actual'].astype('float64'))
+    assert actual['project_id'].astype(str).tolist() == raw['project_id'].astype(str).tolist()
+
+
+def test_threaded_load_matches_single_worker(etl, tmp_path):
+    threaded = load(etl, tmp_path).dataframes
+    single = load(etl, tmp_path, max_workers=1).dataframes
+    for key in threaded:
+        pd.testing.assert_frame_equal(threaded[key], single[key])
+
+
+def test_pyarrow_engine_matches_default(etl, tmp_path):
+    pytest.importorskip('pyarrow')
+    default = load(etl, tmp_path).dataframes
+    arrow = load(etl, tmp_path, csv_engine='pyarrow').dataframes
+    for key in default:
+        pd.testing.assert_frame_equal(arrow[key], default[key], check_dtype=False,
+                                      check_categorical=False)
+        assert dict(arrow[key].dtypes.map(str)) == dict(default[key].dtypes.map(str)), key
+
+
+def test_missing_file_raises(etl, tmp_path):
+    pipeline = etl.BudgetETL(data_dir=RAW_DIR, output_dir=str(tmp_path / 'out'))
+    pipeline.files = {'actual_cost': 'no_such_file.csv'}
+    with pytest.raises(FileNotFoundError):
+        pipeline.load_data()
+
+
+def test_validation_report_value_dtypes(etl, tmp_path):
+    pipeline = load(etl, tmp_path)
+    report = pipeline.validate_data()
+    types = report['actual_cost']['data_types']
+    # categorical รายงานเป็น dtype ของค่า (เช่น str) ไม่ใช่ 'category'
+    assert str(types['project_id']) == str(pipeline.dataframes['actual_cost']['project_id'].cat.categories.dtype)
+    assert str(types['total_actual']) == 'float64'
+    assert os.path.exists(tmp_path / 'out' / 'quality_reports' / 'data_validation_report.json')
@@ -0,0 +1,109 @@
+"""AlertHistory: episodes, time_to_resolve, recurrence และ open_since จาก runs ที่รู้คำตอบ"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from alert_history import AlertHistory
+from conftest import make_engine
+
+START = datetime(2026, 1, 1, 8, 0)
+
+# severity code ของ alerts a, b, c ในแต่ละรอบ (ไม่มี = alert หายไป)
+RUNS = [
+    {'a': 0, 'b': 1},
+    {'a': 0, 'b': 1, 'c': 3},
+    {'b': 1},
+    {'a': 0, 'b': 0},
+    {'a': 0, 'c': 0},
+]
+
+
+def run_at(ordinal):
+    return pd.Timestamp(START + timedelta(days=ordinal))
+
+
+@pytest.fixture(scope='module')
+def sample(master_csv):
+    """alerts สามรายการ (identity ต่างกัน) ของ project เดียวกัน"""
+    alerts = make_engine(master_csv).evaluate_all_alerts()
+    project = alerts.project_code[0]
+    positions = np.flatnonzero(alerts.project_code == project)[:3]
+    assert len(set(alerts.take(positions).identity_keys().tolist())) == 3
+    return dict(zip('abc', positions)), alerts
+
+
+@pytest.fixture
+def history(tmp_path, sample):
+    positions, alerts = sample
+    history = AlertHistory(str(tmp_path / 'history.sqlite'))
+    for ordinal, run in enumerate(RUNS):
+        table = alerts.take(np.array([positions[name] for name in run], dtype=np.int64))
+        table.severity_code = np.array(list(run.values()), dtype=np.int8)
+        history.record_run(table, run_at=run_at(ordinal).to_pydatetime())
+    yield history
+    history.close()
+
+
+@pytest.fixture
+def identity(sample):
+    positions, alerts = sample
+    keys = alerts.identity_keys().view(np.int64)
+    return {name: keys[position] for name, position in positions.items()}
+
+
+def spans(episodes, identity):
+    """(ชื่อ, opened_at, resolved_at, runs) เรียงตามชื่อแล้วเวลาเปิด"""
+    names = {key: name for name, key in identity.items()}
+    return sorted((names[row.identity], row.opened_at,
+                   None if pd.isna(row.resolved_at) else row.resolved_at, row.runs)
+                  for row in episodes.itertuples())
+
+
+def test_episodes(history, identity):
+    assert spans(history.episodes(), identity) == [
+        ('a', run_at(0), run_at(2), 2),
+        ('a', run_at(3), None, 2),
+        ('b', run_at(0), run_at(4), 4),
+        ('c', run_at(1), run_at(2), 1),
+        ('c', run_at(4), None, 1),
+    ]
+    worst = history.episodes().set_index(['identity', 'opened_at'])['worst_severity']
+    assert worst[(identity['b'], run_at(0))] == 'Critical'
+    assert worst[(identity['c'], run_at(1))] == 'Low'
+
+
+def test_episodes_by_severity(history, identity):
+    assert spans(history.episodes(severity='Critical'), identity) == [
+        ('a', run_at(0), run_at(2), 2),
+        ('a', run_at(3), None, 2),
+        ('b', run_at(3), run_at(4), 1),
+        ('c', run_at(4), None, 1),
+    ]
+
+
+def test_time_to_resolve(history, identity):
+    resolved = history.time_to_resolve()
+    names = {key: name for name, key in identity.items()}
+    got = sorted((names[key], delta) for key, delta in
+                 zip(resolved['identity'], resolved['time_to_resolve']))
+    assert got == [('a', pd.Timedelta(days=2)), ('b', pd.Timedelta(days=4)),
+                   ('c', pd.Timedelta(days=1))]
+
+
+def test_recurrence(history, identity):
+    recurrence = history.recurrence()
+    assert dict(zip(recurrence['identity'], recurrence['occurrences'])) == {
+        identity['a']: 2, identity['c']: 2}
+
+
+def test_open_since(history, identity, sample):
+    positions, alerts = sample
+    project = alerts.project_categories[alerts.project_code[positions['a']]]
+    current = history.open_since(project)
+    assert list(current['identity']) == [identity['a'], identity['c']]
+    assert list(current['open_for']) == [pd.Timedelta(days=1), pd.Timedelta(0)]
+    assert len(history.open_since(project, severity='Low')) == 2
+    assert len(history.open_since('NO_SUCH_PROJECT')) == 0
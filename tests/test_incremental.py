@@ -0,0 +1,73 @@
+"""evaluate_incremental ต้องได้ผลเดียวกับการประเมินใหม่ทั้งหมด"""
+
+import shutil
+
+import pandas as pd
+import pytest
+
+from alert_system import TREND_RULES, SimpleAlertEngine
+from conftest import make_engine
+
+
+@pytest.fixture
+def working_csv(tmp_path, data_file):
+    path = str(tmp_path / 'master_data.csv')
+    shutil.copy(data_file, path)
+    return path
+
+
+def full_run(path, engine):
+    """ประเมินทั้งหมดด้วยค่าเดียวกับ engine"""
+    fresh = make_engine(path, trend_window=engine.trend_window)
+    fresh.enabled_rules = list(engine.enabled_rules)
+    fresh.thresholds = dict(engine.thresholds)
+    fresh.severity_cutoffs = dict(engine.severity_cutoffs)
+    return fresh.evaluate_all_alerts()
+
+
+def edit_data(path):
+    """แก้ค่าของเดือนล่าสุด ลบบางแถว และเพิ่มเดือนใหม่ของบาง cost codes"""
+    df = pd.read_csv(path)
+    latest = df['year'] * 12 + df['month'] == (df['year'] * 12 + df['month']).max()
+    df.loc[latest, 'total_actual'] *= 1.5
+    added = df[latest].head(10).copy()
+    added['year'] += 1
+    df = pd.concat([added, df.drop(index=df.index[:30])]).sample(frac=1, random_state=1)
+    df.to_csv(path, index=False)
+
+
+@pytest.mark.parametrize('rules', [(), TREND_RULES], ids=['base', 'trend'])
+def test_incremental_matches_full_after_data_change(working_csv, rules):
+    engine = SimpleAlertEngine(working_csv)
+    engine.enabled_rules = engine.enabled_rules + list(rules)
+    first = engine.evaluate_incremental()
+    assert first.equals(full_run(working_csv, engine))
+
+    edit_data(working_csv)
+    updated = engine.evaluate_incremental()
+    assert updated.equals(full_run(working_csv, engine))
+    assert engine.last_delta.rows_evaluated > 0
+    if not rules:
+        # trend rules ประเมิน series ที่มีแถวเปลี่ยนใหม่ทั้ง series (ทุก series ถูกแก้ที่นี่)
+        assert engine.last_delta.rows_evaluated < len(engine.df)
+
+    unchanged = engine.evaluate_incremental()
+    assert unchanged.equals(updated)
+    assert engine.last_delta.rows_evaluated == 0
+
+
+CONFIG_CHANGES = {
+    'rules': lambda engine: engine.enabled_rules.remove('cost_overrun'),
+    'window': lambda engine: setattr(engine, 'trend_window', 5),
+    'threshold': lambda engine: engine.thresholds.__setitem__('cost_overrun', 110),
+    'cutoffs': lambda engine: engine.severity_cutoffs.__setitem__('progress_lag', (300, 220)),
+}
+
+
+@pytest.mark.parametrize('change', CONFIG_CHANGES.values(), ids=CONFIG_CHANGES.keys())
+def test_incremental_matches_full_after_config_change(working_csv, change):
+    engine = SimpleAlertEngine(working_csv)
+    engine.enabled_rules = engine.enabled_rules + TREND_RULES
+    engine.evaluate_incremental()
+    change(engine)
+    assert engine.evaluate_incremental().equals(full_run(working_csv, engine))
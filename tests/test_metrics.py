@@ -0,0 +1,68 @@
+"""EngineMetrics: ตัวนับต่อ phase/rule, dict และ Prometheus text"""
+
+import pytest
+
+from alert_metrics import COUNTERS, EngineMetrics
+from conftest import make_engine
+
+
+def test_counters_and_dict():
+    metrics = EngineMetrics()
+    metrics.record_rule('cost_overrun', 0.5, rows=100, alerts=7)
+    metrics.record_rule('cost_overrun', 1.5, rows=100, alerts=3, errors=1)
+    with metrics.phase('load_data') as phase:
+        phase['rows'] = 100
+    with pytest.raises(RuntimeError):
+        with metrics.phase('evaluate'):
+            raise RuntimeError("boom")
+
+    result = metrics.to_dict()
+    assert result['started_at'] == metrics.started_at
+    rule = result['rules']['cost_overrun']
+    assert rule == {'calls': 2, 'seconds': 2.0, 'rows': 200, 'alerts': 10, 'errors': 1,
+                    'rows_per_second': 100.0}
+    assert result['phases']['load_data']['calls'] == 1
+    assert result['phases']['load_data']['rows'] == 100
+    assert result['phases']['evaluate']['errors'] == 1
+
+    metrics.reset()
+    assert metrics.to_dict()['phases'] == {} and metrics.to_dict()['rules'] == {}
+
+
+def test_prometheus_text(tmp_path):
+    metrics = EngineMetrics()
+    metrics.record_rule('burn_rate', 0.25, rows=40, alerts=2)
+    text = metrics.to_prometheus()
+    lines = text.splitlines()
+    assert text.endswith('\n')
+    assert '# TYPE alert_engine_rule_calls_total counter' in lines
+    assert 'alert_engine_rule_calls_total{rule="burn_rate"} 1' in lines
+    assert 'alert_engine_rule_seconds_total{rule="burn_rate"} 0.25' in lines
+    assert 'alert_engine_rule_rows_total{rule="burn_rate"} 40' in lines
+    assert 'alert_engine_rule_alerts_total{rule="burn_rate"} 2' in lines
+    assert 'alert_engine_rule_errors_total{rule="burn_rate"} 0' in lines
+    # HELP/TYPE ของทุก counter ทั้งสองกลุ่ม แม้ยังไม่มีค่า
+    assert sum(line.startswith('# TYPE ') for line in lines) == 2 * len(COUNTERS)
+    assert all(line.startswith('#') for line in lines if 'phase' in line)
+
+    path = metrics.write_prometheus(str(tmp_path / 'textfile' / 'alerts.prom'), prefix='budget')
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == metrics.to_prometheus(prefix='budget')
+    assert not (tmp_path / 'textfile' / 'alerts.prom.tmp').exists()
+
+
+@pytest.mark.parametrize('vectorized', [True, False])
+def test_engine_records_phases_and_rules(master_csv, vectorized):
+    engine = make_engine(master_csv)
+    engine.metrics = metrics = EngineMetrics()
+    alerts = engine.evaluate_all_alerts(vectorized=vectorized)
+    engine.get_alert_summary()
+
+    result = metrics.to_dict()
+    assert {'evaluate', 'summary'} <= set(result['phases'])
+    assert result['phases']['evaluate']['alerts'] == len(alerts)
+    assert set(result['rules']) == set(engine.enabled_rules)
+    counts = alerts.type_counts()
+    for alert_type, stats in result['rules'].items():
+        assert stats['alerts'] == counts.get(alert_type, 0)
+        assert stats['rows'] == len(engine.df) and stats['errors'] == 0
@@ -0,0 +1,184 @@
+"""การแจ้งเตือน: บันทึก state เฉพาะ alerts ที่ส่งสำเร็จ และ dispatcher รับมือ response ที่ผิดรูปแบบ"""
+
+import asyncio
+import json
+import threading
+
+import pytest
+
+from alert_dispatcher import (ConnectionPool, DeliveryError, Destination, LocalReceiver,
+                              dispatch_alerts_async)
+from alert_state import AlertStateStore
+from alert_system import SimpleAlertManager
+from conftest import make_engine
+
+
+@pytest.fixture
+def serve():
+    """เปิด LocalReceiver บน event loop ใน thread แยก (notify() ใช้ asyncio.run ของตัวเอง)"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    receivers = []
+
+    def start(**options):
+        receiver = asyncio.run_coroutine_threadsafe(LocalReceiver(**options).start(), loop).result()
+        receivers.append(receiver)
+        return receiver
+
+    yield start
+    for receiver in receivers:
+        asyncio.run_coroutine_threadsafe(receiver.stop(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+
+
+@pytest.fixture
+def manager(tmp_path, master_csv):
+    manager = SimpleAlertManager(state_store=AlertStateStore(str(tmp_path / 'state.db')))
+    manager.engine = make_engine(master_csv)
+    manager.engine.evaluate_all_alerts()
+    yield manager
+    manager.state_store.close()
+
+
+def test_failed_delivery_is_not_recorded(manager, serve):
+    down, up = serve(fail_first=10**9), serve()
+    pending = len(manager.notifiable_alerts(record=False))
+    assert pending > 0
+
+    manager.notify([Destination(down.url, window=0.01), Destination(up.url, window=0.01)],
+                   max_retries=1, base_delay=0.01)
+    assert len(manager.state_store) == 0
+    assert len(manager.notifiable_alerts(record=False)) == pending
+
+    report = manager.notify([Destination(up.url, window=0.01)])
+    assert report[up.url]['sent'] == pending
+    assert len(manager.state_store) == pending
+    assert len(manager.notifiable_alerts(record=False)) == 0
+
+
+def test_retry_then_delivery_is_recorded(manager, serve):
+    flaky = serve(fail_first=2)
+    pending = len(manager.notifiable_alerts(record=False))
+    report = manager.notify([Destination(flaky.url, window=0.01)], base_delay=0.01)
+    assert report[flaky.url]['retries'] >= 1
+    assert sum(len(batch) for batch in flaky.batches) == pending
+    assert len(manager.notifiable_alerts(record=False)) == 0
+
+
+def test_malformed_status_line_is_retryable():
+    async def scenario():
+        async def reply_garbage(reader, writer):
+            await reader.readline()
+            writer.write(b"garbage\r\n\r\n")
+            await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(reply_garbage, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            with pytest.raises(DeliveryError):
+                await ConnectionPool(f"http://127.0.0.1:{port}/", 1, 2.0).post(b'{}', {})
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(scenario())
+
+
+def test_dispatch_inside_running_loop(master_csv):
+    engine = make_engine(master_csv)
+    alerts = engine.evaluate_all_alerts().take(slice(0, 25))
+
+    async def scenario():
+        receiver = await LocalReceiver().start()
+        try:
+            report, delivered = await dispatch_alerts_async(
+                engine, alerts, [Destination(receiver.url, window=0.01, max_batch=10)])
+        finally:
+            await receiver.stop()
+        return receiver, report, delivered
+
+    receiver, report, delivered = asyncio.run(scenario())
+    assert delivered == [True] * 25
+    assert report[receiver.url]['batches'] == 3
+    # batches ส่งพร้อมกันได้ ลำดับที่ถึงปลายทางจึงไม่แน่นอน
+    received = sorted(json.dumps(record, sort_keys=True) for batch in receiver.batches for record in batch)
+    assert received == sorted(json.dumps(record, sort_keys=True, default=str)
+                              for record in engine.iter_alert_records(alerts))
+
+
+async def post_twice(**options):
+    """POST สองครั้งผ่าน pool ขนาด 1 คืน (statuses, receiver)"""
+    receiver = await LocalReceiver(**options).start()
+    pool = ConnectionPool(receiver.url, 1, 2.0)
+    try:
+        body = json.dumps({'alerts': [{'id': 1}]}).encode()
+        statuses = [await pool.post(body, {}) for _ in range(2)]
+    finally:
+        pool.close()
+        await receiver.stop()
+    return statuses, receiver
+
+
+@pytest.mark.parametrize('reply, status', [('no_content', 204), ('chunked', 200), ('json', 200)])
+def test_keep_alive_responses_reuse_connection(reply, status):
+    # 204 ไม่มี Content-Length และ chunked ต้องไม่รอ EOF จน timeout
+    statuses, receiver = asyncio.run(asyncio.wait_for(post_twice(reply=reply), 5))
+    assert statuses == [status, status]
+    assert receiver.connections == 1
+    assert len(receiver.batches) == 2
+
+
+def test_connection_close_reads_to_eof():
+    statuses, receiver = asyncio.run(asyncio.wait_for(post_twice(reply='close'), 5))
+    assert statuses == [200, 200]
+    assert receiver.connections == 2
+
+
+def test_interim_response_is_skipped():
+    async def scenario():
+        async def reply_continue(reader, writer):
+            await reader.readuntil(b"\r\n\r\n")
+            await reader.readexactly(2)
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n"
+                         b"HTTP/1.1 202 Accepted\r\nContent-Length: 0\r\n\r\n")
+            await writer.drain()
+
+        server = await asyncio.start_server(reply_continue, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            pool = ConnectionPool(f"http://127.0.0.1:{port}/", 1, 2.0)
+            status = await pool.post(b'{}', {})
+            pool.close()
+            return status
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    assert asyncio.run(scenario()) == 202
+
+
+def test_unknown_length_is_not_reused():
+    async def scenario():
+        async def reply_unframed(reader, writer):
+            await reader.readuntil(b"\r\n\r\n")
+            await reader.readexactly(2)
+            # ไม่มี Content-Length และไม่ปิด connection: client ต้องไม่รอ EOF
+            writer.write(b"HTTP/1.1 200 OK\r\n\r\n")
+            await writer.drain()
+            await asyncio.sleep(5)
+
+        server = await asyncio.start_server(reply_unframed, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            pool = ConnectionPool(f"http://127.0.0.1:{port}/", 1, 2.0)
+            status = await asyncio.wait_for(pool.post(b'{}', {}), 1)
+            idle = len(pool._idle)
+            pool.close()
+            return status, idle
+        finally:
+            server.close()
+
+    assert asyncio.run(scenario()) == (200, 0)
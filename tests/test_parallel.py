@@ -0,0 +1,40 @@
+"""run_parallel ต้องได้ alerts เดียวกับการประเมินแบบ serial"""
+
+import pytest
+
+from alert_system import ANOMALY_RULES, TREND_RULES, SimpleAlertManager
+from conftest import make_engine
+
+RULE_SETS = {
+    'base': (),
+    'trend': TREND_RULES,
+    'anomaly': TREND_RULES + ANOMALY_RULES,
+}
+
+
+@pytest.mark.parametrize('rules', RULE_SETS.values(), ids=RULE_SETS.keys())
+@pytest.mark.parametrize('min_rows', [0, 10**9], ids=['pool', 'serial-fallback'])
+def test_parallel_matches_serial(data_file, rules, min_rows):
+    serial = make_engine(data_file, rules).evaluate_all_alerts()
+
+    manager = SimpleAlertManager(workers=2)
+    manager.engine = make_engine(data_file, rules)
+    manager.parallel_min_rows = min_rows
+    parallel = manager.run_parallel()
+
+    assert parallel.equals(serial)
+    df = manager.engine.df
+    assert sum(timing['rows'] for timing in manager.shard_timings) == len(df)
+    assert sum(timing['projects'] for timing in manager.shard_timings) == df['project_id'].nunique()
+    assert len(manager.shard_timings) == (1 if min_rows else 2)
+
+
+def test_shards_keep_projects_whole(synthetic_csv):
+    manager = SimpleAlertManager(workers=3)
+    manager.engine = make_engine(synthetic_csv)
+    manager.parallel_min_rows = 0
+    manager.run_parallel()
+    # 8 projects ขนาดเท่ากันใน 3 shards -> แบ่งที่ขอบ project ให้จำนวนแถวใกล้เคียงกัน
+    assert [timing['projects'] for timing in manager.shard_timings] == [3, 3, 2]
+    rows_per_project = len(manager.engine.df) // 8
+    assert all(timing['rows'] == timing['projects'] * rows_per_project for timing in manager.shard_timings)
@@ -0,0 +1,59 @@
+"""AlertIndex/query ต้องตรงกับการกรองแบบตรงไปตรงมา"""
+
+import numpy as np
+import pytest
+
+from alert_system import ALERT_TYPES, SEVERITY_LEVELS, TREND_RULES
+from conftest import make_engine
+
+
+@pytest.fixture
+def evaluated(data_file):
+    engine = make_engine(data_file, TREND_RULES)
+    return engine, engine.evaluate_all_alerts()
+
+
+def brute_force_mask(engine, alerts, project=None, alert_type=None, severity=None, g_code=None, month=None):
+    def values(value):
+        return None if value is None else [value] if isinstance(value, (str, int)) else list(value)
+
+    source = engine.df.iloc[alerts.row_index]
+    columns = {
+        'project': np.asarray(alerts.project_categories, dtype=object)[alerts.project_code],
+        'alert_type': np.asarray(ALERT_TYPES, dtype=object)[alerts.type_code],
+        'severity': np.asarray(SEVERITY_LEVELS, dtype=object)[alerts.severity_code],
+        'g_code': source['g_code'].astype(object).to_numpy(),
+        'month': source['month'].to_numpy(),
+    }
+    mask = np.ones(len(alerts), dtype=bool)
+    for field, value in (('project', project), ('alert_type', alert_type), ('severity', severity),
+                         ('g_code', g_code), ('month', month)):
+        if values(value) is not None:
+            mask &= np.isin(columns[field], values(value))
+    return mask
+
+
+def test_query_matches_brute_force(evaluated):
+    engine, alerts = evaluated
+    projects = list(alerts.project_categories)
+    g_code = engine.df['g_code'].iloc[alerts.row_index[0]]
+    cases = [
+        {},
+        {'project': projects[0]},
+        {'project': projects[-1], 'alert_type': 'progress_lag', 'severity': 'Critical', 'month': range(6, 10)},
+        {'severity': ['Critical', 'High'], 'g_code': g_code},
+        {'alert_type': ['cost_overrun', 'burn_rate'], 'month': 3},
+        {'project': [projects[0], 'NO-SUCH-PROJECT'], 'month': 99},
+    ]
+    for filters in cases:
+        mask = brute_force_mask(engine, alerts, **filters)
+        selected = engine.query(**filters)
+        assert np.array_equal(selected.row_index, alerts.row_index[mask]), filters
+        assert np.array_equal(selected.type_code, alerts.type_code[mask]), filters
+        assert engine.query(**filters, count_only=True) == mask.sum(), filters
+
+
+def test_query_rejects_unknown_severity(evaluated):
+    engine, _ = evaluated
+    with pytest.raises(ValueError):
+        engine.query(severity='Bad')
@@ -0,0 +1,28 @@
+"""export records ที่สร้างทีละ chunk ต้องเหมือน records ที่สร้างทีละ alert (AlertView)"""
+
+import json
+
+import pytest
+
+from conftest import make_engine
+
+
+@pytest.mark.parametrize('chunk_size', [97, 10000])
+def test_chunked_records_match_per_alert_records(data_file, chunk_size):
+    engine = make_engine(data_file)
+    alerts = engine.evaluate_all_alerts()
+    records = list(alerts.iter_records(chunk_size=chunk_size))
+    assert records == [engine._alert_record(alert) for alert in alerts]
+    assert list(records[0]) == ['project_id', 'project_name', 'alert_type', 'severity', 'message',
+                                'actual_value', 'threshold', 'variance', 'details']
+
+
+def test_export_json_uses_rendered_records(tmp_path, master_csv):
+    engine = make_engine(master_csv)
+    alerts = engine.evaluate_all_alerts()
+    path = tmp_path / 'alerts.json'
+    engine.export_alerts_json(str(path))
+    with open(path, encoding='utf-8') as f:
+        report = json.load(f)
+    assert report['summary']['total'] == len(alerts)
+    assert [alert['message'] for alert in report['alerts']] == [alert.message for alert in alerts]
@@ -0,0 +1,53 @@
+"""AlertRollup ต้องตรงกับ groupby แบบตรงไปตรงมาทุกระดับ"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from alert_system import SEVERITY_LEVELS, TREND_RULES
+from conftest import make_engine
+
+
+@pytest.fixture
+def evaluated(data_file):
+    engine = make_engine(data_file, TREND_RULES)
+    return engine, engine.evaluate_all_alerts()
+
+
+def test_rollup_matches_groupby(evaluated):
+    engine, alerts = evaluated
+    rollup = engine.alert_rollup()
+    assert engine.alert_rollup() is rollup
+
+    source = engine.df.iloc[alerts.row_index].reset_index(drop=True)
+    frame = pd.DataFrame({
+        'project_id': source['project_id'].astype(object),
+        'g_code': source['g_code'].astype(object),
+        's_code': source['s_code'].astype(object).where(source['s_code'].notna(), None),
+        'severity': alerts.severity_code,
+        'row': alerts.row_index,
+        'overrun': np.clip((source['total_actual'] - source['total_budget']).to_numpy(), 0, None),
+    })
+    once = frame.drop_duplicates('row')
+
+    for level, keys in (('project_id', ['project_id']), ('g_code', ['project_id', 'g_code']),
+                        ('s_code', ['project_id', 'g_code', 's_code'])):
+        groups = frame.groupby(keys, dropna=False)
+        expected = pd.DataFrame({
+            'expected_alerts': groups.size(),
+            'expected_worst': groups['severity'].min(),
+            'expected_overrun': once.groupby(keys, dropna=False)['overrun'].sum(),
+        }).reset_index()
+        merged = rollup.to_frame(level).merge(expected, on=keys, how='outer', indicator=True)
+        assert (merged['_merge'] == 'both').all(), level
+        assert (merged['alerts'] == merged['expected_alerts']).all(), level
+        assert (merged['worst_severity'].cat.codes == merged['expected_worst']).all(), level
+        assert np.allclose(merged['overrun'], merged['expected_overrun']), level
+
+    root = rollup.root()
+    assert root['alerts'] == len(alerts)
+    assert root['worst_severity'] == SEVERITY_LEVELS[alerts.severity_code.min()]
+    children = rollup.children()
+    assert sum(child['alerts'] for child in children) == len(alerts)
+    grandchildren = rollup.children((children[0]['key'],))
+    assert sum(child['alerts'] for child in grandchildren) == children[0]['alerts']
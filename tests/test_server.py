@@ -0,0 +1,126 @@
+"""AlertServer: ETag/304, gzip + Vary, filters, count และการตรวจ query string"""
+
+import asyncio
+import gzip
+import json
+
+import pytest
+
+from alert_server import AlertServer
+from alert_system import SimpleAlertEngine, SimpleAlertManager
+
+
+@pytest.fixture(scope='module')
+def server(master_csv):
+    manager = SimpleAlertManager()
+    manager.engine = SimpleAlertEngine(master_csv)
+    server = AlertServer(manager)
+    asyncio.run(server.refresh())
+    return server
+
+
+async def fetch(server, target, headers=None, method='GET'):
+    """ส่งหนึ่ง request ผ่าน socket จริง คืน (status, headers, body)"""
+    listener = await asyncio.start_server(server._handle, '127.0.0.1', 0)
+    port = listener.sockets[0].getsockname()[1]
+    async with listener:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        lines = [f"{method} {target} HTTP/1.1", "Host: localhost", "Connection: close"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    status_line, *header_lines = head.decode('latin-1').split("\r\n")
+    response_headers = dict(line.split(': ', 1) for line in header_lines)
+    return int(status_line.split()[1]), response_headers, body
+
+
+def get(server, target, method='GET', **headers):
+    headers = {name.replace('_', '-'): value for name, value in headers.items()}
+    return asyncio.run(fetch(server, target, headers, method))
+
+
+def get_json(server, target):
+    status, _, body = get(server, target)
+    return status, json.loads(body)
+
+
+def test_etag_and_not_modified(server):
+    status, headers, body = get(server, '/summary')
+    assert status == 200 and body
+    etag = headers['ETag']
+    assert headers['Vary'] == 'Accept-Encoding'
+
+    status, headers, body = get(server, '/summary', If_None_Match=etag)
+    assert status == 304 and body == b''
+    assert headers['ETag'] == etag and headers['Vary'] == 'Accept-Encoding'
+
+    assert get(server, '/summary', If_None_Match='"0-stale"')[0] == 200
+
+
+def test_gzip_response(server):
+    _, plain_headers, plain = get(server, '/alerts?limit=500')
+    status, headers, body = get(server, '/alerts?limit=500', Accept_Encoding='gzip, deflate')
+    assert status == 200
+    assert headers['Content-Encoding'] == 'gzip'
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert int(headers['Content-Length']) == len(body) < len(plain)
+    assert gzip.decompress(body) == plain
+    assert 'Content-Encoding' not in plain_headers
+    # ETag แยกตาม encoding และ 304 ต้องใช้ ETag ของ representation เดียวกัน
+    assert headers['ETag'] != plain_headers['ETag']
+    assert get(server, '/alerts?limit=500', Accept_Encoding='gzip',
+               If_None_Match=headers['ETag'])[0] == 304
+    assert get(server, '/alerts?limit=500', If_None_Match=headers['ETag'])[0] == 200
+
+
+def test_filters_match_engine_query(server):
+    engine = server.manager.engine
+    project = engine.alerts.project_categories[0]
+    expected = engine.query(project=project, severity=['Critical', 'High'], month=range(6, 10))
+    assert len(expected) > 0
+
+    target = f'/alerts?project={project}&severity=Critical&severity=High&month=6-9'
+    status, payload = get_json(server, f'{target}&limit=100000')
+    assert status == 200 and payload['total'] == len(expected)
+    assert payload['alerts'] == list(engine.iter_alert_records(expected))
+
+    status, page = get_json(server, f'{target}&offset=3&limit=5')
+    assert page['total'] == len(expected) and page['offset'] == 3
+    assert page['alerts'] == payload['alerts'][3:8]
+
+    status, counted = get_json(server, f'{target}&count=1')
+    assert status == 200 and counted == {'total': len(expected)}
+    assert get_json(server, '/alerts?project=NO_SUCH_PROJECT&count=1')[1] == {'total': 0}
+
+
+def test_top(server):
+    engine = server.manager.engine
+    status, payload = get_json(server, '/top?n=7')
+    assert status == 200
+    assert payload['alerts'] == list(engine.iter_alert_records(engine.top_alerts(7)))
+    assert get_json(server, '/top?n=0') == (200, {'alerts': []})
+
+
+@pytest.mark.parametrize('target', ['/top?n=-1', '/top?n=abc', '/alerts?offset=-1',
+                                    '/alerts?limit=-5', '/alerts?month=x'])
+def test_invalid_parameters(server, target):
+    status, payload = get_json(server, target)
+    assert status == 400 and 'error' in payload
+
+
+def test_not_loaded():
+    server = AlertServer(SimpleAlertManager())
+    assert get_json(server, '/alerts')[0] == 503
+    assert get_json(server, '/health')[1]['status'] == 'ok'
+    server.alerts = []   # alerts มีแล้วแต่ยังไม่มี index
+    assert get_json(server, '/top')[0] == 503
+
+
+def test_unknown_path_and_method(server):
+    assert get_json(server, '/nope')[0] == 404
+    assert get(server, '/summary', method='POST')[0] == 405
+    status, headers, body = get(server, '/summary', method='HEAD')
+    assert status == 200 and body == b'' and int(headers['Content-Length']) > 0
@@ -0,0 +1,48 @@
+"""alert snapshots (Arrow IPC/Parquet) ต้องโหลดกลับได้ตรงกับ AlertTable.to_frame"""
+
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from alert_system import list_alert_snapshots, load_alert_snapshot
+from conftest import make_engine
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.mark.parametrize('format', ['arrow', 'parquet'])
+@pytest.mark.parametrize('memory_map', [True, False])
+def test_snapshot_round_trip(tmp_path, data_file, format, memory_map):
+    engine = make_engine(data_file)
+    alerts = engine.evaluate_all_alerts()
+    path = engine.write_snapshot(base_dir=str(tmp_path), run_time=datetime(2026, 1, 2, 3, 4, 5),
+                                 format=format)
+    assert list_alert_snapshots(str(tmp_path)) == [path]
+
+    loaded = load_alert_snapshot(path, memory_map=memory_map)
+    pd.testing.assert_frame_equal(loaded, alerts.to_frame(), check_categorical=False)
+    table = load_alert_snapshot(path, as_arrow=True)
+    assert table.schema.metadata[b'run_time'] == b'2026-01-02T03:04:05'
+
+
+def test_runs_in_the_same_second_do_not_overwrite(tmp_path, master_csv):
+    engine = make_engine(master_csv)
+    engine.evaluate_all_alerts()
+    first = engine.write_snapshot(base_dir=str(tmp_path), run_time=datetime(2026, 1, 2, 3, 4, 5, 100))
+    engine.thresholds['cost_overrun'] = 110
+    engine.evaluate_all_alerts()
+    second = engine.write_snapshot(base_dir=str(tmp_path), run_time=datetime(2026, 1, 2, 3, 4, 5, 200))
+
+    assert list_alert_snapshots(str(tmp_path)) == [first, second]
+    assert len(load_alert_snapshot(first)) != len(load_alert_snapshot(second))
+
+    # ชื่อแบบเดิม (ระดับวินาที) ยังเรียงตามเวลาร่วมกับชื่อใหม่
+    legacy = tmp_path / 'run=20260102T030404'
+    legacy.mkdir()
+    (legacy / 'alerts.arrow').write_bytes(open(first, 'rb').read())
+    assert list_alert_snapshots(str(tmp_path)) == [str(legacy / 'alerts.arrow'), first, second]
+
+    with pytest.raises(FileExistsError):
+        engine.write_snapshot(base_dir=str(tmp_path), run_time=datetime(2026, 1, 2, 3, 4, 5, 200))
+    assert len(load_alert_snapshot(second)) == len(engine.alerts)
@@ -0,0 +1,82 @@
+"""AlertStateStore: cooldown, escalation, keys ซ้ำใน batch และ forget"""
+
+import time
+
+import numpy as np
+import pytest
+
+from alert_state import AlertStateStore
+from conftest import make_engine
+
+HOUR = 3600
+
+
+@pytest.fixture(scope='module')
+def alerts(master_csv):
+    return make_engine(master_csv).evaluate_all_alerts()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = AlertStateStore(str(tmp_path / 'state.sqlite'), cooldown_hours=24)
+    yield store
+    store.close()
+
+
+def with_severity(alerts, severity_code):
+    """สำเนาของ alerts ที่ severity ต่างไป (identity เดิม)"""
+    table = alerts.take(np.arange(len(alerts)))
+    table.severity_code = np.full(len(table), severity_code, dtype=np.int8)
+    return table
+
+
+def test_new_alerts_notify_once_until_cooldown_expires(store, alerts):
+    now = 1_000_000.0
+    assert store.filter_notifiable(alerts, now=now).equals(alerts)
+    assert len(store) == len(alerts)
+    assert len(store.filter_notifiable(alerts, now=now + HOUR)) == 0
+    assert len(store.filter_notifiable(alerts, now=now + 24 * HOUR - 1)) == 0
+    assert store.filter_notifiable(alerts, now=now + 24 * HOUR).equals(alerts)
+    # แจ้งแล้วที่ now + 24h จึงเริ่มนับ cooldown ใหม่
+    assert len(store.filter_notifiable(alerts, now=now + 25 * HOUR)) == 0
+
+
+def test_escalation_renotifies_within_cooldown(store, alerts):
+    sample = alerts.take(np.arange(10))
+    store.filter_notifiable(with_severity(sample, 2), now=0.0)
+    # severity เท่าเดิมหรือต่ำลงไม่แจ้ง, สูงขึ้น (code น้อยลง) แจ้งทันที
+    assert len(store.filter_notifiable(with_severity(sample, 2), now=HOUR)) == 0
+    assert len(store.filter_notifiable(with_severity(sample, 3), now=HOUR)) == 0
+    escalated = with_severity(sample, 1)
+    assert store.filter_notifiable(escalated, now=2 * HOUR).equals(escalated)
+    # ระดับที่แจ้งล่าสุดถูกบันทึกแล้ว
+    assert len(store.filter_notifiable(escalated, now=3 * HOUR)) == 0
+
+
+def test_duplicate_keys_in_one_batch_notify_once(store, alerts):
+    batch = alerts.take(np.array([0, 1, 0, 2, 1, 0]))
+    notified = store.filter_notifiable(batch, now=0.0)
+    assert notified.equals(alerts.take(np.array([0, 1, 2])))
+    assert len(store) == 3
+    count = store.conn.execute("SELECT MAX(notify_count) FROM alert_state").fetchone()[0]
+    assert count == 1
+
+
+def test_record_false_then_record_notified(store, alerts):
+    sample = alerts.take(np.arange(6))
+    pending = store.filter_notifiable(sample, now=0.0, record=False)
+    assert pending.equals(sample) and len(store) == 0
+    store.record_notified(sample, sample.take(np.arange(3)), now=0.0)
+    # ที่ส่งไม่สำเร็จถูกแจ้งอีกในรอบถัดไป
+    assert store.filter_notifiable(sample, now=HOUR).equals(sample.take(np.arange(3, 6)))
+
+
+def test_forget_removes_only_stale_alerts(store, alerts):
+    now = time.time()
+    store.filter_notifiable(alerts.take(np.arange(5)), now=now - 100 * 86400)
+    store.filter_notifiable(alerts.take(np.arange(5, 8)), now=now - 10 * HOUR)
+    assert store.forget(older_than_days=90) == 5
+    assert len(store) == 3
+    assert store.forget(older_than_days=90) == 0
+    # alerts ที่ถูกลืมนับเป็นของใหม่อีกครั้ง
+    assert len(store.filter_notifiable(alerts.take(np.arange(8)), now=now)) == 5
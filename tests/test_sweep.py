@@ -0,0 +1,41 @@
+"""sweep_thresholds ต้องนับได้เท่ากับการรันจริงด้วย config นั้น"""
+
+import pytest
+
+from alert_system import TREND_RULES, threshold_grid
+from conftest import make_engine
+
+GRID = threshold_grid(
+    {'cost_overrun': [95, 110, 125], 'progress_lag': [120, 200], 'low_efficiency': [35, 50],
+     'burn_rate': [60, 100]},
+    {'cost_overrun': [(130, 115), (140, 110)], 'low_efficiency': [(20, 30), (25, 20)]},
+)
+
+
+@pytest.mark.parametrize('rules', [(), TREND_RULES], ids=['base', 'trend'])
+def test_sweep_matches_real_runs(data_file, rules):
+    engine = make_engine(data_file, rules)
+    sweep = engine.sweep_thresholds(GRID)
+    assert len(sweep) == len(GRID)
+
+    for i in range(0, len(GRID), 7):
+        reference = make_engine(data_file, rules)
+        reference.thresholds = dict(sweep.configs[i]['thresholds'])
+        reference.severity_cutoffs = dict(sweep.configs[i]['severity_cutoffs'])
+        reference.evaluate_all_alerts()
+        expected = reference.get_alert_summary()
+
+        summary = sweep.summary(i)
+        assert summary['total'] == expected['total'] == sweep.totals()[i]
+        assert summary['by_severity'] == dict(expected['by_severity'])
+        assert summary['by_type'] == dict(expected['by_type'])
+        assert summary['by_project'] == dict(expected['by_project'])
+
+
+def test_sweep_leaves_engine_unchanged(master_csv):
+    engine = make_engine(master_csv)
+    alerts = engine.evaluate_all_alerts()
+    thresholds = dict(engine.thresholds)
+    engine.sweep_thresholds(GRID)
+    assert engine.thresholds == thresholds
+    assert engine.alerts is alerts
@@ -0,0 +1,29 @@
+"""top_alerts ต้องได้ลำดับเดียวกับการ sort ทั้งชุด"""
+
+import numpy as np
+import pytest
+
+from conftest import make_engine
+
+
+def sorted_alerts(table):
+    """เรียงทั้งชุด: severity, variance มากก่อน (NaN ท้ายสุด), ลำดับเดิม"""
+    variance = np.where(np.isnan(table.variance), -np.inf, table.variance)
+    return np.lexsort((np.arange(len(table)), -variance, table.severity_code))
+
+
+@pytest.mark.parametrize('n', [1, 5, 10, 137, 10 ** 6])
+def test_top_alerts_matches_full_sort(data_file, n):
+    engine = make_engine(data_file)
+    alerts = engine.evaluate_all_alerts()
+    expected = alerts.take(sorted_alerts(alerts)[:n])
+    assert engine.top_alerts(n).equals(expected)
+
+
+@pytest.mark.parametrize('n', [0, -1, -10 ** 6])
+def test_top_alerts_non_positive_n(master_csv, n):
+    engine = make_engine(master_csv)
+    engine.evaluate_all_alerts()
+    top = engine.top_alerts(n)
+    assert len(top) == 0
+    assert list(top) == []
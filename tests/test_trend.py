@@ -0,0 +1,89 @@
+"""trend rules เทียบกับ reference แบบ brute force ที่เดินทีละ series (ไม่ใช้ _trend_values)"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from alert_system import ALERT_TYPES, TREND_RULES
+from conftest import make_engine
+
+
+def reference_values(df, window):
+    """{rule: (valid, value)} ต่อแถว คำนวณตรงจากนิยามทีละ series ทีละเดือน"""
+    n = len(df)
+    values = {rule: (np.zeros(n, dtype=bool), np.full(n, np.nan)) for rule in TREND_RULES}
+    window = max(window, 2)
+    for _, group in df.groupby(['project_id', 'g_code', 's_code'], dropna=False, sort=False):
+        group = group.sort_values(['year', 'month'])
+        rows = list(zip(group.index, group['year'] * 12 + group['month'], group['month'],
+                        group['total_budget'], group['total_actual'], group['cpi']))
+        for i, (position, period, month, budget, actual, cpi) in enumerate(rows):
+            # แถวก่อนหน้าที่เป็นเดือนติดกันย้อนไปเรื่อยๆ (แถวนี้อยู่แรกสุด)
+            run = [rows[i]]
+            for earlier in reversed(rows[:i]):
+                if earlier[1] != run[-1][1] - 1:
+                    break
+                run.append(earlier)
+
+            utilization = [r[4] / r[3] * 100 if r[3] != 0 else np.nan for r in run[:3]]
+            if len(utilization) == 3 and not np.isnan(utilization).any():
+                valid, value = values['cost_acceleration']
+                valid[position] = True
+                value[position] = (utilization[0] - utilization[1]) - (utilization[1] - utilization[2])
+
+            declining = 0
+            while declining + 1 < len(run) and run[declining][5] < run[declining + 1][5]:
+                declining += 1
+            values['cpi_decline'][0][position] = True
+            values['cpi_decline'][1][position] = declining
+
+            remaining, months_left = budget - actual, 12 - month
+            if len(run) >= window and remaining > 0 and months_left > 0:
+                recent = [r[4] for r in reversed(run[:window])]
+                slope = np.polyfit(np.arange(window), recent, 1)[0]
+                values['burn_rate'][0][position] = True
+                values['burn_rate'][1][position] = slope * months_left / remaining * 100
+    return values
+
+
+def shuffled(path, tmp_path):
+    out = str(tmp_path / 'shuffled.csv')
+    pd.read_csv(path).sample(frac=1, random_state=3).to_csv(out, index=False)
+    return out
+
+
+@pytest.mark.parametrize('window', [3, 5])
+@pytest.mark.parametrize('order', ['sorted', 'shuffled'])
+def test_trend_values_match_reference(data_file, tmp_path, window, order):
+    path = shuffled(data_file, tmp_path) if order == 'shuffled' else data_file
+    engine = make_engine(path, TREND_RULES, trend_window=window)
+    df = engine.df.reset_index(drop=True)
+    expected = reference_values(df, window)
+    for rule in TREND_RULES:
+        valid, value = engine._rule_value(rule, engine.df)
+        expected_valid, expected_value = expected[rule]
+        np.testing.assert_array_equal(valid, expected_valid, err_msg=rule)
+        assert valid.any(), rule
+        np.testing.assert_allclose(value[valid], expected_value[valid], rtol=1e-9, atol=1e-6,
+                                   err_msg=rule)
+
+
+@pytest.mark.parametrize('window', [3, 5])
+def test_trend_alerts_match_reference(data_file, window):
+    engine = make_engine(data_file, TREND_RULES, trend_window=window)
+    engine.enabled_rules = list(TREND_RULES)
+    alerts = engine.evaluate_all_alerts()
+    expected = reference_values(engine.df.reset_index(drop=True), window)
+
+    rows = []
+    for rule in TREND_RULES:
+        valid, value = expected[rule]
+        threshold = engine.thresholds[rule]
+        critical, high = engine.severity_cutoffs[rule]
+        for position in np.flatnonzero(valid & (np.nan_to_num(value, nan=-np.inf) > threshold)):
+            score = value[position]
+            severity = 0 if score > critical else 1 if score > high else 2
+            rows.append((position, ALERT_TYPES.index(rule), severity))
+    got = list(zip(alerts.row_index.tolist(), alerts.type_code.tolist(), alerts.severity_code.tolist()))
+    assert len(got) > 0
+    assert sorted(got) == sorted(rows)
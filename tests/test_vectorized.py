@@ -0,0 +1,41 @@
+"""vectorized evaluation ต้องได้ alerts เดียวกับ check functions ทีละแถว (base rules)
+
+trend/anomaly rules ประเมินแบบ vectorized เสมอ จึงทดสอบกับ reference แยกใน test_trend.py
+และ test_anomaly.py
+"""
+
+from alert_system import SEVERITY_LEVELS
+from conftest import make_engine
+
+
+def test_vectorized_matches_rows(data_file):
+    vectorized = make_engine(data_file).evaluate_all_alerts(vectorized=True)
+    rows = make_engine(data_file).evaluate_all_alerts(vectorized=False)
+    assert len(vectorized) > 0
+    assert vectorized.equals(rows)
+
+
+def test_vectorized_matches_rows_with_custom_thresholds(master_csv):
+    results = []
+    for vectorized in (True, False):
+        engine = make_engine(master_csv)
+        engine.thresholds.update({'cost_overrun': 110, 'progress_lag': 120, 'schedule_delay': 15,
+                                  'low_efficiency': 50})
+        results.append(engine.evaluate_all_alerts(vectorized=vectorized))
+    assert results[0].equals(results[1])
+
+
+def test_rows_match_check_functions(master_csv):
+    """alerts แบบ columnar ตรงกับ SimpleAlert ที่ check functions คืนทีละแถว"""
+    engine = make_engine(master_csv)
+    alerts = engine.evaluate_all_alerts()
+    expected = []
+    for position, (_, row) in enumerate(engine.df.iterrows()):
+        for check in engine.checks.values():
+            alert = check(row)
+            if alert:
+                expected.append((position, alert.alert_type, alert.severity, alert.message, alert.details))
+    got = [(alert.row_index, alert.alert_type, alert.severity, alert.message, alert.details)
+           for alert in alerts]
+    assert got == expected
+    assert set(alert.severity for alert in alerts) <= set(SEVERITY_LEVELS)
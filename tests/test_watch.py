@@ -0,0 +1,94 @@
+"""SimpleAlertManager.watch: หนึ่งรอบ incremental ต่อการเปลี่ยนแปลงที่นิ่งแล้ว"""
+
+import shutil
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from alert_system import SimpleAlertEngine, SimpleAlertManager
+from conftest import make_engine
+
+
+class Watcher:
+    """รัน watch ใน thread แยกและเก็บผลแต่ละรอบ"""
+
+    def __init__(self, path, debounce):
+        self.manager = SimpleAlertManager()
+        self.manager.engine = SimpleAlertEngine(path)
+        self.cycles = []
+        self.stop = threading.Event()
+        wait = self.manager._wait_for_change
+
+        def wait_for_change(inotify, interval):
+            if self.stop.is_set():
+                raise KeyboardInterrupt
+            wait(inotify, interval)
+
+        self.manager._wait_for_change = wait_for_change
+        self.thread = threading.Thread(target=self.manager.watch, daemon=True, kwargs={
+            'interval': 0.05, 'debounce': debounce,
+            'on_update': lambda alerts, delta: self.cycles.append((alerts, delta))})
+        self.thread.start()
+
+    def wait_for(self, cycles, timeout=20):
+        deadline = time.monotonic() + timeout
+        while len(self.cycles) < cycles and time.monotonic() < deadline:
+            time.sleep(0.02)
+        return len(self.cycles)
+
+    def close(self):
+        self.stop.set()
+        self.thread.join(timeout=10)
+        assert not self.thread.is_alive()
+
+
+@pytest.fixture
+def working_csv(tmp_path, master_csv):
+    path = str(tmp_path / 'master_data.csv')
+    shutil.copy(master_csv, path)
+    return path
+
+
+def scale_latest(path, factor):
+    df = pd.read_csv(path)
+    latest = df['year'] * 12 + df['month'] == (df['year'] * 12 + df['month']).max()
+    df.loc[latest, 'total_actual'] *= factor
+    df.to_csv(path, index=False)
+
+
+def test_one_incremental_cycle_per_change(working_csv):
+    watcher = Watcher(working_csv, debounce=0.2)
+    try:
+        assert watcher.wait_for(1) == 1
+        assert watcher.cycles[0][1].rows_evaluated == len(watcher.manager.engine.df)
+
+        scale_latest(working_csv, 1.5)
+        assert watcher.wait_for(2) == 2
+        alerts, delta = watcher.cycles[1]
+        assert 0 < delta.rows_evaluated < len(watcher.manager.engine.df)
+        assert alerts.equals(make_engine(working_csv).evaluate_all_alerts())
+
+        # เขียนเนื้อหาเดิมซ้ำ: mtime เปลี่ยนแต่ hash เท่าเดิม จึงไม่ประเมินใหม่
+        with open(working_csv, 'rb') as f:
+            content = f.read()
+        with open(working_csv, 'wb') as f:
+            f.write(content)
+        assert watcher.wait_for(3, timeout=1) == 2
+    finally:
+        watcher.close()
+
+
+def test_quick_writes_debounce_to_one_cycle(working_csv):
+    watcher = Watcher(working_csv, debounce=0.5)
+    try:
+        assert watcher.wait_for(1) == 1
+        # ETL เขียนไฟล์หลายครั้งติดกัน ประเมินครั้งเดียวเมื่อไฟล์นิ่งแล้ว
+        for factor in (1.1, 1.2, 1.3, 1.4):
+            scale_latest(working_csv, factor)
+        assert watcher.wait_for(2) == 2
+        assert watcher.wait_for(3, timeout=1.5) == 2
+        assert watcher.cycles[1][0].equals(make_engine(working_csv).evaluate_all_alerts())
+    finally:
+        watcher.close()